@@ -2,12 +2,15 @@
 Module contains RAPTOR implementation.
 *tweaked raptor modified by Dhanus*
 """
+import time
+
 import pandas as pd
 
 from RAPTOR.raptor_function_tweaked import *
+from RAPTOR.compiled_network import CompiledNetwork, LabelView, get_workspace, initialize_raptor_compiled, INF_TIME
 
 def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
-           routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, stoptimes_dict_modified: dict, metro_cost_dict: dict) -> list:
+           routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, stoptimes_dict_modified: dict, metro_cost_dict: dict, stats=None) -> list:
     '''
     Standard Raptor implementation
     Args:
@@ -23,6 +26,7 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
         footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
         idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        stats (RaptorStats): optional. Per-round counters the query is added to. See RAPTOR.raptor_stats.
     Returns:
         out (list): list of pareto-optimal arrival timestamps.
     Examples:
@@ -54,7 +58,11 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
 
     # Main Code
     # Main code part 1
+    count = stats is not None  # the per-round counters are only kept when stats are recorded
     for k in range(1, MAX_TRANSFER + 1):
+        if count:
+            round_start, marked_stops = time.perf_counter(), len(marked_stop)
+            trip_lookups, label_improvements, footpath_relaxations = 0, 0, 0
         Q.clear()
         while marked_stop:
             p = marked_stop.pop()
@@ -82,11 +90,15 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
                 if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], star_label[DESTINATION]):
                     arr_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
                     label[k][p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                    if count:
+                        label_improvements += 1
                     pi_label[k][p_i] = (boarding_time, boarding_point, p_i, arr_by_t_at_pi, tid)
                     if marked_stop_dict[p_i] == 0:
                         marked_stop.append(p_i)
                         marked_stop_dict[p_i] = 1
                 if current_trip_t == -1 or label[k - 1][p_i] + change_time < current_trip_t[current_stopindex_by_route][1]:  # assuming arrival_time = departure_time
+                    if count:
+                        trip_lookups += 1
                     tid, current_trip_t = get_latest_trip_tweaked(route, label[k - 1][p_i], current_stopindex_by_route, stoptimes_dict_modified)
                     if current_trip_t == -1:
                         boarding_time, boarding_point = -1, -1
@@ -100,11 +112,15 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
         for p in marked_stop_copy:
             try:
                 trans_info = footpath_dict[p]
+                if count:
+                    footpath_relaxations += len(trans_info)
                 for i in trans_info:
                     (p_dash, to_pdash_time) = i
                     new_p_dash_time = label[k][p] + to_pdash_time
                     if label[k][p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], star_label[DESTINATION]):
                         label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                        if count:
+                            label_improvements += 1
                         pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
                         if marked_stop_dict[p_dash] == 0:
                             marked_stop.append(p_dash)
@@ -112,16 +128,251 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
             except KeyError:
                 continue
         # Main code End
+        if count:
+            stats.add_round(k, marked_stops, len(Q), sum(len(stops_dict[route]) - stp_idx for route, stp_idx in Q.items()), trip_lookups,
+                            label_improvements, footpath_relaxations, time.perf_counter() - round_start)
         if marked_stop == deque([]):
             if PRINT_ITINERARY == 1:
                 # print('code ended with termination condition')
                 pass
             break
+    if stats is not None:
+        stats.add_query()
     _, _, rap_out = post_processing_dhanus(DESTINATION, pi_label, PRINT_ITINERARY, label, metro_cost_dict)
     out.append(rap_out)
     return out
 
 
+def raptor_one_to_all(SOURCE: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
+                      routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, stoptimes_dict_modified: dict, metro_cost_dict: dict) -> list:
+    '''
+    One-To-All variant of tweaked Raptor. Rounds are run once from SOURCE without target pruning, so the labels hold the
+    pareto-optimal journeys to every stop of the network.
+    Args:
+        SOURCE (int): stop id of source stop.
+        D_TIME (float): departure time in seconds.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        stoptimes_dict_modified (dict): Format {route_id: [(stop id, cumulative travel time in seconds)]}.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+    Returns:
+        out (list): [label, pi_label, rap_out_dict] where rap_out_dict maps every reachable stop (other than SOURCE) to the
+        rap_out of post_processing_dhanus, i.e. {stop_id: {'old': [...], 'tt': [(num_transfers, travel_time_dict)], 'journeys': [...]}}.
+    Examples:
+        >>> output = raptor_one_to_all('P_1', D_TIME, 2, 1, 0, 0, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict)
+        >>> print(output[2]['P_5']['tt'])
+    '''
+    # Initialization
+    marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE, MAX_TRANSFER)
+    change_time = CHANGE_TIME_SEC
+    (label[0][SOURCE], star_label[SOURCE]) = (D_TIME, D_TIME)
+    Q = {}  # Format of Q is {route:stop index}
+    if WALKING_FROM_SOURCE == 1:
+        try:
+            trans_info = footpath_dict[SOURCE]
+            for i in trans_info:
+                (p_dash, to_pdash_time) = i
+                label[0][p_dash] = D_TIME + to_pdash_time
+                star_label[p_dash] = D_TIME + to_pdash_time
+                pi_label[0][p_dash] = ('walking', SOURCE, p_dash, to_pdash_time, D_TIME + to_pdash_time)
+                if marked_stop_dict[p_dash] == 0:
+                    marked_stop.append(p_dash)
+                    marked_stop_dict[p_dash] = 1
+        except KeyError:
+            pass
+
+    # Main Code
+    # Main code part 1
+    for k in range(1, MAX_TRANSFER + 1):
+        Q.clear()
+        while marked_stop:
+            p = marked_stop.pop()
+            marked_stop_dict[p] = 0
+            try:
+                routes_serving_p = routes_by_stop_dict[p]
+                for route in routes_serving_p:
+                    stp_idx = idx_by_route_stop_dict[(route, p)]
+                    try:
+                        Q[route] = min(stp_idx, Q[route])
+                    except KeyError:
+                        Q[route] = stp_idx
+            except KeyError:
+                continue
+
+        # Main code part 2 (no target pruning: a stop is only compared against its own best label)
+        for route, current_stopindex_by_route in Q.items():
+            current_trip_t = -1
+            for p_i in stops_dict[route][current_stopindex_by_route:]:
+                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < star_label[p_i]:
+                    arr_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
+                    label[k][p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                    pi_label[k][p_i] = (boarding_time, boarding_point, p_i, arr_by_t_at_pi, tid)
+                    if marked_stop_dict[p_i] == 0:
+                        marked_stop.append(p_i)
+                        marked_stop_dict[p_i] = 1
+                if current_trip_t == -1 or label[k - 1][p_i] + change_time < current_trip_t[current_stopindex_by_route][1]:  # assuming arrival_time = departure_time
+                    tid, current_trip_t = get_latest_trip_tweaked(route, label[k - 1][p_i], current_stopindex_by_route, stoptimes_dict_modified)
+                    if current_trip_t == -1:
+                        boarding_time, boarding_point = -1, -1
+                    else:
+                        boarding_point = p_i
+                        boarding_time = label[k - 1][p_i]
+                current_stopindex_by_route = current_stopindex_by_route + 1
+
+        # Main code part 3
+        marked_stop_copy = [*marked_stop]
+        for p in marked_stop_copy:
+            try:
+                trans_info = footpath_dict[p]
+                for i in trans_info:
+                    (p_dash, to_pdash_time) = i
+                    new_p_dash_time = label[k][p] + to_pdash_time
+                    if label[k][p_dash] > new_p_dash_time and new_p_dash_time < star_label[p_dash]:
+                        label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                        pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
+                        if marked_stop_dict[p_dash] == 0:
+                            marked_stop.append(p_dash)
+                            marked_stop_dict[p_dash] = 1
+            except KeyError:
+                continue
+        # Main code End
+        if marked_stop == deque([]):
+            break
+    rap_out_dict = post_processing_one_to_all(SOURCE, pi_label, PRINT_ITINERARY, label, metro_cost_dict)
+    return [label, pi_label, rap_out_dict]
+
+
+def raptor_compiled(SOURCE: int, DESTINATION, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
+                    network: CompiledNetwork, metro_cost_dict: dict, workspace=None, ITINERARY: int = 1, POST_PROCESSING: int = 1, stats=None) -> list:
+    '''
+    Tweaked Raptor on the compiled (integer-indexed, array-backed) network. Produces the same output as raptor (or
+    raptor_one_to_all if DESTINATION is None).
+    Args:
+        SOURCE (int): stop id of source stop.
+        DESTINATION (int/None): stop id of destination stop. None runs the One-To-All variant (no target pruning).
+        D_TIME (float): departure time in seconds.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        network (CompiledNetwork): compiled network with route travel times. See compile_network.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+        workspace (RaptorWorkspace): optional. Label buffers to use. Defaults to the workspace of the network.
+        ITINERARY (int): 1 or 0. 0 only computes the journey metrics (no Journey objects). See post_processing_dhanus.
+        POST_PROCESSING (int): 1 or 0. 0 skips the One-To-All post processing (DESTINATION None only).
+        stats (RaptorStats): optional. Per-round counters the query is added to. See RAPTOR.raptor_stats.
+    Returns:
+        out (list): if DESTINATION is given, same as raptor. Else same as raptor_one_to_all, with label and pi_label
+        returned as read-only views over the workspace arrays (valid until the next query on the same workspace).
+        With POST_PROCESSING 0, out is [label, pi_label] with the workspace arrays themselves (see
+        RAPTOR.journey_metrics.get_pareto_legs).
+    Examples:
+        >>> output = raptor_compiled('P_1', 'G_5', D_TIME, 2, 1, 0, 0, network, metro_cost_dict)
+    '''
+    source = network.stop_idx[SOURCE]
+    destination = network.stop_idx[DESTINATION] if DESTINATION is not None else -1
+    route_stop_list, route_travel_list = network.route_stop_list, network.route_travel_list
+    stop_route_list, footpath_list = network.stop_route_list, network.footpath_list
+    # Initialization
+    workspace = get_workspace(network, MAX_TRANSFER) if workspace is None else workspace
+    marked_stop, marked_stop_dict, label, pi_label, star_label, touched = initialize_raptor_compiled(workspace, source, MAX_TRANSFER)
+    change_time = CHANGE_TIME_SEC
+    (label[0][source], star_label[source]) = (D_TIME, D_TIME)
+    touched.append(source)
+    Q = {}  # Format of Q is {route index:stop index}
+    if WALKING_FROM_SOURCE == 1:
+        for p_dash, to_pdash_time in footpath_list[source]:
+            if star_label[p_dash] == INF_TIME:
+                touched.append(p_dash)
+            label[0][p_dash] = D_TIME + to_pdash_time
+            star_label[p_dash] = D_TIME + to_pdash_time
+            pi_label.from_stop[0][p_dash], pi_label.route[0][p_dash], pi_label.time[0][p_dash] = source, -1, to_pdash_time
+            if marked_stop_dict[p_dash] == 0:
+                marked_stop.append(p_dash)
+                marked_stop_dict[p_dash] = 1
+
+    # Main Code
+    # Main code part 1
+    count = stats is not None  # the per-round counters are only kept when stats are recorded
+    for k in range(1, MAX_TRANSFER + 1):
+        if count:
+            round_start, marked_stops = time.perf_counter(), len(marked_stop)
+            trip_lookups, label_improvements, footpath_relaxations = 0, 0, 0
+        label_k, label_prev = label[k], label[k - 1]
+        pi_from, pi_route, pi_trip, pi_time = pi_label.from_stop[k], pi_label.route[k], pi_label.trip[k], pi_label.time[k]
+        Q.clear()
+        while marked_stop:
+            p = marked_stop.pop()
+            marked_stop_dict[p] = 0
+            for route, stp_idx in stop_route_list[p]:
+                if route not in Q or stp_idx < Q[route]:
+                    Q[route] = stp_idx
+
+        # Main code part 2
+        for route, first_stopindex_by_route in Q.items():
+            stop_list, travel_list = route_stop_list[route], route_travel_list[route]
+            boarding_point, boarding_time = -1, INF_TIME
+            for current_stopindex_by_route in range(first_stopindex_by_route, len(stop_list)):
+                p_i = stop_list[current_stopindex_by_route]
+                if boarding_point != -1:
+                    arr_by_t_at_pi = boarding_time + travel_list[current_stopindex_by_route]
+                    target = star_label[destination] if destination != -1 else INF_TIME
+                    if arr_by_t_at_pi < min(star_label[p_i], target):
+                        if star_label[p_i] == INF_TIME:
+                            touched.append(p_i)
+                        label_k[p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                        if count:
+                            label_improvements += 1
+                        pi_from[p_i], pi_route[p_i], pi_trip[p_i], pi_time[p_i] = boarding_point, route, 0, boarding_time
+                        if marked_stop_dict[p_i] == 0:
+                            marked_stop.append(p_i)
+                            marked_stop_dict[p_i] = 1
+                if boarding_point == -1 or label_prev[p_i] + change_time < boarding_time + travel_list[current_stopindex_by_route]:  # assuming arrival_time = departure_time
+                    boarding_point, boarding_time = p_i, label_prev[p_i]
+                    if count:
+                        trip_lookups += 1
+
+        # Main code part 3
+        marked_stop_copy = [*marked_stop]
+        for p in marked_stop_copy:
+            if count:
+                footpath_relaxations += len(footpath_list[p])
+            for p_dash, to_pdash_time in footpath_list[p]:
+                new_p_dash_time = label_k[p] + to_pdash_time
+                target = star_label[destination] if destination != -1 else INF_TIME
+                if label_k[p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], target):
+                    if star_label[p_dash] == INF_TIME:
+                        touched.append(p_dash)
+                    label_k[p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                    if count:
+                        label_improvements += 1
+                    pi_from[p_dash], pi_route[p_dash], pi_time[p_dash] = p, -1, to_pdash_time
+                    if marked_stop_dict[p_dash] == 0:
+                        marked_stop.append(p_dash)
+                        marked_stop_dict[p_dash] = 1
+        # Main code End
+        if count:
+            stats.add_round(k, marked_stops, len(Q), sum(len(route_stop_list[route]) - stp_idx for route, stp_idx in Q.items()), trip_lookups,
+                            label_improvements, footpath_relaxations, time.perf_counter() - round_start)
+        if not marked_stop:
+            break
+    if stats is not None:
+        stats.add_query()
+    if DESTINATION is None and POST_PROCESSING == 0:
+        return [label, pi_label]
+    view = LabelView(network, label, pi_label)
+    if DESTINATION is None:
+        return [view.label, view.pi_label, post_processing_one_to_all(SOURCE, view.pi_label, PRINT_ITINERARY, view.label, metro_cost_dict, ITINERARY)]
+    _, _, rap_out = post_processing_dhanus(DESTINATION, view.pi_label, PRINT_ITINERARY, view.label, metro_cost_dict, ITINERARY)
+    return [rap_out]
+
 
 def raptor_dhanus(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
            routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, OSM_dist_dict: dict, stop_OSMnode_mapping: dict) -> list:
@@ -231,4 +482,254 @@ def raptor_dhanus(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALK
             break
     _, _, rap_out = post_processing_dhanus(DESTINATION, pi_label, PRINT_ITINERARY, label)
     out.append(rap_out)
-    return out
\ No newline at end of file
+    return out
+
+def raptor_multi_source(SOURCE_LIST: list, DESTINATION_LIST: list, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
+                        routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, stoptimes_dict_modified: dict, metro_cost_dict: dict) -> list:
+    '''
+    Multi-source variant of tweaked Raptor for zone to zone queries. Round 0 is seeded with every access stop at
+    D_TIME + its access time, and a journey may end at any egress stop; the egress time is added before comparing
+    arrivals (also in target pruning). One search therefore covers all candidate station pairs of a zone pair.
+    Args:
+        SOURCE_LIST (list): access stops. Format [(stop id, access time in seconds)].
+        DESTINATION_LIST (list): egress stops. Format [(stop id, egress time in seconds)].
+        D_TIME (float): departure time from the origin zone in seconds.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from the access stops is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        stoptimes_dict_modified (dict): Format {route_id: [(stop id, cumulative travel time in seconds)]}.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+    Returns:
+        out (list): [rap_out] with rap_out as returned by post_processing_multi_source.
+    Examples:
+        >>> output = raptor_multi_source([('P_1', 120), ('P_2', 300)], [('G_5', 60), ('G_6', 240)], D_TIME, 2, 1, 0, 0, routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict)
+    '''
+    egress_time = {}
+    for stop, egress in DESTINATION_LIST:
+        egress_time[stop] = min(egress, egress_time.get(stop, egress))
+    # Initialization
+    marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE_LIST[0][0], MAX_TRANSFER)
+    change_time = CHANGE_TIME_SEC
+    target = inf_time  # earliest arrival at the destination zone (egress included)
+    for SOURCE, access in SOURCE_LIST:
+        if D_TIME + access < star_label[SOURCE]:
+            (label[0][SOURCE], star_label[SOURCE]) = (D_TIME + access, D_TIME + access)
+            if marked_stop_dict[SOURCE] == 0:
+                marked_stop.append(SOURCE)
+                marked_stop_dict[SOURCE] = 1
+    Q = {}  # Format of Q is {route:stop index}
+    if WALKING_FROM_SOURCE == 1:
+        for SOURCE, _ in SOURCE_LIST:
+            for p_dash, to_pdash_time in footpath_dict.get(SOURCE, []):
+                if label[0][SOURCE] + to_pdash_time < star_label[p_dash]:
+                    label[0][p_dash] = label[0][SOURCE] + to_pdash_time
+                    star_label[p_dash] = label[0][SOURCE] + to_pdash_time
+                    pi_label[0][p_dash] = ('walking', SOURCE, p_dash, to_pdash_time, label[0][p_dash])
+                    if marked_stop_dict[p_dash] == 0:
+                        marked_stop.append(p_dash)
+                        marked_stop_dict[p_dash] = 1
+
+    # Main Code
+    # Main code part 1
+    for k in range(1, MAX_TRANSFER + 1):
+        Q.clear()
+        while marked_stop:
+            p = marked_stop.pop()
+            marked_stop_dict[p] = 0
+            try:
+                routes_serving_p = routes_by_stop_dict[p]
+                for route in routes_serving_p:
+                    stp_idx = idx_by_route_stop_dict[(route, p)]
+                    try:
+                        Q[route] = min(stp_idx, Q[route])
+                    except KeyError:
+                        Q[route] = stp_idx
+            except KeyError:
+                continue
+
+        # Main code part 2
+        for route, current_stopindex_by_route in Q.items():
+            current_trip_t = -1
+            for p_i in stops_dict[route][current_stopindex_by_route:]:
+                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], target):
+                    arr_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
+                    label[k][p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                    pi_label[k][p_i] = (boarding_time, boarding_point, p_i, arr_by_t_at_pi, tid)
+                    if p_i in egress_time:
+                        target = min(target, arr_by_t_at_pi + egress_time[p_i])
+                    if marked_stop_dict[p_i] == 0:
+                        marked_stop.append(p_i)
+                        marked_stop_dict[p_i] = 1
+                if current_trip_t == -1 or label[k - 1][p_i] + change_time < current_trip_t[current_stopindex_by_route][1]:  # assuming arrival_time = departure_time
+                    tid, current_trip_t = get_latest_trip_tweaked(route, label[k - 1][p_i], current_stopindex_by_route, stoptimes_dict_modified)
+                    if current_trip_t == -1:
+                        boarding_time, boarding_point = -1, -1
+                    else:
+                        boarding_point = p_i
+                        boarding_time = label[k - 1][p_i]
+                current_stopindex_by_route = current_stopindex_by_route + 1
+
+        # Main code part 3
+        marked_stop_copy = [*marked_stop]
+        for p in marked_stop_copy:
+            try:
+                trans_info = footpath_dict[p]
+                for i in trans_info:
+                    (p_dash, to_pdash_time) = i
+                    new_p_dash_time = label[k][p] + to_pdash_time
+                    if label[k][p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], target):
+                        label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                        pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
+                        if p_dash in egress_time:
+                            target = min(target, new_p_dash_time + egress_time[p_dash])
+                        if marked_stop_dict[p_dash] == 0:
+                            marked_stop.append(p_dash)
+                            marked_stop_dict[p_dash] = 1
+            except KeyError:
+                continue
+        # Main code End
+        if marked_stop == deque([]):
+            break
+    rap_out = post_processing_multi_source(SOURCE_LIST, DESTINATION_LIST, pi_label, PRINT_ITINERARY, label, metro_cost_dict)
+    return [rap_out]
+
+
+def raptor_multi_source_compiled(SOURCE_LIST: list, DESTINATION_LIST, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
+                                 network: CompiledNetwork, metro_cost_dict: dict, workspace=None, ITINERARY: int = 1, POST_PROCESSING: int = 1, stats=None) -> list:
+    '''
+    raptor_multi_source on the compiled network.
+    Args:
+        SOURCE_LIST (list): access stops. Format [(stop id, access time in seconds)].
+        DESTINATION_LIST (list/None): egress stops. Format [(stop id, egress time in seconds)]. None runs the search without
+            target pruning so that the labels can be post processed for any number of destination zones.
+        D_TIME (float): departure time from the origin zone in seconds.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from the access stops is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        network (CompiledNetwork): compiled network with route travel times. See compile_network.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+        workspace (RaptorWorkspace): optional. Label buffers to use. Defaults to the workspace of the network.
+        ITINERARY (int): 1 or 0. 0 only computes the journey metrics (no Journey objects). See post_processing_dhanus.
+        stats (RaptorStats): optional. Per-round counters the query is added to. See RAPTOR.raptor_stats.
+    Returns:
+        out (list): if DESTINATION_LIST is given, same as raptor_multi_source. Else [label, pi_label] as read-only views
+        over the workspace arrays (valid until the next query on the same workspace), to be passed to
+        post_processing_multi_source once per destination zone.
+    Examples:
+        >>> label, pi_label = raptor_multi_source_compiled([('P_1', 120), ('P_2', 300)], None, D_TIME, 2, 1, 0, 0, network, metro_cost_dict)
+        >>> rap_out = post_processing_multi_source([('P_1', 120), ('P_2', 300)], [('G_5', 60)], pi_label, 0, label, metro_cost_dict)
+    '''
+    egress_time = {}
+    for stop, egress in (DESTINATION_LIST or []):
+        egress_time[network.stop_idx[stop]] = min(egress, egress_time.get(network.stop_idx[stop], egress))
+    route_stop_list, route_travel_list = network.route_stop_list, network.route_travel_list
+    stop_route_list, footpath_list = network.stop_route_list, network.footpath_list
+    # Initialization
+    workspace = get_workspace(network, MAX_TRANSFER) if workspace is None else workspace
+    sources = [(network.stop_idx[SOURCE], access) for SOURCE, access in SOURCE_LIST]
+    marked_stop, marked_stop_dict, label, pi_label, star_label, touched = initialize_raptor_compiled(workspace, sources[0][0], MAX_TRANSFER)
+    change_time = CHANGE_TIME_SEC
+    target = INF_TIME  # earliest arrival at the destination zone (egress included)
+    for source, access in sources:
+        if D_TIME + access < star_label[source]:
+            if star_label[source] == INF_TIME:
+                touched.append(source)
+            (label[0][source], star_label[source]) = (D_TIME + access, D_TIME + access)
+            if marked_stop_dict[source] == 0:
+                marked_stop.append(source)
+                marked_stop_dict[source] = 1
+    Q = {}  # Format of Q is {route index:stop index}
+    if WALKING_FROM_SOURCE == 1:
+        for source, _ in sources:
+            for p_dash, to_pdash_time in footpath_list[source]:
+                if label[0][source] + to_pdash_time < star_label[p_dash]:
+                    if star_label[p_dash] == INF_TIME:
+                        touched.append(p_dash)
+                    label[0][p_dash] = label[0][source] + to_pdash_time
+                    star_label[p_dash] = label[0][source] + to_pdash_time
+                    pi_label.from_stop[0][p_dash], pi_label.route[0][p_dash], pi_label.time[0][p_dash] = source, -1, to_pdash_time
+                    if marked_stop_dict[p_dash] == 0:
+                        marked_stop.append(p_dash)
+                        marked_stop_dict[p_dash] = 1
+
+    # Main Code
+    # Main code part 1
+    count = stats is not None  # the per-round counters are only kept when stats are recorded
+    for k in range(1, MAX_TRANSFER + 1):
+        if count:
+            round_start, marked_stops = time.perf_counter(), len(marked_stop)
+            trip_lookups, label_improvements, footpath_relaxations = 0, 0, 0
+        label_k, label_prev = label[k], label[k - 1]
+        pi_from, pi_route, pi_trip, pi_time = pi_label.from_stop[k], pi_label.route[k], pi_label.trip[k], pi_label.time[k]
+        Q.clear()
+        while marked_stop:
+            p = marked_stop.pop()
+            marked_stop_dict[p] = 0
+            for route, stp_idx in stop_route_list[p]:
+                if route not in Q or stp_idx < Q[route]:
+                    Q[route] = stp_idx
+
+        # Main code part 2
+        for route, first_stopindex_by_route in Q.items():
+            stop_list, travel_list = route_stop_list[route], route_travel_list[route]
+            boarding_point, boarding_time = -1, INF_TIME
+            for current_stopindex_by_route in range(first_stopindex_by_route, len(stop_list)):
+                p_i = stop_list[current_stopindex_by_route]
+                if boarding_point != -1:
+                    arr_by_t_at_pi = boarding_time + travel_list[current_stopindex_by_route]
+                    if arr_by_t_at_pi < min(star_label[p_i], target):
+                        if star_label[p_i] == INF_TIME:
+                            touched.append(p_i)
+                        label_k[p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                        if count:
+                            label_improvements += 1
+                        pi_from[p_i], pi_route[p_i], pi_trip[p_i], pi_time[p_i] = boarding_point, route, 0, boarding_time
+                        if p_i in egress_time:
+                            target = min(target, arr_by_t_at_pi + egress_time[p_i])
+                        if marked_stop_dict[p_i] == 0:
+                            marked_stop.append(p_i)
+                            marked_stop_dict[p_i] = 1
+                if boarding_point == -1 or label_prev[p_i] + change_time < boarding_time + travel_list[current_stopindex_by_route]:  # assuming arrival_time = departure_time
+                    boarding_point, boarding_time = p_i, label_prev[p_i]
+                    if count:
+                        trip_lookups += 1
+
+        # Main code part 3
+        marked_stop_copy = [*marked_stop]
+        for p in marked_stop_copy:
+            if count:
+                footpath_relaxations += len(footpath_list[p])
+            for p_dash, to_pdash_time in footpath_list[p]:
+                new_p_dash_time = label_k[p] + to_pdash_time
+                if label_k[p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], target):
+                    if star_label[p_dash] == INF_TIME:
+                        touched.append(p_dash)
+                    label_k[p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                    if count:
+                        label_improvements += 1
+                    pi_from[p_dash], pi_route[p_dash], pi_time[p_dash] = p, -1, to_pdash_time
+                    if p_dash in egress_time:
+                        target = min(target, new_p_dash_time + egress_time[p_dash])
+                    if marked_stop_dict[p_dash] == 0:
+                        marked_stop.append(p_dash)
+                        marked_stop_dict[p_dash] = 1
+        # Main code End
+        if count:
+            stats.add_round(k, marked_stops, len(Q), sum(len(route_stop_list[route]) - stp_idx for route, stp_idx in Q.items()), trip_lookups,
+                            label_improvements, footpath_relaxations, time.perf_counter() - round_start)
+        if not marked_stop:
+            break
+    if stats is not None:
+        stats.add_query()
+    view = LabelView(network, label, pi_label)
+    if DESTINATION_LIST is None:
+        return [view.label, view.pi_label]
+    rap_out = post_processing_multi_source(SOURCE_LIST, DESTINATION_LIST, view.pi_label, PRINT_ITINERARY, view.label, metro_cost_dict, ITINERARY)
+    return [rap_out]
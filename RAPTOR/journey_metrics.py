@@ -0,0 +1,158 @@
+"""
+Module contains the batch journey metrics engine of the compiled tweaked RAPTOR. The pareto-optimal journeys of a
+search are extracted from the array labels as flat leg arrays and the metrics of get_t_times (walk_time, wait_time,
+ovtt, ivtt, cost) are computed for all journeys at once with array operations.
+"""
+import numpy as np
+
+from RAPTOR.compiled_network import CompiledNetwork, FareMatrix, PointerLabels
+
+LEG_WALK, LEG_TRANSIT = 0, 1
+
+
+class JourneyLegs:
+    """
+    Flat leg arrays of many journeys. The legs of journey j are the entries journey_ptr[j]:journey_ptr[j + 1] of the leg
+    arrays, in travel order.
+
+    Attributes
+    ----------
+    journey_ptr (numpy.ndarray): int64, shape (journeys + 1,).
+    destination (numpy.ndarray): int64 stop index of the destination of every journey.
+    num_transfer (numpy.ndarray): int64 number of transfers of every journey (round - 1, as in post_processing_dhanus).
+    arrival_time (numpy.ndarray): arrival time (seconds) of every journey.
+    leg_mode (numpy.ndarray): LEG_WALK or LEG_TRANSIT.
+    leg_start (numpy.ndarray): boarding time (seconds) of transit legs, start of the footpath for walking legs.
+    leg_end (numpy.ndarray): arrival time (seconds) of the leg.
+    leg_duration (numpy.ndarray): duration of the leg in seconds.
+    leg_from (numpy.ndarray): stop index the leg starts at.
+    leg_to (numpy.ndarray): stop index the leg ends at.
+    """
+    __slots__ = ('journey_ptr', 'destination', 'num_transfer', 'arrival_time', 'leg_mode', 'leg_start', 'leg_end', 'leg_duration', 'leg_from',
+                 'leg_to')
+
+    def __init__(self, journey_ptr, destination, num_transfer, arrival_time, leg_mode, leg_start, leg_end, leg_duration, leg_from, leg_to):
+        self.journey_ptr = np.asarray(journey_ptr, dtype=np.int64)
+        self.destination = np.asarray(destination, dtype=np.int64)
+        self.num_transfer = np.asarray(num_transfer, dtype=np.int64)
+        self.arrival_time = np.asarray(arrival_time, dtype=np.float64)
+        self.leg_mode = np.asarray(leg_mode, dtype=np.int8)
+        self.leg_start = np.asarray(leg_start, dtype=np.float64)
+        self.leg_end = np.asarray(leg_end, dtype=np.float64)
+        self.leg_duration = np.asarray(leg_duration, dtype=np.float64)
+        self.leg_from = np.asarray(leg_from, dtype=np.int64)
+        self.leg_to = np.asarray(leg_to, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.journey_ptr) - 1
+
+
+def get_pareto_legs(label: list, pi_label: PointerLabels, destinations: list) -> JourneyLegs:
+    '''
+    Backtracks the pareto-optimal journeys to every destination from the array labels, in the order of
+    post_processing_dhanus (destinations in the given order, then most to fewest rounds).
+    Args:
+        label (list): label[round] is an array of arrival times indexed by stop index (compiled RAPTOR labels).
+        pi_label (PointerLabels): pointer labels of the search.
+        destinations (list): stop indices of the destinations.
+    Returns:
+        legs (JourneyLegs): flat legs of all journeys. Unreached destinations have no journey.
+    Examples:
+        >>> label, pi_label = raptor_compiled('P_1', None, D_TIME, 2, 1, 0, 0, network, network.fares, POST_PROCESSING=0)
+        >>> legs = get_pareto_legs(label, pi_label, [network.stop_idx['G_5']])
+    '''
+    from_stop, route, time = pi_label.from_stop, pi_label.route, pi_label.time
+    journey_ptr, destination, num_transfer, arrival_time = [0], [], [], []
+    leg_mode, leg_start, leg_end, leg_duration, leg_from, leg_to = [], [], [], [], [], []
+    for dest in destinations:
+        for k in range(len(label) - 1, -1, -1):
+            if from_stop[k][dest] == -1:
+                continue
+            destination.append(dest)
+            num_transfer.append(k - 1)
+            arrival_time.append(label[k][dest])
+            journey = []
+            stop = dest
+            while from_stop[k][stop] != -1:
+                end_time = label[k][stop]
+                if route[k][stop] == -1:
+                    journey.append((LEG_WALK, end_time - time[k][stop], end_time, time[k][stop], from_stop[k][stop], stop))
+                    stop = from_stop[k][stop]
+                else:
+                    journey.append((LEG_TRANSIT, time[k][stop], end_time, end_time - time[k][stop], from_stop[k][stop], stop))
+                    stop = from_stop[k][stop]
+                    k = k - 1
+            for mode, start, end, duration, start_stop, end_stop in reversed(journey):
+                leg_mode.append(mode)
+                leg_start.append(start)
+                leg_end.append(end)
+                leg_duration.append(duration)
+                leg_from.append(start_stop)
+                leg_to.append(end_stop)
+            journey_ptr.append(len(leg_mode))
+    return JourneyLegs(journey_ptr, destination, num_transfer, arrival_time, leg_mode, leg_start, leg_end, leg_duration, leg_from, leg_to)
+
+
+def _segment_sum(values: np.ndarray, journey_idx: np.ndarray, leg_pos: np.ndarray, n_journeys: int, max_legs: int) -> np.ndarray:
+    '''
+    Sums the leg values of every journey. Legs are added in travel order (one array addition per leg position), so the
+    result is the same as summing the legs one by one in python.
+    '''
+    padded = np.zeros((max_legs, n_journeys))
+    padded[leg_pos, journey_idx] = values
+    total = padded[0].copy() if max_legs > 0 else np.zeros(n_journeys)
+    for pos in range(1, max_legs):
+        total += padded[pos]
+    return total
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    '''
+    Same as python round(value, 2) element-wise. numpy rounds value * 100, which can differ from python (exact decimal
+    rounding) only when value * 100 is within floating point error of a tie; those values are rounded by python.
+    '''
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(value, 2) for value in values[near_tie].tolist()]
+    return rounded
+
+
+def get_batch_metrics(legs: JourneyLegs, metro_cost_dict, network: CompiledNetwork = None) -> dict:
+    '''
+    Computes the metrics of get_t_times for all journeys of legs at once.
+    Args:
+        legs (JourneyLegs): flat journey legs. See get_pareto_legs.
+        metro_cost_dict (dict/FareMatrix): fares. Format {(origin stop id, destination stop id): fare}, or network.fares.
+        network (CompiledNetwork): needed to map stop indices to stop ids if metro_cost_dict is a dict.
+    Returns:
+        metrics (dict): keys 'walk_time', 'wait_time', 'ovtt', 'ivtt' (seconds) and 'cost', values: numpy.ndarray with one
+        entry per journey. Values are equal to those of get_t_times; cost is NaN if a leg has no fare in a FareMatrix.
+    Examples:
+        >>> metrics = get_batch_metrics(legs, network.fares)
+    '''
+    n_journeys = len(legs)
+    legs_per_journey = np.diff(legs.journey_ptr)
+    journey_idx = np.repeat(np.arange(n_journeys), legs_per_journey)
+    leg_pos = np.arange(len(legs.leg_mode)) - legs.journey_ptr[journey_idx]
+    max_legs = int(legs_per_journey.max()) if n_journeys > 0 else 0
+    transit = legs.leg_mode == LEG_TRANSIT
+
+    # Waiting happens before boarding a trip that is not the first leg; walking legs start when the previous leg ends
+    previous_end = np.concatenate(([0.0], legs.leg_end[:-1]))
+    wait = np.where(transit & (leg_pos > 0), legs.leg_start - previous_end, 0.0)
+    if isinstance(metro_cost_dict, FareMatrix):
+        leg_fares = metro_cost_dict.get_fares(legs.leg_from, legs.leg_to)
+    else:
+        stop_ids = network.stop_ids
+        leg_fares = np.array([metro_cost_dict[(stop_ids[start_stop], stop_ids[end_stop])] if is_transit else 0.0
+                              for start_stop, end_stop, is_transit in zip(legs.leg_from.tolist(), legs.leg_to.tolist(), transit.tolist())])
+
+    walk_time = _round2(_segment_sum(np.where(transit, 0.0, legs.leg_duration), journey_idx, leg_pos, n_journeys, max_legs))
+    wait_time = _round2(_segment_sum(wait, journey_idx, leg_pos, n_journeys, max_legs))
+    return {'walk_time': walk_time,
+            'wait_time': wait_time,
+            'ovtt': _round2(walk_time + wait_time),
+            'ivtt': _round2(_segment_sum(np.where(transit, legs.leg_duration, 0.0), journey_idx, leg_pos, n_journeys, max_legs)),
+            'cost': _segment_sum(np.where(transit, leg_fares, 0.0), journey_idx, leg_pos, n_journeys, max_legs)}
@@ -1,7 +1,6 @@
 """
 Contains definition of classes for representing journey.
 """
-import datetime
 import pandas as pd
 
 class Journey:
@@ -11,10 +10,11 @@ class Journey:
     Works without the departure time being given as input.
     If the departure time is not given, the initial waiting time
     is ignored, if the first leg of the journey is not walking.
+    Times are kept as float seconds; datetimes are only built for printing.
     Attributes
     ----------
     transfers (int): the number of transfers in the journey.
-    journey_start_time (datetime.datetime): the starting time.
+    journey_start_time (float): the starting time in seconds.
     journey_seq (list[Legs]): list of steps in the journey.
     Methods
     -------
@@ -28,6 +28,7 @@ class Journey:
     get_ivtt(self) -> float:
         returns inside vehicle travel time in seconds.
     """
+    __slots__ = ('transfers', 'journey_start_time', 'journey_seq')
 
     def __init__(self, transfers: int, journey: list, D_TIME=None):
         """
@@ -36,59 +37,35 @@ class Journey:
         transfers (int): the number of transfers.
         journey (list): sequence of `pointer_labels' that make up the
                         journey.
-        D_TIME (datetime.datetime): starting time of the journey(optional)
+        D_TIME (pandas.datetime/float): starting time of the journey(optional)
         """
         self.transfers = transfers
         if D_TIME is not None:
-            self.journey_start_time = D_TIME.to_pydatetime()
-
+            self.journey_start_time = D_TIME.timestamp() if isinstance(D_TIME, pd.Timestamp) else float(D_TIME)
         else:
             self.journey_start_time = self._get_pseudo_start_time(journey)
         self.journey_seq = []
 
-        start_time = pd.to_datetime(self.journey_start_time, unit="s") # datetime
-
+        start_time = self.journey_start_time
         for leg in journey:
             if leg[0] == 'walking':
-                mode = 'walk'
-                duration = leg[3] # in seconds
-                end_time = pd.to_datetime(leg[4], unit="s") # datatime
-                start_id = leg[1]  # stop-id
-                stop_id = leg[2]  # stop_id
-
-                thisLeg = Leg(
-                    mode, start_time, end_time,
-                    duration, start_id, stop_id
-                )
-                self.journey_seq.append(thisLeg)
-                start_time = end_time
-
+                # ('walking', from stop id, to stop id, duration, arrival time)
+                end_time = leg[4]
+                self.journey_seq.append(Leg('walk', start_time, end_time, leg[3], leg[1], leg[2]))
             else:
-                mode = 'other'
-                start_time = pd.to_datetime(leg[0], unit="s") # datetime
-                end_time = pd.to_datetime(leg[3], unit="s")  # datetime
-                start_id = leg[1]
-                stop_id = leg[2]
-                trip_id = leg[4]
-                duration = end_time-start_time # in seconds
-
-                thisLeg = Leg(
-                    mode, start_time, end_time,
-                    duration, start_id, stop_id, trip_id
-                )
-                self.journey_seq.append(thisLeg)
-                start_time = end_time
+                # (boarding time, from stop id, to stop id, arrival time, trip id)
+                start_time, end_time = leg[0], leg[3]
+                self.journey_seq.append(Leg('other', start_time, end_time, end_time - start_time, leg[1], leg[2], leg[4]))
+            start_time = end_time
 
     def _get_pseudo_start_time(self, journey_list):
         first_leg = journey_list[0]
 
         if first_leg[0] == "walking":
-            end_time = pd.to_datetime(first_leg[4], unit="s")
-            duration = first_leg[3]
-            start_time = end_time - datetime.timedelta(seconds=duration)
+            start_time = first_leg[4] - first_leg[3]
 
         else:
-            start_time = pd.to_datetime(first_leg[0], unit="s")
+            start_time = first_leg[0]
 
         return start_time
 
@@ -110,7 +87,7 @@ class Journey:
         wt = 0
         prev_end_time = self.journey_start_time
         for leg in self.journey_seq:
-            wt += (leg.start_time - prev_end_time).total_seconds()
+            wt += leg.start_time - prev_end_time
             prev_end_time = leg.end_time
 
         return round(wt, 2)
@@ -128,17 +105,8 @@ class Journey:
         """
         tt = 0
         for leg in self.journey_seq:
-            # print()
-            # print(leg)
-            # print(leg.start_time)
-            # print(leg.mode)
-            # print(leg.duration)
-            # print(leg.trip_id)
-            # print(leg.end_time)
-            # print(leg.stop_id)
-            # print(leg.start_id)
             if leg.mode != 'walk':
-                tt += leg.duration.total_seconds()
+                tt += leg.duration
 
         return round(tt, 2)
     def get_metro_cost(self, metro_cost_dict) -> float:
@@ -160,23 +128,24 @@ class Leg:
     Attributes
     ----------
     mode (str): is either `walk' or `other'.
-    start_time (datetime.datetime): start time of the step.
-    end_time (datetime.datetime): end time of the step.
+    start_time (float): start time of the step in seconds.
+    end_time (float): end time of the step in seconds.
     duration (float): duration of the trip in seconds.
     start_id (int): stop_id of the starting point.
     stop_id (int): stop_id of the ending point.
     trip_id (str): trip_id of the trip. Is None if mode is `walk'.
     """
+    __slots__ = ('mode', 'start_time', 'end_time', 'duration', 'start_id', 'stop_id', 'trip_id')
 
-    def __init__(self, mode: str, start_time, end_time,
+    def __init__(self, mode: str, start_time: float, end_time: float,
                  duration: float, start_id: int, stop_id:int,
                  trip_id=None):
         """
         Parameters
         ----------
         mode (str): `walk' or `other'.
-        start_time (datetime.datetime): start time of the step.
-        end_time (datetime.datetime): end time of the step.
+        start_time (float): start time of the step in seconds.
+        end_time (float): end time of the step in seconds.
         duration (float): duration of the trip in seconds.
         start_id (int): `stop_id' of the initial point.
         stop_id (int): `stop_id' of the ending point.
@@ -207,9 +176,9 @@ class Leg:
                           "get down on {stop_id} at {end_time} "
                           "along {trip_id}").format(
                               start_id=self.start_id,
-                              start_time=self.start_time.time(),
+                              start_time=pd.to_datetime(self.start_time, unit="s").time(),
                               stop_id=self.stop_id,
-                              end_time=self.end_time.time(),
+                              end_time=pd.to_datetime(self.end_time, unit="s").time(),
                               trip_id=self.trip_id
                           )
-        return return_val
\ No newline at end of file
+        return return_val
@@ -3,12 +3,20 @@ Module contains function related to RAPTOR, rRAPTOR, One-To-Many rRAPTOR, HypRAP
 *tweaked raptor functions modified by Dhanus*
 """
 from collections import deque as deque
+from functools import lru_cache
 from RAPTOR.journey_rep import *
 
-import networkx as nx
 import pandas as pd
 
 
+@lru_cache(maxsize=None)
+def get_inf_time():
+    '''
+    Variable indicating infinite time (seconds). Computed once per process instead of once per query.
+    '''
+    return (pd.to_datetime("today").round(freq='H') + pd.to_timedelta("365 day")).timestamp()
+
+
 def initialize_raptor(routes_by_stop_dict: dict, SOURCE: int, MAX_TRANSFER: int) -> tuple:
     '''
     Initialize values for RAPTOR.
@@ -27,7 +35,7 @@ def initialize_raptor(routes_by_stop_dict: dict, SOURCE: int, MAX_TRANSFER: int)
     Examples:
         >>> output = initialize_raptor(routes_by_stop_dict, 20775, 4)
     '''
-    inf_time = (pd.to_datetime("today").round(freq='H') + pd.to_timedelta("365 day")).timestamp()
+    inf_time = get_inf_time()
 #    inf_time = pd.to_datetime('2022-01-15 19:00:00')
 
     pi_label = {x: {stop: -1 for stop in routes_by_stop_dict.keys()} for x in range(0, MAX_TRANSFER + 1)}
@@ -60,12 +68,20 @@ def check_stop_validity(stops, SOURCE: int, DESTINATION: int) -> None:
     return None
 
 
-def generate_mapping(stoptimes_dict, stops_file):
-    from haversine import haversine_vector, Unit
-    import numpy as np
+def generate_mapping(stoptimes_dict, stops_file, N_WORKERS: int = None):
+    '''
+    Builds OSM_dist_dict.pkl: the road distance between the OSM nodes of consecutive stops of every route. Stops are
+    mapped to their nearest OSM node once (cached in stop_OSMnode_mapping.pkl); distances are computed with batched
+    single-source Dijkstra runs in parallel and cached by graph hash. See dict_builder_functions.build_osm_dist_dict.
+    Args:
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        stops_file (pandas.dataframe): stops.txt file in GTFS.
+        N_WORKERS (int): number of worker processes. Defaults to the number of CPUs.
+    Returns:
+        OSM_dist_dict (dict): Format {(from OSM node, to OSM node): distance in meters}. Pairs without a path get 500.
+    '''
     import pickle
-    from tqdm import tqdm
-    import networkx as nx
+    from dict_builder.dict_builder_functions import build_osm_graph, map_stops_to_osm_nodes, build_osm_dist_dict
     file = open('OSMD.pickle_drive', 'rb')
     G = pickle.load(file)
     file.close()
@@ -73,29 +89,18 @@ def generate_mapping(stoptimes_dict, stops_file):
         with open('stop_OSMnode_mapping.pkl', 'rb') as pickle_file:
             stop_OSMnode_mapping = pickle.load(pickle_file)
     except FileNotFoundError:
-        temp = list(G.nodes(data=True))
-        node_names,node_cordinates =  zip(*[(x[0], (x[1]['x'], x[1]['y'])) for x in temp])
-        stop_OSMnode_mapping = {}
-        for _, stop_rwo in tqdm(stops_file.iterrows()):
-            temp = haversine_vector(node_cordinates, [(stop_rwo.stop_lon, stop_rwo.stop_lat)]*len(node_cordinates), Unit.METERS)
-            stop_OSMnode_mapping[stop_rwo.stop_id] =  node_names[np.where(temp == np.amin(temp))[0][0]]
+        _, node_points, _ = build_osm_graph(G)
+        stop_OSMnode_mapping = map_stops_to_osm_nodes(stops_file, node_points)
         with open('stop_OSMnode_mapping.pkl', 'wb') as pickle_file:
             pickle.dump(stop_OSMnode_mapping, pickle_file)
     ###############################
-    OSM_dist_dict = {}
-    error_calls, total_calls = 0, 0
-    for rid, trip_set in tqdm(stoptimes_dict.items()):
+    node_pairs = []
+    for rid, trip_set in stoptimes_dict.items():
         stop_set, _ = zip(*trip_set[0])
-        for idx in range(len(stop_set) - 1):
-            total_calls = total_calls + 1
-            s, d = stop_OSMnode_mapping[stop_set[idx]], stop_OSMnode_mapping[stop_set[idx + 1]]
-            try:
-                dist = round(nx.shortest_path_length(G, s, d, weight="length"),1)
-            except:
-                error_calls = error_calls + 1
-                dist = 500
-            OSM_dist_dict[(s,d)] = dist
-    print(f"error_calls: {error_calls}, {round(error_calls/total_calls*100,1)}%")
+        node_pairs.extend((stop_OSMnode_mapping[stop_set[idx]], stop_OSMnode_mapping[stop_set[idx + 1]]) for idx in range(len(stop_set) - 1))
+    OSM_dist_dict, failed_pairs = build_osm_dist_dict(G, node_pairs, N_WORKERS)
+    error_calls, total_calls = sum(pair in failed_pairs for pair in node_pairs), len(node_pairs)
+    print(f"error_calls: {error_calls}, {round(error_calls/max(total_calls, 1)*100,1)}%")
     with open('OSM_dist_dict.pkl', 'wb') as pickle_file:
         pickle.dump(OSM_dist_dict, pickle_file)
     return OSM_dist_dict
@@ -175,7 +180,7 @@ def post_processing(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: int, labe
         return rounds_inwhich_desti_reached, trip_set, rap_out
 
 
-def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: int, label: dict, metro_cost_dict: dict) -> tuple:
+def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: int, label: dict, metro_cost_dict: dict, ITINERARY: int = 1) -> tuple:
     '''
     Post processing for std_RAPTOR. Currently supported functionality:
         1. Rounds in which DESTINATION is reached
@@ -186,14 +191,18 @@ def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: in
         pi_label (dict): Nested dict used for backtracking. Primary keys: Round, Secondary keys: stop id. Format- {round : {stop_id: pointer_label}}
         PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
         label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+        ITINERARY (int): 1 or 0. 0 skips the Journey objects and the trip set (metrics only, for skims): the metrics are
+            summed while backtracking, without building the journeys (unless PRINT_ITINERARY is 1).
     Returns:
         rounds_inwhich_desti_reached (list): list of rounds in which DESTINATION is reached. Format - [int]
-        trip_set (list): list of trips ids required to cover optimal journeys. Format - [char]
+        trip_set (list): list of trips ids required to cover optimal journeys. Format - [char]. None if ITINERARY is 0.
         rap_out (dict):
-            keys: 'old', 'tt'. rap_out['old'] is the output of rap_out of post_processing.
+            keys: 'old', 'tt', 'journeys'. rap_out['old'] is the output of rap_out of post_processing.
             rap_out['tt'] gives the travel time information in the form
             [(num_transfers, travel_time_dict)]. (see get_t_times for
             description of travel_time_dict)
+            rap_out['journeys'] is the list of Journey objects, None if ITINERARY is 0.
     Examples:
         >>> output = post_processing(1482, pi_label, 1, label)
     '''
@@ -205,22 +214,25 @@ def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: in
         return None, None, None
     else:
         rounds_inwhich_desti_reached.reverse()
+        rap_out = [label[k][DESTINATION] for k in rounds_inwhich_desti_reached]
+        if ITINERARY == 0 and PRINT_ITINERARY != 1:
+            tt_data = [(k - 1, _get_t_times_backtrack(pi_label, k, DESTINATION, metro_cost_dict)[0]) for k in rounds_inwhich_desti_reached]
+            return rounds_inwhich_desti_reached, None, {"old": rap_out, "tt": tt_data, "journeys": None}
         pareto_set = []
         trip_set = []
-        rap_out = [label[k][DESTINATION] for k in rounds_inwhich_desti_reached]
         for k in rounds_inwhich_desti_reached:
             transfer_needed = k - 1
             journey = []
             stop = DESTINATION
-            while pi_label[k][stop] != -1:
-                journey.append(pi_label[k][stop])
-                mode = pi_label[k][stop][0]
-                if mode == 'walking':
-                    stop = pi_label[k][stop][1]
-                else:
-                    trip_set.append(pi_label[k][stop][-1])
-                    stop = pi_label[k][stop][1]
+            pointer = pi_label[k][stop]
+            while pointer != -1:
+                journey.append(pointer)
+                stop = pointer[1]
+                if pointer[0] != 'walking':
+                    if ITINERARY == 1:
+                        trip_set.append(pointer[-1])
                     k = k - 1
+                pointer = pi_label[k][stop]
             journey.reverse()
             pareto_set.append((transfer_needed, journey))
 
@@ -228,13 +240,10 @@ def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: in
             _print_Journey_legs(pareto_set)
         #        _save_routesExplored(save_routes, routes_exp)
 
-        tt_data = []
-        journeys = []
-        for trans, journey in pareto_set:
-            journeys.append(Journey(trans, journey))
-
-            ans_dict = get_t_times(journey, metro_cost_dict)
-            tt_data.append((trans, ans_dict))
+        tt_data = [(trans, get_t_times(journey, metro_cost_dict)) for trans, journey in pareto_set]
+        if ITINERARY == 0:
+            return rounds_inwhich_desti_reached, None, {"old": rap_out, "tt": tt_data, "journeys": None}
+        journeys = [Journey(trans, journey) for trans, journey in pareto_set]
 
         rap_out_new = {"old": rap_out,
                        "tt": tt_data,
@@ -243,6 +252,139 @@ def post_processing_dhanus(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: in
         return rounds_inwhich_desti_reached, trip_set, rap_out_new
 
 
+def post_processing_one_to_all(SOURCE: int, pi_label: dict, PRINT_ITINERARY: int, label: dict, metro_cost_dict: dict, ITINERARY: int = 1) -> dict:
+    '''
+    Post processing for One-To-All tweaked RAPTOR. Runs post_processing_dhanus for every stop reached from SOURCE.
+    Args:
+        SOURCE (int): stop id of source stop.
+        pi_label (dict): Nested dict used for backtracking. Primary keys: Round, Secondary keys: stop id. Format- {round : {stop_id: pointer_label}}
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        label (dict): nested dict to maintain label. Format {round : {stop_id: pandas.datetime}}.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+        ITINERARY (int): 1 or 0. 0 skips the Journey objects. See post_processing_dhanus.
+    Returns:
+        rap_out_dict (dict): keys: stop id of every reachable stop other than SOURCE, values: rap_out of post_processing_dhanus.
+    Examples:
+        >>> output = post_processing_one_to_all('P_1', pi_label, 0, label, metro_cost_dict)
+    '''
+    rap_out_dict = {}
+    for stop in pi_label[0].keys():
+        if stop == SOURCE or all(pi_label[k][stop] == -1 for k in pi_label.keys()):
+            continue
+        _, _, rap_out_dict[stop] = post_processing_dhanus(stop, pi_label, PRINT_ITINERARY, label, metro_cost_dict, ITINERARY)
+    return rap_out_dict
+
+
+
+def post_processing_multi_source(SOURCE_LIST: list, DESTINATION_LIST: list, pi_label: dict, PRINT_ITINERARY: int, label: dict, metro_cost_dict: dict,
+                                 ITINERARY: int = 1) -> dict:
+    '''
+    Post processing for multi-source tweaked RAPTOR. In every round, the egress stop with the earliest arrival (egress
+    time included) is selected. Rounds that do not improve on the arrival with fewer transfers are dropped. Round 0 is
+    skipped: an egress stop reached there only by walking from an access stop is not a transit journey.
+    Args:
+        SOURCE_LIST (list): access stops. Format [(stop id, access time in seconds)].
+        DESTINATION_LIST (list): egress stops. Format [(stop id, egress time in seconds)].
+        pi_label (dict): Nested dict used for backtracking. Primary keys: Round, Secondary keys: stop id. Format- {round : {stop_id: pointer_label}}
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        label (dict): nested dict to maintain label. Format {round : {stop_id: arrival time}}.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+        ITINERARY (int): 1 or 0. 0 skips the Journey objects. See post_processing_dhanus.
+    Returns:
+        rap_out (dict): same as post_processing_dhanus. rap_out['old'] holds the arrival times at the egress stop (egress
+        excluded). The travel_time_dict of every journey also has the keys 'source_stop', 'destination_stop',
+        'access_time' and 'egress_time' (seconds). None if no egress stop can be reached.
+    Examples:
+        >>> output = post_processing_multi_source([('P_1', 120), ('P_2', 300)], [('G_5', 60)], pi_label, 0, label, metro_cost_dict)
+    '''
+    access_time = {}
+    for stop, access in SOURCE_LIST:
+        access_time[stop] = min(access, access_time.get(stop, access))
+    best_arrival, pareto_rounds = get_inf_time(), []
+    for k in pi_label.keys():
+        if k == 0:  # round 0 only holds walks between access and egress stops, no transit journey
+            continue
+        reached = [(label[k][stop] + egress, stop, egress) for stop, egress in DESTINATION_LIST if pi_label[k][stop] != -1]
+        if reached:
+            arrival, stop, egress = min(reached, key=lambda x: x[0])
+            if arrival < best_arrival:
+                best_arrival = arrival
+                pareto_rounds.append((k, stop, egress))
+    if not pareto_rounds:
+        if PRINT_ITINERARY == 1:
+            print('DESTINATION cannot be reached with given MAX_TRANSFERS')
+        return None
+    pareto_rounds.reverse()
+    if ITINERARY == 0 and PRINT_ITINERARY != 1:
+        rap_out, tt_data = [], []
+        for k, DESTINATION, egress in pareto_rounds:
+            rap_out.append(label[k][DESTINATION])
+            ans_dict, source_stop = _get_t_times_backtrack(pi_label, k, DESTINATION, metro_cost_dict)
+            ans_dict.update(source_stop=source_stop, destination_stop=DESTINATION, access_time=access_time[source_stop], egress_time=egress)
+            tt_data.append((k - 1, ans_dict))
+        return {"old": rap_out, "tt": tt_data, "journeys": None}
+    pareto_set, rap_out = [], []
+    for k, DESTINATION, egress in pareto_rounds:
+        transfer_needed = k - 1
+        rap_out.append(label[k][DESTINATION])
+        journey = []
+        stop = DESTINATION
+        pointer = pi_label[k][stop]
+        while pointer != -1:
+            journey.append(pointer)
+            stop = pointer[1]
+            if pointer[0] != 'walking':
+                k = k - 1
+            pointer = pi_label[k][stop]
+        journey.reverse()
+        pareto_set.append((transfer_needed, journey, DESTINATION, egress))
+
+    if PRINT_ITINERARY == 1:
+        _print_Journey_legs([(trans, journey) for trans, journey, _, _ in pareto_set])
+
+    tt_data = []
+    for trans, journey, DESTINATION, egress in pareto_set:
+        ans_dict = get_t_times(journey, metro_cost_dict)
+        ans_dict.update(source_stop=journey[0][1], destination_stop=DESTINATION, access_time=access_time[journey[0][1]], egress_time=egress)
+        tt_data.append((trans, ans_dict))
+    journeys = [Journey(trans, journey) for trans, journey, _, _ in pareto_set] if ITINERARY == 1 else None
+    return {"old": rap_out, "tt": tt_data, "journeys": journeys}
+
+
+def _get_t_times_backtrack(pi_label: dict, k: int, DESTINATION, metro_cost_dict: dict) -> tuple:
+    '''
+    Same as get_t_times, summed while backtracking the journey to DESTINATION found in round k, without building the
+    journey. Parent Function: post_processing_dhanus, post_processing_multi_source
+    Args:
+        pi_label (dict): Nested dict used for backtracking. Format- {round : {stop_id: pointer_label}}
+        k (int): round in which DESTINATION is reached.
+        DESTINATION (int): stop id of destination stop.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+    Returns:
+        result_dict (dict): see get_t_times.
+        first_stop (int): stop id where the journey starts.
+    '''
+    walk_time, wait_time, ivtt, cost = 0, 0, 0, 0
+    boarding_time = None  # boarding time of the later trip leg, waiting for the end of the leg before it
+    stop = DESTINATION
+    pointer = pi_label[k][stop]
+    while pointer != -1:
+        if pointer[0] == 'walking':
+            end_time = pointer[4]
+            walk_time += pointer[3]
+        else:
+            end_time = pointer[3]
+            ivtt += pointer[3] - pointer[0]
+            cost += metro_cost_dict[(pointer[1], pointer[2])]
+            k = k - 1
+        if boarding_time is not None:
+            wait_time += boarding_time - end_time
+        boarding_time = pointer[0] if pointer[0] != 'walking' else None
+        stop = pointer[1]
+        pointer = pi_label[k][stop]
+    walk_time, wait_time = round(walk_time, 2), round(wait_time, 2)
+    return {'walk_time': walk_time, 'wait_time': wait_time, 'ovtt': round(walk_time + wait_time, 2), 'ivtt': round(ivtt, 2), 'cost': cost}, stop
+
 
 def _print_Journey_legs(pareto_journeys: list) -> None:
     '''
@@ -274,24 +416,43 @@ def get_t_times(journey: list, metro_cost_dict: dict, D_TIME=None) -> dict:
     wait_time: time in seconds spent waiting.
     ovtt: outside vehicle travel time (walk_time + wait_time).
     ivtt: inside vehicle travel time.
+    The values are computed in one pass over the pointer labels and are the same as the Journey methods give, without
+    building the Journey.
     Args:
         journey (list): list of `pointer_labels' of the journey.
-        D_TIME (datetime.datetime): departure time.
+        D_TIME (pandas.datetime/float): departure time.
     Return:
         result_dict (dict): dictionary with keys
             * `walk_time'
             * `wait_time'
             * `ovtt'
-            * `ivtt'.
+            * `ivtt'
+            * `cost'.
             And values being the corresponding values in
-            seconds.
+            seconds (fare for cost).
     """
-    j_obj = Journey(0, journey, D_TIME)
-    result_dict = {'walk_time': j_obj.get_walk_time(),
-                   'wait_time':j_obj.get_wait_time(),
-                   'ovtt': j_obj.get_ovtt(),
-                   'ivtt': j_obj.get_ivtt(),
-                   'cost': j_obj.get_metro_cost(metro_cost_dict)
+    if D_TIME is not None:
+        prev_end_time = D_TIME.timestamp() if isinstance(D_TIME, pd.Timestamp) else float(D_TIME)
+    elif journey[0][0] == 'walking':
+        prev_end_time = journey[0][4] - journey[0][3]
+    else:
+        prev_end_time = journey[0][0]
+    walk_time, wait_time, ivtt, cost = 0, 0, 0, 0
+    for leg in journey:
+        if leg[0] == 'walking':  # a walk starts when the previous leg ends, no waiting
+            walk_time += leg[3]
+            prev_end_time = leg[4]
+        else:
+            wait_time += leg[0] - prev_end_time
+            ivtt += leg[3] - leg[0]
+            cost += metro_cost_dict[(leg[1], leg[2])]
+            prev_end_time = leg[3]
+    walk_time, wait_time = round(walk_time, 2), round(wait_time, 2)
+    result_dict = {'walk_time': walk_time,
+                   'wait_time': wait_time,
+                   'ovtt': round(walk_time + wait_time, 2),
+                   'ivtt': round(ivtt, 2),
+                   'cost': cost
                    }
 
     return result_dict
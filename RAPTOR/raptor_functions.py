@@ -1,11 +1,22 @@
 """
 Module contains function related to RAPTOR, rRAPTOR, One-To-Many rRAPTOR, HypRAPTOR
 """
+from bisect import bisect_left
 from collections import deque as deque
+from functools import lru_cache
 
+import numpy as np
 import pandas as pd
 
 
+@lru_cache(maxsize=None)
+def get_inf_time():
+    '''
+    Variable indicating infinite time (pandas.datetime). Computed once per process instead of once per query.
+    '''
+    return pd.to_datetime("today").round(freq='H') + pd.to_timedelta("365 day")
+
+
 def initialize_raptor(routes_by_stop_dict: dict, SOURCE: int, MAX_TRANSFER: int) -> tuple:
     '''
     Initialize values for RAPTOR.
@@ -27,7 +38,7 @@ def initialize_raptor(routes_by_stop_dict: dict, SOURCE: int, MAX_TRANSFER: int)
     Examples:
         >>> output = initialize_raptor(routes_by_stop_dict, 20775, 4)
     '''
-    inf_time = pd.to_datetime("today").round(freq='H') + pd.to_timedelta("365 day")
+    inf_time = get_inf_time()
 #    inf_time = pd.to_datetime('2022-01-15 19:00:00')
 
     pi_label = {x: {stop: -1 for stop in routes_by_stop_dict.keys()} for x in range(0, MAX_TRANSFER + 1)}
@@ -91,6 +102,118 @@ def get_latest_trip_new(stoptimes_dict: dict, route: int, arrival_time_at_pi, pi
         return -1, -1  # No trip exsist for this route. in this case check tripid from trip file for this route and then look waybill.ID. Likely that trip is across days thats why it is rejected in stoptimes builder while checking
 
 
+def build_departure_index(stoptimes_dict: dict) -> dict:
+    '''
+    Builds a per (route, stop index) sorted departure time index for binary-search boarding.
+
+    Args:
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+
+    Returns:
+        departure_index (dict): keys: route id, values: list (one entry per stop index) of sorted arrival times of the
+        trips in nanoseconds (pandas.datetime.value). The value is None for routes whose trips overtake each other, for
+        which boarding falls back to the linear scan.
+
+    Examples:
+        >>> departure_index = build_departure_index(stoptimes_dict)
+    '''
+    departure_index = {}
+    for route, route_trips in stoptimes_dict.items():
+        stop_columns = [[trip[stop_pos][1].value for trip in route_trips] for stop_pos in range(len(route_trips[0]))] if route_trips else []
+        is_fifo = all(all(x <= y for x, y in zip(column, column[1:])) for column in stop_columns)
+        departure_index[route] = stop_columns if is_fifo else None
+    return departure_index
+
+
+_departure_index_cache = [None, None]  # [stoptimes_dict, departure_index] of the last call
+
+
+def get_departure_index(stoptimes_dict: dict) -> dict:
+    '''
+    Returns the departure index of stoptimes_dict, building it only when a different stoptimes_dict is passed.
+    Note: the index is not rebuilt if stoptimes_dict is modified in place (e.g. by check_nonoverlap).
+
+    Args:
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+
+    Returns:
+        departure_index (dict): see build_departure_index.
+    '''
+    if _departure_index_cache[0] is not stoptimes_dict:
+        _departure_index_cache[:] = [stoptimes_dict, build_departure_index(stoptimes_dict)]
+    return _departure_index_cache[1]
+
+
+def get_latest_trip_bisect(stoptimes_dict: dict, departure_index: dict, route: int, arrival_time_at_pi, pi_index: int, change_time) -> tuple:
+    '''
+    Same as get_latest_trip_new, but boards with a binary search over the departure index in O(log T).
+
+    Args:
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        departure_index (dict): see build_departure_index.
+        route (int): id of route.
+        arrival_time_at_pi (pandas.datetime): arrival time at stop pi.
+        pi_index (int): index of the stop from which route was boarded.
+        change_time (pandas.datetime): change time at stop (set to 0).
+
+    Returns:
+        If a trip exists:
+            trip index, trip
+        else:
+            -1,-1   (e.g. when there is no trip after the given timestamp)
+
+    Examples:
+        >>> output = get_latest_trip_bisect(stoptimes_dict, departure_index, 1000, pd.to_datetime('2019-06-10 17:40:00'), 0, pd.to_timedelta(0, unit='seconds'))
+    '''
+    try:
+        stop_columns = departure_index[route]
+    except KeyError:
+        return -1, -1
+    if stop_columns is None:
+        return get_latest_trip_new(stoptimes_dict, route, arrival_time_at_pi, pi_index, change_time)
+    if not stop_columns:
+        return -1, -1  # No trip exsist for this route.
+    trip_idx = bisect_left(stop_columns[pi_index], (arrival_time_at_pi + change_time).value)
+    if trip_idx == len(stop_columns[pi_index]):
+        return -1, -1
+    return f'{route}_{trip_idx}', stoptimes_dict[route][trip_idx]
+
+
+def get_latest_trip_compiled(network, route: int, arrival_time_at_pi: float, pi_index: int, change_time: float) -> tuple:
+    '''
+    Get latest trip after a certain timestamp from the given stop of a route (compiled network version of
+    get_latest_trip_new). Uses binary search over the sorted departures of the stop when the route is FIFO.
+
+    Args:
+        network (CompiledNetwork): compiled network.
+        route (int): route index.
+        arrival_time_at_pi (float): arrival time at stop pi in seconds.
+        pi_index (int): index of the stop from which route was boarded.
+        change_time (float): change time at stop in seconds (set to 0).
+
+    Returns:
+        If a trip exists:
+            trip index, list of arrival times (seconds) of the trip at the stops of the route
+        else:
+            -1,-1   (e.g. when there is no trip after the given timestamp)
+
+    Examples:
+        >>> output = get_latest_trip_compiled(network, 0, 1673586000.0, 0, 0)
+    '''
+    stop_times = network.route_stop_times[route]
+    departures = stop_times[pi_index]
+    if network.route_fifo[route]:
+        trip_idx = int(departures.searchsorted(arrival_time_at_pi + change_time))
+        if trip_idx == len(departures):
+            return -1, -1
+    else:
+        valid_trips = np.flatnonzero(departures >= arrival_time_at_pi + change_time)
+        if len(valid_trips) == 0:
+            return -1, -1
+        trip_idx = int(valid_trips[0])
+    return trip_idx, stop_times[:, trip_idx].tolist()
+
+
 def post_processing(DESTINATION: int, pi_label: dict, PRINT_ITINERARY: int, label: dict) -> tuple:
     '''
     Post processing for std_RAPTOR. Currently supported functionality:
@@ -0,0 +1,84 @@
+"""
+Module contains the per-round instrumentation counters of the RAPTOR implementations. Pass a RaptorStats object as
+`stats` to a RAPTOR function to record how much work every round does; counters add up across all queries run with
+the same object (e.g. a whole skim run). Without it (stats=None) the counters are skipped, behind one local flag.
+"""
+import pandas as pd
+
+ROUND_COUNTERS = ('marked_stops', 'routes_in_q', 'stops_scanned', 'trip_lookups', 'label_improvements', 'footpath_relaxations', 'seconds')
+
+
+class RaptorStats:
+    """
+    Per-round RAPTOR counters, summed over queries.
+
+    Attributes
+    ----------
+    queries (int): number of queries recorded.
+    rounds (dict): keys: round k (1 to MAX_TRANSFER), values: dict with the sum over all queries of
+        marked_stops: stops marked at the start of the round.
+        routes_in_q: routes scanned in the round (size of Q).
+        stops_scanned: stops visited while scanning the routes.
+        trip_lookups: trips looked up (boardings, for tweaked RAPTOR).
+        label_improvements: labels improved by a trip or a footpath.
+        footpath_relaxations: footpaths checked.
+        seconds: time spent in the round.
+        rounds_run: queries that ran the round (a query stops early once no stop is marked).
+
+    Examples:
+        >>> stats = RaptorStats()
+        >>> output = raptor_compiled('P_1', 'G_5', D_TIME, 2, 1, 0, 0, network, metro_cost_dict, stats=stats)
+        >>> print(stats)
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.rounds = {}
+
+    def add_round(self, k: int, marked_stops: int, routes_in_q: int, stops_scanned: int, trip_lookups: int, label_improvements: int,
+                  footpath_relaxations: int, seconds: float) -> None:
+        """
+        Adds the counts of round k of one query.
+        """
+        counts = self.rounds.get(k)
+        if counts is None:
+            counts = self.rounds[k] = dict.fromkeys(ROUND_COUNTERS + ('rounds_run',), 0)
+        counts['marked_stops'] += marked_stops
+        counts['routes_in_q'] += routes_in_q
+        counts['stops_scanned'] += stops_scanned
+        counts['trip_lookups'] += trip_lookups
+        counts['label_improvements'] += label_improvements
+        counts['footpath_relaxations'] += footpath_relaxations
+        counts['seconds'] += seconds
+        counts['rounds_run'] += 1
+
+    def add_query(self) -> None:
+        self.queries += 1
+
+    def merge(self, other: 'RaptorStats') -> None:
+        """
+        Adds the counts of other (e.g. recorded by a skim worker process) to this object.
+        """
+        self.queries += other.queries
+        for k, other_counts in other.rounds.items():
+            counts = self.rounds.setdefault(k, dict.fromkeys(other_counts, 0))
+            for name, value in other_counts.items():
+                counts[name] += value
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the counters as a dataframe with one row per round (index 'round') and a 'total' row.
+        """
+        frame = pd.DataFrame.from_dict(self.rounds, orient='index', columns=ROUND_COUNTERS + ('rounds_run',)).sort_index()
+        frame = pd.concat([frame, frame.sum().to_frame('total').T.astype(frame.dtypes)])
+        frame.index.name = 'round'
+        return frame
+
+    def __str__(self):
+        frame = self.to_frame()
+        per_query = frame[list(ROUND_COUNTERS)].div(max(self.queries, 1))
+        per_query['seconds'] *= 1000
+        per_query = per_query.rename(columns={'seconds': 'ms'})
+        with pd.option_context('display.width', 250, 'display.max_columns', None):
+            return f"RAPTOR stats over {self.queries} queries\n{frame.to_string(float_format=lambda value: f'{value:.4f}')}\n" \
+                   f"per query:\n{per_query.to_string(float_format=lambda value: f'{value:.3f}')}"
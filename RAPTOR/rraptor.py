@@ -0,0 +1,197 @@
+"""
+Module contains rRAPTOR (range RAPTOR) implementation on the compiled network.
+All departures from the source within a departure window are processed in decreasing order of time and the labels of a
+departure are reused as upper bounds for the next (earlier) one, instead of running an independent query per departure.
+"""
+import numpy as np
+
+from RAPTOR.compiled_network import CompiledNetwork, get_workspace, initialize_raptor_compiled, to_seconds, INF_TIME
+from RAPTOR.raptor_functions import get_latest_trip_compiled
+
+PROFILE_METRICS = ('arrival_time', 'ivtt', 'waiting_time', 'walk_time', 'num_transfer')
+
+
+def get_departure_times(network: CompiledNetwork, source: int, START_TIME: float, END_TIME: float, WALKING_FROM_SOURCE: int) -> np.ndarray:
+    '''
+    Collects the times at which leaving the source can lead to a new trip: departures of all routes through the source
+    (and, if walking is allowed, through the stops reachable by walking, shifted by the footpath duration) within
+    [START_TIME, END_TIME]. END_TIME itself is always included so that the last part of the window is covered.
+
+    Args:
+        network (CompiledNetwork): compiled network.
+        source (int): stop index of source stop.
+        START_TIME (float): start of the departure window in seconds.
+        END_TIME (float): end of the departure window in seconds.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+
+    Returns:
+        departure_times (numpy.ndarray): unique departure times in decreasing order.
+    '''
+    access = [(source, 0.0)]
+    if WALKING_FROM_SOURCE == 1:
+        access.extend(network.footpath_list[source])
+    departure_times = [np.array([END_TIME])]
+    for stop, walk_time in access:
+        for route, stop_pos in network.stop_route_list[stop]:
+            departure_times.append(network.route_stop_times[route][stop_pos] - walk_time)
+    departure_times = np.unique(np.concatenate(departure_times))
+    departure_times = departure_times[(departure_times >= START_TIME) & (departure_times <= END_TIME)]
+    return departure_times[::-1]
+
+
+def _get_profile_entry(label: list, pi_label, destination: int, departure_time: float) -> tuple:
+    '''
+    Backtracks the earliest arrival journey to destination from the array labels and computes its metrics.
+    Parent Function: rraptor_compiled
+
+    Returns:
+        (arrival time, ivtt, waiting time, walking time, number of transfers) in seconds, or None if not reachable.
+    '''
+    best_round, arrival_time = -1, INF_TIME
+    for k in range(len(label)):
+        if pi_label.from_stop[k][destination] != -1 and label[k][destination] < arrival_time:
+            best_round, arrival_time = k, label[k][destination]
+    if best_round == -1:
+        return None
+    ivtt, walk_time, k, stop = 0.0, 0.0, best_round, destination
+    while pi_label.from_stop[k][stop] != -1:
+        if pi_label.route[k][stop] == -1:
+            walk_time += pi_label.time[k][stop]
+            stop = pi_label.from_stop[k][stop]
+        else:
+            ivtt += label[k][stop] - pi_label.time[k][stop]
+            stop = pi_label.from_stop[k][stop]
+            k = k - 1
+    waiting_time = arrival_time - departure_time - ivtt - walk_time
+    return arrival_time, ivtt, waiting_time, walk_time, max(best_round - 1, 0)
+
+
+def rraptor_compiled(SOURCE: int, START_TIME, END_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, network: CompiledNetwork,
+                     DESTINATION_LIST: list = None, workspace=None) -> tuple:
+    '''
+    rRAPTOR for a departure window on the compiled network. Labels are kept between consecutive departures.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        START_TIME (pandas.datetime/float): start of the departure window.
+        END_TIME (pandas.datetime/float): end of the departure window.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        network (CompiledNetwork): compiled network with trip times. See compile_network.
+        DESTINATION_LIST (list): stop ids for which the profile is returned. Defaults to all stops but SOURCE.
+        workspace (RaptorWorkspace): optional. Label buffers to use. Defaults to the workspace of the network.
+
+    Returns:
+        departure_times (numpy.ndarray): processed departure times (seconds) in increasing order.
+        profile (dict): keys: destination stop id, values: numpy.ndarray of shape (len(departure_times), len(PROFILE_METRICS)).
+        Row i holds the metrics (seconds) of the earliest arrival journey when leaving SOURCE at departure_times[i]; the
+        waiting time includes the initial wait at SOURCE. Rows are NaN when the destination is not reachable.
+
+    Examples:
+        >>> departure_times, profile = rraptor_compiled('P_1', pd.to_datetime('2023-01-09 07:00:00'), pd.to_datetime('2023-01-09 10:00:00'), 2, 1, 0, network)
+    '''
+    source = network.stop_idx[SOURCE]
+    if DESTINATION_LIST is None:
+        DESTINATION_LIST = [stop for stop in network.stop_ids if stop != SOURCE]
+    destinations = [network.stop_idx[stop] for stop in DESTINATION_LIST]
+    route_stop_list, stop_route_list, footpath_list = network.route_stop_list, network.stop_route_list, network.footpath_list
+    change_time = float(CHANGE_TIME_SEC)
+    departure_times = get_departure_times(network, source, to_seconds(START_TIME), to_seconds(END_TIME), WALKING_FROM_SOURCE)
+    profile = np.full((len(destinations), len(departure_times), len(PROFILE_METRICS)), np.nan)
+
+    # Initialization (once for the whole window)
+    workspace = get_workspace(network, MAX_TRANSFER) if workspace is None else workspace
+    marked_stop, marked_stop_dict, label, pi_label, star_label, touched = initialize_raptor_compiled(workspace, source, MAX_TRANSFER)
+    Q = {}  # Format of Q is {route index:stop index}
+    for dep_idx, D_TIME in enumerate(departure_times.tolist()):
+        if star_label[source] == INF_TIME:
+            touched.append(source)
+        (label[0][source], star_label[source]) = (D_TIME, D_TIME)
+        marked_stop_dict[source] = 1
+        if not marked_stop:
+            marked_stop.append(source)
+        if WALKING_FROM_SOURCE == 1:
+            for p_dash, to_pdash_time in footpath_list[source]:
+                if D_TIME + to_pdash_time < star_label[p_dash]:
+                    if star_label[p_dash] == INF_TIME:
+                        touched.append(p_dash)
+                    label[0][p_dash], star_label[p_dash] = D_TIME + to_pdash_time, D_TIME + to_pdash_time
+                    pi_label.from_stop[0][p_dash], pi_label.route[0][p_dash], pi_label.time[0][p_dash] = source, -1, to_pdash_time
+                    if marked_stop_dict[p_dash] == 0:
+                        marked_stop.append(p_dash)
+                        marked_stop_dict[p_dash] = 1
+
+        for k in range(1, MAX_TRANSFER + 1):
+            label_k, label_prev = label[k], label[k - 1]
+            pi_from, pi_route, pi_trip, pi_time = pi_label.from_stop[k], pi_label.route[k], pi_label.trip[k], pi_label.time[k]
+            Q.clear()
+            while marked_stop:
+                p = marked_stop.pop()
+                marked_stop_dict[p] = 0
+                for route, stp_idx in stop_route_list[p]:
+                    if route not in Q or stp_idx < Q[route]:
+                        Q[route] = stp_idx
+
+            for route, first_stopindex_by_route in Q.items():
+                stop_list = route_stop_list[route]
+                current_trip_t = -1
+                for current_stopindex_by_route in range(first_stopindex_by_route, len(stop_list)):
+                    p_i = stop_list[current_stopindex_by_route]
+                    if current_trip_t != -1 and current_trip_t[current_stopindex_by_route] < star_label[p_i]:
+                        arr_by_t_at_pi = current_trip_t[current_stopindex_by_route]
+                        if star_label[p_i] == INF_TIME:
+                            touched.append(p_i)
+                        label_k[p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                        pi_from[p_i], pi_route[p_i], pi_trip[p_i], pi_time[p_i] = boarding_point, route, tid, boarding_time
+                        if marked_stop_dict[p_i] == 0:
+                            marked_stop.append(p_i)
+                            marked_stop_dict[p_i] = 1
+                    if current_trip_t == -1 or label_prev[p_i] + change_time < current_trip_t[current_stopindex_by_route]:
+                        tid, current_trip_t = get_latest_trip_compiled(network, route, label_prev[p_i], current_stopindex_by_route, change_time)
+                        if current_trip_t != -1:
+                            boarding_point = p_i
+                            boarding_time = current_trip_t[current_stopindex_by_route]
+
+            marked_stop_copy = [*marked_stop]
+            for p in marked_stop_copy:
+                for p_dash, to_pdash_time in footpath_list[p]:
+                    new_p_dash_time = label_k[p] + to_pdash_time
+                    if label_k[p_dash] > new_p_dash_time and new_p_dash_time < star_label[p_dash]:
+                        if star_label[p_dash] == INF_TIME:
+                            touched.append(p_dash)
+                        label_k[p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                        pi_from[p_dash], pi_route[p_dash], pi_time[p_dash] = p, -1, to_pdash_time
+                        if marked_stop_dict[p_dash] == 0:
+                            marked_stop.append(p_dash)
+                            marked_stop_dict[p_dash] = 1
+            if not marked_stop:
+                break
+        while marked_stop:  # Stops still marked after the last round are not carried over to the next departure
+            marked_stop_dict[marked_stop.pop()] = 0
+
+        for d_idx, destination in enumerate(destinations):
+            entry = _get_profile_entry(label, pi_label, destination, D_TIME)
+            if entry is not None:
+                profile[d_idx, dep_idx] = entry
+    departure_times, profile = departure_times[::-1], profile[:, ::-1]
+    return departure_times, {stop: profile[d_idx] for d_idx, stop in enumerate(DESTINATION_LIST)}
+
+
+def get_profile_at(departure_times: np.ndarray, destination_profile: np.ndarray, query_times: np.ndarray) -> np.ndarray:
+    '''
+    Evaluates a destination profile at arbitrary departure times: leaving at time t, the traveller takes the journey of
+    the first processed departure at or after t and waits at the source in between.
+
+    Args:
+        departure_times (numpy.ndarray): processed departure times in increasing order (output of rraptor_compiled).
+        destination_profile (numpy.ndarray): profile of one destination (output of rraptor_compiled).
+        query_times (numpy.ndarray): departure times (seconds) within the window.
+
+    Returns:
+        metrics (numpy.ndarray): shape (len(query_times), len(PROFILE_METRICS)).
+    '''
+    dep_idx = np.searchsorted(departure_times, query_times, side='left')
+    metrics = destination_profile[dep_idx].copy()
+    metrics[:, PROFILE_METRICS.index('waiting_time')] += departure_times[dep_idx] - query_times
+    return metrics
@@ -1,10 +1,12 @@
 """
 Module contains RAPTOR implementation.
 """
+import time
 
 from RAPTOR.raptor_functions import *
+from RAPTOR.compiled_network import CompiledNetwork, LabelView, get_workspace, initialize_raptor_compiled, to_seconds, INF_TIME
 
-def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict) -> list:
+def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,routes_by_stop_dict: dict, stops_dict: dict, stoptimes_dict: dict, footpath_dict: dict, idx_by_route_stop_dict: dict, departure_index: dict = None, stats=None) -> list:
     '''
     Standard Raptor implementation
 
@@ -21,6 +23,8 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
         stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
         footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
         idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        departure_index (dict): optional. See build_departure_index. Defaults to the cached index of stoptimes_dict.
+        stats (RaptorStats): optional. Per-round counters the query is added to. See RAPTOR.raptor_stats.
 
     Returns:
         out (list): list of pareto-optimal arrival timestamps.
@@ -37,6 +41,8 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
     # Initialization
     marked_stop, marked_stop_dict, label, pi_label, star_label, inf_time = initialize_raptor(routes_by_stop_dict, SOURCE, MAX_TRANSFER)
     change_time = pd.to_timedelta(CHANGE_TIME_SEC, unit='seconds')
+    if departure_index is None:
+        departure_index = get_departure_index(stoptimes_dict)
     (label[0][SOURCE], star_label[SOURCE]) = (D_TIME, D_TIME)
     Q = {}  # Format of Q is {route:stop index}
     if WALKING_FROM_SOURCE == 1:
@@ -55,7 +61,11 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
 
     # Main Code
     # Main code part 1
+    count = stats is not None  # the per-round counters are only kept when stats are recorded
     for k in range(1, MAX_TRANSFER + 1):
+        if count:
+            round_start, marked_stops = time.perf_counter(), len(marked_stop)
+            trip_lookups, label_improvements, footpath_relaxations = 0, 0, 0
         Q.clear()
         while marked_stop:
             p = marked_stop.pop()
@@ -78,12 +88,16 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
                 if current_trip_t != -1 and current_trip_t[current_stopindex_by_route][1] < min(star_label[p_i], star_label[DESTINATION]):
                     arr_by_t_at_pi = current_trip_t[current_stopindex_by_route][1]
                     label[k][p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                    if count:
+                        label_improvements += 1
                     pi_label[k][p_i] = (boarding_time, boarding_point, p_i, arr_by_t_at_pi, tid)
                     if marked_stop_dict[p_i] == 0:
                         marked_stop.append(p_i)
                         marked_stop_dict[p_i] = 1
                 if current_trip_t == -1 or label[k - 1][p_i] + change_time < current_trip_t[current_stopindex_by_route][1]:  # assuming arrival_time = departure_time
-                    tid, current_trip_t = get_latest_trip_new(stoptimes_dict, route, label[k - 1][p_i], current_stopindex_by_route, change_time)
+                    if count:
+                        trip_lookups += 1
+                    tid, current_trip_t = get_latest_trip_bisect(stoptimes_dict, departure_index, route, label[k - 1][p_i], current_stopindex_by_route, change_time)
                     if current_trip_t == -1:
                         boarding_time, boarding_point = -1, -1
                     else:
@@ -96,11 +110,15 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
         for p in marked_stop_copy:
             try:
                 trans_info = footpath_dict[p]
+                if count:
+                    footpath_relaxations += len(trans_info)
                 for i in trans_info:
                     (p_dash, to_pdash_time) = i
                     new_p_dash_time = label[k][p] + to_pdash_time
                     if label[k][p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], star_label[DESTINATION]):
                         label[k][p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                        if count:
+                            label_improvements += 1
                         pi_label[k][p_dash] = ('walking', p, p_dash, to_pdash_time, new_p_dash_time)
                         if marked_stop_dict[p_dash] == 0:
                             marked_stop.append(p_dash)
@@ -108,10 +126,133 @@ def raptor(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FRO
             except KeyError:
                 continue
         # Main code End
+        if count:
+            stats.add_round(k, marked_stops, len(Q), sum(len(stops_dict[route]) - stp_idx for route, stp_idx in Q.items()), trip_lookups,
+                            label_improvements, footpath_relaxations, time.perf_counter() - round_start)
         if marked_stop == deque([]):
             if PRINT_ITINERARY == 1:pass
                 # print('code ended with termination condition')
             break
+    if stats is not None:
+        stats.add_query()
     _, _, rap_out = post_processing(DESTINATION, pi_label, PRINT_ITINERARY, label)
     out.append(rap_out)
     return out
+
+
+def raptor_compiled(SOURCE: int, DESTINATION: int, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int, network: CompiledNetwork, workspace=None, stats=None) -> list:
+    '''
+    Standard Raptor on the compiled (integer-indexed, array-backed) network. Produces the same output as raptor.
+
+    Args:
+        SOURCE (int): stop id of source stop.
+        DESTINATION (int): stop id of destination stop.
+        D_TIME (pandas.datetime): departure time.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        network (CompiledNetwork): compiled network. See compile_network.
+        workspace (RaptorWorkspace): optional. Label buffers to use. Defaults to the workspace of the network.
+        stats (RaptorStats): optional. Per-round counters the query is added to. See RAPTOR.raptor_stats.
+
+    Returns:
+        out (list): list of pareto-optimal arrival timestamps.
+
+    Examples:
+        >>> output = raptor_compiled(20775, 1482, pd.to_datetime('2019-06-10 00:00:00'), 4, 1, 0, 1, network)
+        >>> print(f"Optimal arrival time are: {output}")
+    '''
+    out = []
+    source, destination = network.stop_idx[SOURCE], network.stop_idx[DESTINATION]
+    route_stop_list, stop_route_list, footpath_list = network.route_stop_list, network.stop_route_list, network.footpath_list
+    # Initialization
+    workspace = get_workspace(network, MAX_TRANSFER) if workspace is None else workspace
+    marked_stop, marked_stop_dict, label, pi_label, star_label, touched = initialize_raptor_compiled(workspace, source, MAX_TRANSFER)
+    change_time = float(CHANGE_TIME_SEC)
+    D_TIME = to_seconds(D_TIME)
+    (label[0][source], star_label[source]) = (D_TIME, D_TIME)
+    touched.append(source)
+    Q = {}  # Format of Q is {route index:stop index}
+    if WALKING_FROM_SOURCE == 1:
+        for p_dash, to_pdash_time in footpath_list[source]:
+            if star_label[p_dash] == INF_TIME:
+                touched.append(p_dash)
+            label[0][p_dash] = D_TIME + to_pdash_time
+            star_label[p_dash] = D_TIME + to_pdash_time
+            pi_label.from_stop[0][p_dash], pi_label.route[0][p_dash], pi_label.time[0][p_dash] = source, -1, to_pdash_time
+            if marked_stop_dict[p_dash] == 0:
+                marked_stop.append(p_dash)
+                marked_stop_dict[p_dash] = 1
+
+    # Main Code
+    # Main code part 1
+    count = stats is not None  # the per-round counters are only kept when stats are recorded
+    for k in range(1, MAX_TRANSFER + 1):
+        if count:
+            round_start, marked_stops = time.perf_counter(), len(marked_stop)
+            trip_lookups, label_improvements, footpath_relaxations = 0, 0, 0
+        label_k, label_prev = label[k], label[k - 1]
+        pi_from, pi_route, pi_trip, pi_time = pi_label.from_stop[k], pi_label.route[k], pi_label.trip[k], pi_label.time[k]
+        Q.clear()
+        while marked_stop:
+            p = marked_stop.pop()
+            marked_stop_dict[p] = 0
+            for route, stp_idx in stop_route_list[p]:
+                if route not in Q or stp_idx < Q[route]:
+                    Q[route] = stp_idx
+
+        # Main code part 2
+        for route, first_stopindex_by_route in Q.items():
+            stop_list = route_stop_list[route]
+            current_trip_t = -1
+            for current_stopindex_by_route in range(first_stopindex_by_route, len(stop_list)):
+                p_i = stop_list[current_stopindex_by_route]
+                if current_trip_t != -1 and current_trip_t[current_stopindex_by_route] < min(star_label[p_i], star_label[destination]):
+                    arr_by_t_at_pi = current_trip_t[current_stopindex_by_route]
+                    if star_label[p_i] == INF_TIME:
+                        touched.append(p_i)
+                    label_k[p_i], star_label[p_i] = arr_by_t_at_pi, arr_by_t_at_pi
+                    if count:
+                        label_improvements += 1
+                    pi_from[p_i], pi_route[p_i], pi_trip[p_i], pi_time[p_i] = boarding_point, route, tid, boarding_time
+                    if marked_stop_dict[p_i] == 0:
+                        marked_stop.append(p_i)
+                        marked_stop_dict[p_i] = 1
+                if current_trip_t == -1 or label_prev[p_i] + change_time < current_trip_t[current_stopindex_by_route]:  # assuming arrival_time = departure_time
+                    if count:
+                        trip_lookups += 1
+                    tid, current_trip_t = get_latest_trip_compiled(network, route, label_prev[p_i], current_stopindex_by_route, change_time)
+                    if current_trip_t != -1:
+                        boarding_point = p_i
+                        boarding_time = current_trip_t[current_stopindex_by_route]
+
+        # Main code part 3
+        marked_stop_copy = [*marked_stop]
+        for p in marked_stop_copy:
+            if count:
+                footpath_relaxations += len(footpath_list[p])
+            for p_dash, to_pdash_time in footpath_list[p]:
+                new_p_dash_time = label_k[p] + to_pdash_time
+                if label_k[p_dash] > new_p_dash_time and new_p_dash_time < min(star_label[p_dash], star_label[destination]):
+                    if star_label[p_dash] == INF_TIME:
+                        touched.append(p_dash)
+                    label_k[p_dash], star_label[p_dash] = new_p_dash_time, new_p_dash_time
+                    if count:
+                        label_improvements += 1
+                    pi_from[p_dash], pi_route[p_dash], pi_time[p_dash] = p, -1, to_pdash_time
+                    if marked_stop_dict[p_dash] == 0:
+                        marked_stop.append(p_dash)
+                        marked_stop_dict[p_dash] = 1
+        # Main code End
+        if count:
+            stats.add_round(k, marked_stops, len(Q), sum(len(route_stop_list[route]) - stp_idx for route, stp_idx in Q.items()), trip_lookups,
+                            label_improvements, footpath_relaxations, time.perf_counter() - round_start)
+        if not marked_stop:
+            break
+    if stats is not None:
+        stats.add_query()
+    view = LabelView(network, label, pi_label, as_datetime=True)
+    _, _, rap_out = post_processing(DESTINATION, view.pi_label, PRINT_ITINERARY, view.label)
+    out.append(rap_out)
+    return out
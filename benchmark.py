@@ -0,0 +1,387 @@
+"""
+Module contains the benchmark suite of the RAPTOR engines, the loaders and the dict builders on the bundled networks.
+It reports per-query latency percentiles, full-skim throughput, cold-load time and peak memory, saves the results as
+JSON and compares them against a saved baseline.
+
+Usage:
+    python benchmark.py                                   # run and save benchmark_results.json
+    python benchmark.py --output baseline.json            # save a baseline
+    python benchmark.py --compare baseline.json           # run and compare, exit code 1 on regressions
+    python benchmark.py --compare baseline.json --current benchmark_results.json   # compare saved results only
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from telemetry import get_latency_stats
+
+BENCHMARK_VERSION = 1
+BENCHMARK_FOLDERS = ('./bangalore', './swiss')
+TWEAKED_D_TIME = pd.to_datetime("2023-01-13 16:00:00")  # tweaked RAPTOR uses road travel times, any time works
+STD_D_TIME = pd.to_datetime("2023-01-09 08:00:00")  # standard RAPTOR runs on the GTFS timetable
+MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC = 2, 1, 0
+SEED = 0
+# Metrics compared against the baseline. True: lower is better, False: higher is better
+COMPARED_METRICS = {'p50_ms': True, 'p90_ms': True, 'p99_ms': True, 'seconds': True, 'peak_mem_mb': True, 'pairs_per_sec': False}
+
+
+def get_peak_memory(func, *args) -> float:
+    """
+    Returns the peak memory (MB) allocated by python while running func(*args). Runs func once more, untimed, since
+    tracing allocations slows it down.
+    """
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(*args)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def time_calls(func, args_list: list, WARMUP: int = 1) -> list:
+    """
+    Times func on every argument tuple of args_list, after WARMUP untimed calls on the first one. Output printed by
+    func is discarded.
+
+    Returns:
+        samples (list): run time of every call in seconds.
+    """
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(WARMUP if args_list else 0):
+            func(*args_list[0])
+        for args in args_list:
+            start = time.perf_counter()
+            func(*args)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def benchmark_queries(FOLDER: str, N_QUERIES: int) -> dict:
+    """
+    Per-query latency of the RAPTOR engines (dict and compiled versions) and of post_processing_dhanus, on N_QUERIES
+    random station pairs (fixed seed).
+
+    Args:
+        FOLDER (str): network folder.
+        N_QUERIES (int): number of queries per engine.
+
+    Returns:
+        results (dict): keys: benchmark case, values: latency stats and peak memory.
+    """
+    import gtfs_loader
+    from dict_builder.dict_builder_functions import build_dicts
+    from RAPTOR.RAPTOR_tweaked import raptor as raptor_tweaked, raptor_compiled as raptor_tweaked_compiled
+    from RAPTOR.std_raptor import raptor as std_raptor, raptor_compiled as std_raptor_compiled
+    from RAPTOR.raptor_function_tweaked import post_processing_dhanus
+    from RAPTOR.compiled_network import LabelView
+
+    stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict, _, metro_cost_dict = gtfs_loader.load_all_dict(FOLDER)
+    with contextlib.redirect_stdout(io.StringIO()):
+        artifacts = build_dicts(FOLDER, targets=('travel_time', 'network_snapshot'))
+    stoptimes_dict_modified, network = artifacts['travel_time'], artifacts['network_snapshot']
+    footpath_dict_sec = {stop: [(p_dash, duration.total_seconds()) for p_dash, duration in footpaths] for stop, footpaths in footpath_dict.items()}
+    rng = random.Random(SEED)
+    od_pairs = [tuple(rng.sample(network.stop_ids, 2)) for _ in range(N_QUERIES)]
+    tweaked_d_time, std_d_time = TWEAKED_D_TIME.timestamp(), STD_D_TIME.timestamp()
+
+    def post_processing(SOURCE, DESTINATION):
+        # Times only the post processing, on the labels of a One-To-All search
+        label, pi_label = raptor_tweaked_compiled(SOURCE, None, tweaked_d_time, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0, network,
+                                                  metro_cost_dict, POST_PROCESSING=0)
+        view = LabelView(network, label, pi_label)
+        start = time.perf_counter()
+        post_processing_dhanus(DESTINATION, view.pi_label, 0, view.label, metro_cost_dict)
+        return time.perf_counter() - start
+
+    cases = {
+        'raptor_tweaked': lambda SOURCE, DESTINATION: raptor_tweaked(SOURCE, DESTINATION, tweaked_d_time, MAX_TRANSFER, WALKING_FROM_SOURCE,
+                                                                     CHANGE_TIME_SEC, 0, routes_by_stop_dict, stops_dict, stoptimes_dict,
+                                                                     footpath_dict_sec, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict),
+        'raptor_tweaked_compiled': lambda SOURCE, DESTINATION: raptor_tweaked_compiled(SOURCE, DESTINATION, tweaked_d_time, MAX_TRANSFER,
+                                                                                       WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0, network, metro_cost_dict),
+        'raptor_tweaked_one_to_all': lambda SOURCE, DESTINATION: raptor_tweaked_compiled(SOURCE, None, tweaked_d_time, MAX_TRANSFER, WALKING_FROM_SOURCE,
+                                                                                         CHANGE_TIME_SEC, 0, network, metro_cost_dict, ITINERARY=0),
+        'std_raptor': lambda SOURCE, DESTINATION: std_raptor(SOURCE, DESTINATION, STD_D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0,
+                                                             routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict),
+        'std_raptor_compiled': lambda SOURCE, DESTINATION: std_raptor_compiled(SOURCE, DESTINATION, std_d_time, MAX_TRANSFER, WALKING_FROM_SOURCE,
+                                                                               CHANGE_TIME_SEC, 0, network),
+    }
+    results = {}
+    for name, func in cases.items():
+        results[f'query/{name}'] = {**get_latency_stats(time_calls(func, od_pairs)), 'peak_mem_mb': get_peak_memory(func, *od_pairs[0])}
+    with contextlib.redirect_stdout(io.StringIO()):
+        samples = [post_processing(*od_pair) for od_pair in od_pairs]
+    results['query/post_processing_dhanus'] = {**get_latency_stats(samples), 'peak_mem_mb': get_peak_memory(post_processing, *od_pairs[0])}
+    return results
+
+
+def benchmark_skim(FOLDER: str, REPEAT: int) -> dict:
+    """
+    Throughput of a full ward skim: station-pair skim (serial, so the result does not depend on the machine's core count)
+    followed by the ward skim batches. The fastest of REPEAT runs is reported.
+
+    Args:
+        FOLDER (str): network folder.
+        REPEAT (int): runs of the skim.
+
+    Returns:
+        results (dict): keys: benchmark case, values: run time, number of OD pairs, pairs per second and peak memory.
+    """
+    from miscellaneous_func import read_query_artifacts
+    from skim_engine import get_ward_stations, build_station_pair_skim, iter_ward_skim
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        network, nearest_metro_station_dict, metro_cost = read_query_artifacts(FOLDER)
+    ward_num_list = list(pd.read_csv("ward_lat_lon.csv")["ward_no"])
+    station_list, ward_station_idx, access_time = get_ward_stations(ward_num_list, nearest_metro_station_dict)
+    D_TIME = TWEAKED_D_TIME.timestamp()
+
+    def station_skim():
+        return build_station_pair_skim(station_list, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0, network, metro_cost)
+
+    def ward_skim(pair_skim):
+        return sum(len(batch) for batch in iter_ward_skim(ward_num_list, station_list, ward_station_idx, access_time, pair_skim))
+
+    pair_skim = station_skim()
+    station_seconds = min(time_calls(station_skim, [()] * REPEAT))
+    ward_seconds = min(time_calls(ward_skim, [(pair_skim,)] * REPEAT))
+    ward_rows = ward_skim(pair_skim)
+    n_station_pairs, n_ward_pairs = len(station_list) * (len(station_list) - 1), len(ward_num_list) * (len(ward_num_list) - 1)
+    return {'skim/station_pairs': {'seconds': station_seconds, 'pairs': n_station_pairs, 'pairs_per_sec': n_station_pairs / station_seconds,
+                                   'peak_mem_mb': get_peak_memory(station_skim)},
+            'skim/ward_pairs': {'seconds': station_seconds + ward_seconds, 'pairs': n_ward_pairs, 'rows': ward_rows,
+                                'pairs_per_sec': n_ward_pairs / (station_seconds + ward_seconds), 'peak_mem_mb': get_peak_memory(ward_skim, pair_skim)}}
+
+
+def _cold_load(target: str, FOLDER: str) -> dict:
+    """
+    Runs one loader and returns its run time and peak memory. Called in a fresh interpreter by benchmark_cold_load.
+    """
+    import gtfs_loader
+    from miscellaneous_func import read_query_artifacts
+    loaders = {'load_all_dict': gtfs_loader.load_all_dict, 'load_all_db': gtfs_loader.load_all_db, 'load_network_snapshot': gtfs_loader.load_network_snapshot,
+               'read_query_artifacts': read_query_artifacts}
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaders[target](FOLDER)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return {'seconds': seconds, 'peak_mem_mb': peak}
+
+
+def benchmark_cold_load(FOLDER: str) -> dict:
+    """
+    Cold-load time and peak memory of the loaders, each in a fresh interpreter (no modules or data loaded yet, apart from
+    numpy and pandas). The loaders need their files to exist; cases whose files are missing are reported as skipped.
+
+    Args:
+        FOLDER (str): network folder.
+
+    Returns:
+        results (dict): keys: benchmark case, values: run time and peak memory, or the reason the case was skipped.
+    """
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for target in ('load_all_dict', 'load_all_db', 'load_network_snapshot', 'read_query_artifacts'):
+        with context.Pool(1) as pool:
+            try:
+                results[f'cold_load/{target}'] = pool.apply(_cold_load, (target, FOLDER))
+            except (FileNotFoundError, KeyError) as error:
+                results[f'cold_load/{target}'] = {'skipped': f"{type(error).__name__}: {error}"}
+    return results
+
+
+def benchmark_dict_builders(FOLDER: str, REPEAT: int) -> dict:
+    """
+    Run time and peak memory of the dict builders on the GTFS files of FOLDER. The builders save their output under
+    ./dict_builder/FOLDER; they are run from a temporary directory so the artifacts of the repository are not touched.
+
+    Args:
+        FOLDER (str): network folder.
+        REPEAT (int): runs per builder.
+
+    Returns:
+        results (dict): keys: benchmark case, values: latency stats and peak memory.
+    """
+    import pickle
+    from dict_builder import dict_builder_functions as dbf
+    path = f"./GTFS/{FOLDER}"
+    ward_df = pd.read_csv("ward_lat_lon.csv")
+    stops_file = pd.read_csv(f'{path}/stops.txt', sep=',').sort_values(by=['stop_id']).reset_index(drop=True)
+    transfers_file = pd.read_csv(f'{path}/transfers.txt', sep=',')
+    builders = {
+        'build_save_footpath_dict': lambda: dbf.build_save_footpath_dict(transfers_file, FOLDER),
+        'build_footpath_closure': lambda: dbf.build_footpath_closure(transfers_file),
+        'get_k_nearest_stations': lambda: dbf.get_k_nearest_stations(stops_file, ward_df, 3),
+    }
+    if os.path.exists(f'{path}/stop_times.txt'):
+        import gtfs_loader
+        _, trips_file, stop_times_file, _, fare_attributes_file, fare_rule_file = gtfs_loader.load_all_db(FOLDER)
+        with open('OSM_dist_dict.pkl', 'rb') as file:
+            OSM_dist_dict = pickle.load(file)
+        with open('stop_OSMnode_mapping.pkl', 'rb') as file:
+            stop_OSMnode_mapping = pickle.load(file)
+        builders.update({
+            'build_save_stops_dict': lambda: dbf.build_save_stops_dict(stop_times_file, trips_file, FOLDER),
+            'build_save_stopstimes_dict': lambda: dbf.build_save_stopstimes_dict(stop_times_file, trips_file, FOLDER),
+            'build_save_route_by_stop': lambda: dbf.build_save_route_by_stop(stop_times_file, FOLDER),
+            'stop_idx_in_route': lambda: dbf.stop_idx_in_route(stop_times_file, FOLDER),
+            'build_nearest_metro_station_dict': lambda: dbf.build_nearest_metro_station_dict(stops_file, ward_df, FOLDER),
+            'build_metro_cost_dict': lambda: dbf.build_metro_cost_dict(fare_attributes_file, fare_rule_file, FOLDER),
+        })
+        with tempfile.TemporaryDirectory() as tmp, _working_directory(tmp, FOLDER), contextlib.redirect_stdout(io.StringIO()):
+            stops_dict = dbf.build_save_stops_dict(stop_times_file, trips_file, FOLDER)
+            network_inputs = (dbf.build_save_route_by_stop(stop_times_file, FOLDER), stops_dict, dbf.build_save_stopstimes_dict(stop_times_file, trips_file, FOLDER),
+                              dbf.build_save_footpath_dict(transfers_file, FOLDER), dbf.stop_idx_in_route(stop_times_file, FOLDER))
+            metro_cost_dict = dbf.build_metro_cost_dict(fare_attributes_file, fare_rule_file, FOLDER)
+            travel_time_dict = dbf.build_save_travel_time_dict(stops_dict, OSM_dist_dict, stop_OSMnode_mapping, 16, FOLDER)
+        builders.update({
+            'build_save_travel_time_dict': lambda: dbf.build_save_travel_time_dict(stops_dict, OSM_dist_dict, stop_OSMnode_mapping, 16, FOLDER),
+            'build_save_network_snapshot': lambda: dbf.build_save_network_snapshot(*network_inputs, FOLDER, travel_time_dict, metro_cost_dict),
+        })
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, _working_directory(tmp, FOLDER):
+        for name, builder in builders.items():
+            results[f'dict_builder/{name}'] = {**get_latency_stats(time_calls(builder, [()] * REPEAT)), 'peak_mem_mb': get_peak_memory(builder)}
+    return results
+
+
+@contextlib.contextmanager
+def _working_directory(path: str, FOLDER: str):
+    """
+    Changes the working directory to path (with an empty dict_builder/FOLDER in it) for the duration of the with block.
+    """
+    os.makedirs(os.path.join(path, 'dict_builder', FOLDER), exist_ok=True)
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def run_benchmarks(FOLDERS: tuple = BENCHMARK_FOLDERS, N_QUERIES: int = 200, REPEAT: int = 3) -> dict:
+    """
+    Runs the benchmark suite. Networks without a timetable (no stop_times.txt, e.g. swiss) only run the dict builder
+    and loader benchmarks.
+
+    Args:
+        FOLDERS (tuple): network folders.
+        N_QUERIES (int): queries per RAPTOR engine.
+        REPEAT (int): runs per dict builder and per skim.
+
+    Returns:
+        report (dict): {'meta': machine and run parameters, 'results': {'<network>/<case>': metrics}}.
+
+    Examples:
+        >>> report = run_benchmarks(('./bangalore',), N_QUERIES=50)
+        >>> save_results(report, 'benchmark_results.json')
+    """
+    results = {}
+    for FOLDER in FOLDERS:
+        network_name = os.path.basename(FOLDER.rstrip('/'))
+        has_timetable = os.path.exists(f'./GTFS/{FOLDER}/stop_times.txt')
+        stages = [('dict builders', lambda: benchmark_dict_builders(FOLDER, REPEAT)), ('cold load', lambda: benchmark_cold_load(FOLDER))]
+        if has_timetable:
+            stages += [('queries', lambda: benchmark_queries(FOLDER, N_QUERIES)), ('skim', lambda: benchmark_skim(FOLDER, REPEAT))]
+        for stage, func in stages:
+            print(f"benchmark: {network_name} {stage}")
+            results.update({f'{network_name}/{case}': metrics for case, metrics in func().items()})
+    meta = {'version': BENCHMARK_VERSION, 'created': pd.Timestamp.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'n_queries': N_QUERIES, 'repeat': REPEAT, 'seed': SEED}
+    return {'meta': meta, 'results': results}
+
+
+def save_results(report: dict, path: str) -> None:
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+
+def load_results(path: str) -> dict:
+    with open(path) as file:
+        report = json.load(file)
+    if report.get('meta', {}).get('version') != BENCHMARK_VERSION:
+        raise ValueError(f"{path} has benchmark version {report.get('meta', {}).get('version')}, expected {BENCHMARK_VERSION}")
+    return report
+
+
+def compare_results(current: dict, baseline: dict, THRESHOLD: float = 0.1) -> pd.DataFrame:
+    """
+    Compares benchmark results against a baseline.
+
+    Args:
+        current (dict): report of run_benchmarks.
+        baseline (dict): saved report to compare against.
+        THRESHOLD (float): relative change beyond which a metric counts as a regression (or improvement).
+
+    Returns:
+        comparison (pandas.dataframe): one row per case and metric present in both reports. Columns case, metric,
+        baseline, current, change (relative, positive means worse) and status ('regression', 'improvement' or 'ok').
+    """
+    rows = []
+    for case, metrics in current['results'].items():
+        baseline_metrics = baseline['results'].get(case, {})
+        for metric, lower_is_better in COMPARED_METRICS.items():
+            if metric not in metrics or metric not in baseline_metrics or baseline_metrics[metric] == 0:
+                continue
+            change = (metrics[metric] - baseline_metrics[metric]) / baseline_metrics[metric] * (1 if lower_is_better else -1)
+            status = 'regression' if change > THRESHOLD else 'improvement' if change < -THRESHOLD else 'ok'
+            rows.append((case, metric, baseline_metrics[metric], metrics[metric], change, status))
+    return pd.DataFrame(rows, columns=['case', 'metric', 'baseline', 'current', 'change', 'status'])
+
+
+def print_results(report: dict) -> None:
+    for case, metrics in report['results'].items():
+        if 'skipped' in metrics:
+            print(f"{case:<55} skipped ({metrics['skipped']})")
+        elif 'p50_ms' in metrics:
+            print(f"{case:<55} p50 {metrics['p50_ms']:9.3f} ms  p90 {metrics['p90_ms']:9.3f} ms  p99 {metrics['p99_ms']:9.3f} ms  "
+                  f"peak {metrics['peak_mem_mb']:8.2f} MB")
+        elif 'pairs_per_sec' in metrics:
+            print(f"{case:<55} {metrics['seconds']:9.3f} s  {metrics['pairs_per_sec']:11.1f} pairs/s  peak {metrics['peak_mem_mb']:8.2f} MB")
+        else:
+            print(f"{case:<55} {metrics['seconds']:9.3f} s  peak {metrics['peak_mem_mb']:8.2f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite of the RAPTOR engines, loaders and dict builders.")
+    parser.add_argument('--folders', nargs='+', default=list(BENCHMARK_FOLDERS), help="network folders")
+    parser.add_argument('--queries', type=int, default=200, help="queries per RAPTOR engine")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per dict builder and per skim")
+    parser.add_argument('--output', default='benchmark_results.json', help="file the results are saved to")
+    parser.add_argument('--compare', help="baseline results to compare against")
+    parser.add_argument('--current', help="compare these saved results instead of running the suite")
+    parser.add_argument('--threshold', type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.current:
+        report = load_results(args.current)
+    else:
+        report = run_benchmarks(tuple(args.folders), args.queries, args.repeat)
+        save_results(report, args.output)
+        print(f"benchmark: results saved to {args.output}")
+    print_results(report)
+    if args.compare:
+        comparison = compare_results(report, load_results(args.compare), args.threshold)
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(comparison.to_string(index=False, float_format=lambda value: f"{value:.4g}"))
+        regressions = comparison[comparison.status == 'regression']
+        print(f"benchmark: {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        if len(regressions):
+            raise SystemExit(1)
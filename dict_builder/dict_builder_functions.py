@@ -4,10 +4,30 @@ This is done for easy/faster data lookup.
 """
 
 import pickle
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
-from sklearn.neighbors import BallTree
-from haversine import haversine, Unit
+from RAPTOR.compiled_network import compile_network, save_snapshot
+
+
+def _split_by_key(keys, values: list, labels=None) -> tuple:
+    """
+    Splits values (sorted by keys) into runs of equal keys.
+
+    Args:
+        keys (numpy.ndarray): key of every value. Equal keys must be contiguous.
+        values (list): values to split.
+        labels (numpy.ndarray): optional. Label of every value, the label of a run is the one of its first value.
+                                Defaults to keys.
+
+    Returns:
+        run_labels (list): label of every run.
+        runs (list): list of values of every run.
+    """
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(keys)]
+    labels = keys if labels is None else labels
+    return list(labels[starts]), [values[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+
 
 def build_save_route_by_stop(stop_times_file, FOLDER: str) -> dict:
     """
@@ -43,14 +63,17 @@ def build_save_stops_dict(stop_times_file, trips_file, FOLDER: str)-> dict:
         stops_dict (dict): keys: route_id, values: list of stop id in the route_id. Format-> dict[route_id] = [stop_id]
     """
     print("building stops dict")
-    trips_group = stop_times_file.groupby("trip_id")  # This drops all trips for which timestamps are not sorted
-    trips_with_correct_timestamps = [id for id, trip in tqdm(trips_group) if list(trip.arrival_time) == list(trip.arrival_time.sort_values())]
-    if len(trips_with_correct_timestamps) != trips_file.shape[0]:
+    # This drops all trips for which timestamps are not sorted. Rows of a trip are compared in file order.
+    by_trip = stop_times_file[["trip_id", "arrival_time"]].sort_values(by="trip_id", kind="stable")
+    trip_ids, arrival_time = by_trip["trip_id"].to_numpy(), by_trip["arrival_time"].to_numpy()
+    decreasing = (trip_ids[1:] == trip_ids[:-1]) & (arrival_time[1:] < arrival_time[:-1])
+    trips_with_incorrect_timestamps = set(trip_ids[1:][decreasing])
+    if len(pd.unique(trip_ids)) - len(trips_with_incorrect_timestamps) != trips_file.shape[0]:
         print(f"Incorrect time sequence in stoptimes builder file")
 
-    stop_times = stop_times_file[stop_times_file["trip_id"].isin(trips_with_correct_timestamps)]
-    route_groups = stop_times.drop_duplicates(subset=['route_id', 'stop_sequence'])[['stop_id', 'route_id', 'stop_sequence']].groupby('route_id')
-    stops_dict = {id: routes.sort_values(by='stop_sequence')['stop_id'].to_list() for id, routes in route_groups}
+    stop_times = stop_times_file[~stop_times_file["trip_id"].isin(trips_with_incorrect_timestamps)]
+    route_stops = stop_times.drop_duplicates(subset=['route_id', 'stop_sequence']).sort_values(by=['route_id', 'stop_sequence'], kind="stable")
+    stops_dict = dict(zip(*_split_by_key(route_stops["route_id"].to_numpy(), route_stops["stop_id"].tolist())))
 
     with open(f'./dict_builder/{FOLDER}/stops_dict_pkl.pkl', 'wb') as pickle_file:
         pickle.dump(stops_dict, pickle_file)
@@ -74,14 +97,19 @@ def build_save_stopstimes_dict(stop_times_file, trips_file, FOLDER: str) -> dict
     print("building stoptimes dict")
 
     stop_times_file.arrival_time = pd.to_datetime(stop_times_file.arrival_time)
-    route_group = stop_times_file.groupby("route_id")
-    stoptimes_dict = {r_id: [] for r_id, _ in route_group}
-    for r_id, route in tqdm(route_group):
-        trip_group = route.groupby("trip_id")  # Collect trip start points
-        temp = route[route.stop_sequence == 1][["trip_id", "arrival_time"]].sort_values(by=["arrival_time"])
-        for trip_id in temp["trip_id"]:  # Add them inorder
-            trip = trip_group.get_group(trip_id).sort_values(by=["stop_sequence"])
-            stoptimes_dict[r_id].append(list(zip(trip.stop_id, trip.arrival_time)))
+    stoptimes_dict = {r_id: [] for r_id in sorted(pd.unique(stop_times_file["route_id"]))}
+    # Trips of a route are ordered by their arrival time at stop_sequence 1, stops of a trip by stop_sequence
+    # (one row per trip: sorting the start rows route by route keeps the order of trips with equal start times unchanged)
+    trip_start = stop_times_file[stop_times_file.stop_sequence == 1][["route_id", "trip_id", "arrival_time"]].drop_duplicates(subset="trip_id")
+    trip_order = [trip_id for _, start in trip_start.groupby("route_id") for trip_id in start.sort_values(by=["arrival_time"])["trip_id"]]
+    trip_rank = pd.Series(range(len(trip_order)), index=trip_order)
+    stop_times = stop_times_file[stop_times_file["trip_id"].isin(trip_rank.index)]
+    stop_times = stop_times.assign(trip_rank=trip_rank.reindex(stop_times["trip_id"]).to_numpy())
+    stop_times = stop_times.sort_values(by=["route_id", "trip_rank", "stop_sequence"], kind="stable")
+    trip_routes, trips = _split_by_key(stop_times["trip_rank"].to_numpy(), list(zip(stop_times["stop_id"].tolist(), stop_times["arrival_time"].tolist())),
+                                       stop_times["route_id"].to_numpy())
+    for r_id, trip in zip(trip_routes, trips):
+        stoptimes_dict[r_id].append(trip)
 
     with open(f'./dict_builder/{FOLDER}/stoptimes_dict_pkl.pkl', 'wb') as pickle_file:
         pickle.dump(stoptimes_dict, pickle_file)
@@ -89,6 +117,24 @@ def build_save_stopstimes_dict(stop_times_file, trips_file, FOLDER: str) -> dict
     return stoptimes_dict
 
 
+def build_footpath_dict(from_stop_ids, to_stop_ids, footpath_time) -> dict:
+    """
+    This function groups footpaths by their start stop. Footpaths of a stop keep their input order.
+
+    Args:
+        from_stop_ids (numpy.ndarray): stop id at the start of every footpath.
+        to_stop_ids (numpy.ndarray): stop id at the end of every footpath.
+        footpath_time (numpy.ndarray): footpath duration in seconds.
+
+    Returns:
+        footpath_dict (dict): keys: from stop_id (sorted), values: list of tuples of form (to stop id, footpath duration). Format-> dict[stop_id]=[(stop_id, footpath_duration)]
+    """
+    order = np.argsort(from_stop_ids, kind="stable")
+    durations = pd.to_timedelta(np.asarray(footpath_time, dtype=np.float64)[order], unit='seconds')
+    footpaths = list(zip(np.asarray(to_stop_ids)[order].tolist(), durations.tolist()))
+    return dict(zip(*_split_by_key(np.asarray(from_stop_ids)[order], footpaths)))
+
+
 def build_save_footpath_dict(transfers_file, FOLDER: str)-> dict:
     """
     This function saves a dictionary to provide easy access to all the footpaths through a stop id.
@@ -101,18 +147,66 @@ def build_save_footpath_dict(transfers_file, FOLDER: str)-> dict:
         footpath_dict (dict): keys: from stop_id, values: list of tuples of form (to stop id, footpath duration). Format-> dict[stop_id]=[(stop_id, footpath_duration)]
     """
     print("building footpath dict..")
-    footpath_dict = {}
-    g = transfers_file.groupby("from_stop_id")
-    for from_stop, details in tqdm(g):
-        footpath_dict[from_stop] = []
-        for _, row in details.iterrows():
-            footpath_dict[from_stop].append((row.to_stop_id, pd.to_timedelta(float(row.min_transfer_time), unit='seconds')))
+    footpath_dict = build_footpath_dict(transfers_file.from_stop_id.to_numpy(), transfers_file.to_stop_id.to_numpy(),
+                                        transfers_file.min_transfer_time.to_numpy(dtype=np.float64))
 
     with open(f'./dict_builder/{FOLDER}/transfers_dict_full.pkl', 'wb') as pickle_file:
         pickle.dump(footpath_dict, pickle_file)
     print("transfers_dict done")
     return footpath_dict
 
+
+def build_footpath_closure(transfers_file, time_limit="full"):
+    """
+    This function makes the footpath graph transitively closed. Footpaths are undirected; the last footpath between two
+    stops (in either direction) gives their duration. Stops of a connected component that are not directly linked get a
+    footpath whose duration is their shortest path distance, computed with one all-pairs Dijkstra per component on a
+    sparse graph. Existing footpaths keep their duration.
+
+    Args:
+        transfers_file (pandas.dataframe): dataframe with transfers (footpath) details.
+        time_limit (str/int): maximum footpath duration to be considered (before footpath graph is made transitively closed). "full" means all footpaths.
+
+    Returns:
+        footpath_db (pandas.dataframe): footpaths in both directions, sorted by (from_stop_id, to_stop_id). Columns
+        from_stop_id, to_stop_id, min_transfer_time (seconds).
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components, dijkstra
+    if time_limit != "full":
+        transfers_file = transfers_file[transfers_file.min_transfer_time < time_limit]
+    codes, stop_ids = pd.factorize(pd.concat([transfers_file.from_stop_id, transfers_file.to_stop_id], ignore_index=True), sort=True)
+    from_idx, to_idx = codes[:len(transfers_file)], codes[len(transfers_file):]
+    edges = pd.DataFrame({"u": np.minimum(from_idx, to_idx), "v": np.maximum(from_idx, to_idx),
+                          "time": transfers_file.min_transfer_time.to_numpy(dtype=np.float64)}).drop_duplicates(subset=["u", "v"], keep="last")
+    edges = edges[edges.u != edges.v]
+    n_stops = len(stop_ids)
+    graph = csr_matrix((np.r_[edges.time, edges.time], (np.r_[edges.u, edges.v], np.r_[edges.v, edges.u])), shape=(n_stops, n_stops))
+
+    n_components, component = connected_components(graph, directed=False)
+    component_order = np.argsort(component, kind="stable")
+    component_ptr = np.searchsorted(component[component_order], np.arange(n_components + 1))
+    from_list, to_list, time_list = [], [], []
+    for c in range(n_components):
+        nodes = component_order[component_ptr[c]:component_ptr[c + 1]]
+        if len(nodes) < 2:
+            continue
+        subgraph = graph[nodes][:, nodes].tocoo()
+        distance = dijkstra(subgraph, directed=False)
+        distance[subgraph.row, subgraph.col] = subgraph.data  # direct footpaths are kept as they are
+        np.fill_diagonal(distance, np.nan)
+        src, dst = np.nonzero(~np.isnan(distance))
+        from_list.append(nodes[src])
+        to_list.append(nodes[dst])
+        time_list.append(distance[src, dst])
+    if not from_list:
+        return pd.DataFrame({"from_stop_id": [], "to_stop_id": [], "min_transfer_time": []})
+    from_idx, to_idx, footpath_time = np.concatenate(from_list), np.concatenate(to_list), np.concatenate(time_list)
+    order = np.lexsort((to_idx, from_idx))
+    return pd.DataFrame({"from_stop_id": np.asarray(stop_ids)[from_idx[order]], "to_stop_id": np.asarray(stop_ids)[to_idx[order]],
+                         "min_transfer_time": footpath_time[order]})
+
+
 def stop_idx_in_route(stop_times_file, FOLDER: str)-> dict:
     """
     This function saves a dictionary to provide easy access to index of a stop in a route.
@@ -124,34 +218,65 @@ def stop_idx_in_route(stop_times_file, FOLDER: str)-> dict:
     Returns:
         idx_by_route_stop_dict (dict): Keys: (route id, stop id), value: stop index. Format {(route id, stop id): stop index in route}.
     """
-    pandas_group = stop_times_file.groupby(["route_id","stop_id"])
-    idx_by_route_stop = {route_stop_pair:details.stop_sequence.iloc[0] for route_stop_pair, details in pandas_group}
+    first_visit = stop_times_file.drop_duplicates(subset=["route_id", "stop_id"]).sort_values(by=["route_id", "stop_id"], kind="stable")
+    idx_by_route_stop = dict(zip(zip(first_visit["route_id"].tolist(), first_visit["stop_id"].tolist()), first_visit["stop_sequence"].to_numpy()))
 
     with open(f'./dict_builder/{FOLDER}/idx_by_route_stop.pkl', 'wb') as pickle_file:
         pickle.dump(idx_by_route_stop, pickle_file)
     print("idx_by_route_stop done")
     return idx_by_route_stop
 
+EARTH_RADIUS = 6371008.8  # meters, mean earth radius (same as the haversine package)
+
+
+def get_k_nearest_stations(stops_file, zone_df, k: int = 1, zone_columns: tuple = ("ward_no", "ward_lat", "ward_lon")) -> tuple:
+    """
+    This function finds the k nearest stations of every zone with a single batched BallTree query on (lat, lon) in radians.
+    Stations at the same distance (e.g. platforms of an interchange) are ordered as in stops_file, so the first k
+    stations do not depend on k.
+
+    Args:
+        stops_file (pandas.dataframe): stops.txt file in GTFS.
+        zone_df (pandas.dataframe): zone centroids.
+        k (int): number of stations per zone.
+        zone_columns (tuple): names of the zone id, latitude and longitude columns of zone_df.
+
+    Returns:
+        zone_ids (numpy.ndarray): zone ids in the order of zone_df.
+        station_ids (numpy.ndarray): shape (zones, k). Stop ids of the k nearest stations, nearest first.
+        distance (numpy.ndarray): shape (zones, k). Great-circle distance in meters.
+    """
+    from sklearn.neighbors import BallTree
+    zone_id_column, lat_column, lon_column = zone_columns
+    station_points = np.radians(stops_file[["stop_lat", "stop_lon"]].to_numpy(dtype=np.float64))
+    zone_points = np.radians(zone_df[[lat_column, lon_column]].to_numpy(dtype=np.float64))
+    tree, k = BallTree(station_points, metric="haversine"), min(k, len(station_points))
+    n_query = min(k + 1, len(station_points))
+    while True:  # query until no station beyond the k-th ties with it
+        distance, index = tree.query(zone_points, k=n_query)
+        if n_query == len(station_points) or not np.any(distance[:, -1] == distance[:, k - 1]):
+            break
+        n_query = min(2 * n_query, len(station_points))
+    order = np.lexsort((index, distance))[:, :k]
+    distance, index = np.take_along_axis(distance, order, axis=1), np.take_along_axis(index, order, axis=1)
+    return zone_df[zone_id_column].to_numpy(), stops_file["stop_id"].to_numpy()[index], distance * EARTH_RADIUS
+
+
 def build_nearest_metro_station_dict(stops_file, ward_df, FOLDER):
+    """
+    This function saves the nearest metro station of every ward.
+
+    Args:
+        stops_file (pandas.dataframe): stops.txt file in GTFS.
+        ward_df (pandas.dataframe): ward centroids. Columns ward_no, ward_lat, ward_lon.
+        FOLDER (str): path to network folder.
+
+    Returns:
+        nearest_metro_station_dict (dict): Format {ward_no: (stop_id, distance in meters)}.
+    """
     print("building Nearest metro dict")
-    metro_station_ids = list(stops_file["stop_id"])
-    metro_station_points = [[stops_file.iloc[row].stop_lat, stops_file.iloc[row].stop_lon] for row in range(stops_file.shape[0])]
-    tree_ball = BallTree(metro_station_points, metric="haversine")
-
-    ward_no, ward_lat_lon = [], []
-    for row in range(ward_df.shape[0]):
-        ward_no.append(ward_df["ward_no"].iloc[row])
-        ward_lat_lon.append([ward_df["ward_lat"].iloc[row], ward_df["ward_lon"].iloc[row]])
-
-    nearest_metro_station_dict = {}
-    for i in range(len(ward_lat_lon)):
-        print(i)
-        ward_point = [ward_lat_lon[i]]
-        distance, index = tree_ball.query(ward_point, k=1)
-        nearest_metro_station_id = metro_station_ids[index[0][0]]
-        nearest_metro_point = metro_station_points[index[0][0]]
-        distance_to_nearest_metro_station = haversine(ward_point[0], nearest_metro_point, unit=Unit.METERS)
-        nearest_metro_station_dict[ward_no[i]] = (nearest_metro_station_id, distance_to_nearest_metro_station)
+    ward_no, station_ids, distance = get_k_nearest_stations(stops_file, ward_df, k=1)
+    nearest_metro_station_dict = dict(zip(ward_no.tolist(), zip(station_ids[:, 0].tolist(), distance[:, 0].tolist())))
 
     with open(f'./dict_builder/{FOLDER}/nearest_metro_station_dict.pkl', 'wb') as pickle_file:
         pickle.dump(nearest_metro_station_dict, pickle_file)
@@ -159,14 +284,357 @@ def build_nearest_metro_station_dict(stops_file, ward_df, FOLDER):
     return nearest_metro_station_dict
 
 def build_metro_cost_dict(estimated_fare_attributes_file, estimated_fare_rule_file, FOLDER):
-    metro_cost_dict = {}
-    for row in range(estimated_fare_rule_file.shape[0]):
-        tup = (estimated_fare_rule_file.iloc[row].origin_id, estimated_fare_rule_file.iloc[row].destination_id)
-        fare_id = estimated_fare_rule_file.iloc[row].fare_id
-        cost = float(estimated_fare_attributes_file[estimated_fare_attributes_file.fare_id == fare_id].iloc[0].price)
-        metro_cost_dict[tup] = cost
+    """
+    This function saves the fare of every (origin, destination) fare rule. Fare rules are joined with the fare
+    attributes in a single merge; the first attribute row of a fare_id gives its price.
+
+    Args:
+        estimated_fare_attributes_file (pandas.dataframe): fare attributes. Columns fare_id, price.
+        estimated_fare_rule_file (pandas.dataframe): fare rules. Columns fare_id, origin_id, destination_id.
+        FOLDER (str): path to network folder.
+
+    Returns:
+        metro_cost_dict (dict): Format {(origin stop id, destination stop id): fare}.
+    """
+    prices = estimated_fare_attributes_file.drop_duplicates(subset="fare_id")[["fare_id", "price"]]
+    fare_rules = estimated_fare_rule_file[["fare_id", "origin_id", "destination_id"]].merge(prices, on="fare_id", how="left", validate="many_to_one")
+    if fare_rules["price"].isna().any():
+        raise KeyError(f"fare_id without price: {sorted(set(fare_rules.fare_id[fare_rules.price.isna()]))}")
+    metro_cost_dict = dict(zip(zip(fare_rules["origin_id"].tolist(), fare_rules["destination_id"].tolist()), fare_rules["price"].astype(float).tolist()))
 
     with open(f'./dict_builder/{FOLDER}/metro_cost_dict.pkl', 'wb') as pickle_file:
         pickle.dump(metro_cost_dict, pickle_file)
 
     return metro_cost_dict
+
+
+def build_save_travel_time_dict(stops_dict, OSM_dist_dict, stop_OSMnode_mapping, speed: float, FOLDER: str) -> dict:
+    """
+    This function saves, for every route, the cumulative road travel time (seconds) from the first stop of the route.
+    Used by tweaked RAPTOR in place of the GTFS timetable.
+
+    Args:
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        OSM_dist_dict (dict): road distance in meters. Format {(from OSM node, to OSM node): distance}.
+        stop_OSMnode_mapping (dict): Format {stop_id: OSM node}.
+        speed (float): vehicle speed in meter/second.
+        FOLDER (str): path to network folder.
+
+    Returns:
+        travel_time_dict (dict): Format {route_id: [(stop id, cumulative travel time in seconds)]}.
+    """
+    print("building travel_time_dict")
+    travel_time_dict = {}
+    for route, stop_list in stops_dict.items():
+        travel_time_list = [0] + [round(OSM_dist_dict[(stop_OSMnode_mapping[stop_list[stop_idx]], stop_OSMnode_mapping[stop_list[stop_idx + 1]])] / speed, 1)
+                                  for stop_idx in range(len(stop_list) - 1)]
+        travel_time_dict[route] = list(zip(stop_list, np.cumsum(travel_time_list)))
+
+    with open(f'./dict_builder/{FOLDER}/travel_time_dict.pkl', 'wb') as pickle_file:
+        pickle.dump(travel_time_dict, pickle_file)
+    print("travel_time_dict done")
+    return travel_time_dict
+
+
+def build_osm_graph(G) -> tuple:
+    """
+    This function converts an OSM road graph into a sparse adjacency matrix for batched shortest path queries. Parallel
+    edges keep their shortest length; edges without a length count as 1 (as in networkx).
+
+    Args:
+        G (networkx.MultiDiGraph): OSM drive graph (e.g. from osmnx). Nodes have attributes x (lon) and y (lat), edges a
+            length in meters.
+
+    Returns:
+        node_ids (numpy.ndarray): OSM node id of every matrix index.
+        node_points (pandas.dataframe): columns stop_id (OSM node id), stop_lat, stop_lon. Same order as node_ids.
+        graph (scipy.sparse.csr_matrix): shape (nodes, nodes). graph[i, j] is the length of the road from node i to node j.
+    """
+    from scipy.sparse import csr_matrix
+    node_ids, node_x, node_y = zip(*[(node, data['x'], data['y']) for node, data in G.nodes(data=True)])
+    node_ids = np.asarray(node_ids)
+    node_idx = pd.Series(np.arange(len(node_ids)), index=node_ids)
+    u, v, length = zip(*G.edges(data='length', default=1)) if G.number_of_edges() else ((), (), ())
+    edges = pd.DataFrame({"u": node_idx.loc[list(u)].to_numpy(), "v": node_idx.loc[list(v)].to_numpy(), "length": np.asarray(length, dtype=np.float64)})
+    if not G.is_directed():
+        edges = pd.concat([edges, edges.rename(columns={"u": "v", "v": "u"})], ignore_index=True)
+    edges = edges.groupby(["u", "v"], as_index=False)["length"].min()
+    graph = csr_matrix((edges.length.to_numpy(), (edges.u.to_numpy(), edges.v.to_numpy())), shape=(len(node_ids), len(node_ids)))
+    node_points = pd.DataFrame({"stop_id": node_ids, "stop_lat": node_y, "stop_lon": node_x})
+    return node_ids, node_points, graph
+
+
+def get_osm_graph_hash(node_ids, graph) -> str:
+    """
+    This function returns a hash identifying the road graph (node ids, topology and lengths). Used as the key of the OSM
+    distance cache.
+    """
+    import hashlib
+    digest = hashlib.sha256(pickle.dumps(np.asarray(node_ids).tolist()))
+    for values in (graph.indptr, graph.indices, graph.data):
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def map_stops_to_osm_nodes(stops_file, node_points) -> dict:
+    """
+    This function maps every stop to its nearest OSM node with a single batched BallTree query.
+
+    Args:
+        stops_file (pandas.dataframe): stops.txt file in GTFS.
+        node_points (pandas.dataframe): OSM nodes. See build_osm_graph.
+
+    Returns:
+        stop_OSMnode_mapping (dict): Format {stop_id: OSM node}.
+    """
+    stop_ids, node_ids, _ = get_k_nearest_stations(node_points, stops_file, k=1, zone_columns=("stop_id", "stop_lat", "stop_lon"))
+    return dict(zip(stop_ids.tolist(), node_ids[:, 0].tolist()))
+
+
+_osm_worker_state = {}  # road graph inherited by the forked shortest path workers
+
+
+def _get_osm_distances(sources: np.ndarray, targets: list) -> list:
+    """
+    Worker function of build_osm_dist_dict. Runs single-source Dijkstra from every node index in sources and returns
+    the distances to the node indices targets[i] of source i (inf if unreachable).
+    """
+    from scipy.sparse.csgraph import dijkstra
+    distance = dijkstra(_osm_worker_state["graph"], directed=True, indices=sources)
+    return [distance[row, target_list] for row, target_list in enumerate(targets)]
+
+
+def build_osm_dist_dict(G, node_pairs: list, N_WORKERS: int = None, CACHE_DIR: str = './OSM_dist_cache', SOURCES_PER_CHUNK: int = 16,
+                        FALLBACK_DIST: float = 500) -> tuple:
+    """
+    This function computes the road distance of (from OSM node, to OSM node) pairs. Pairs are grouped by source node so
+    that one single-source Dijkstra run serves all pairs of a source; the runs are sharded across a process pool (forked,
+    so the graph is shared copy-on-write). Distances are cached on disk under the hash of the graph, so reruns on the
+    same graph only compute new pairs.
+
+    Args:
+        G (networkx.MultiDiGraph): OSM drive graph. See build_osm_graph.
+        node_pairs (list): (from OSM node, to OSM node) pairs.
+        N_WORKERS (int): number of worker processes. Defaults to the number of CPUs.
+        CACHE_DIR (str): folder of the distance cache. None disables the cache.
+        SOURCES_PER_CHUNK (int): sources per Dijkstra call. Bounds the (sources x nodes) distance block of a call.
+        FALLBACK_DIST (float): distance in meters used for pairs without a path (or with a node missing from G).
+
+    Returns:
+        OSM_dist_dict (dict): Format {(from OSM node, to OSM node): distance in meters, rounded to 0.1}.
+        failed_pairs (set): pairs that got FALLBACK_DIST.
+
+    Examples:
+        >>> OSM_dist_dict, failed_pairs = build_osm_dist_dict(G, [(6180424437, 6033556437)])
+    """
+    import multiprocessing
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    node_ids, _, graph = build_osm_graph(G)
+    cache_path = f"{CACHE_DIR}/{get_osm_graph_hash(node_ids, graph)}.pkl" if CACHE_DIR else None
+    cache = pd.read_pickle(cache_path) if cache_path and os.path.exists(cache_path) else {}  # {(from node, to node): distance or inf}
+
+    node_idx = {node: idx for idx, node in enumerate(node_ids.tolist())}
+    targets_by_source = {}
+    for s, d in dict.fromkeys(node_pairs):
+        if (s, d) in cache:
+            continue
+        if s not in node_idx or d not in node_idx:
+            cache[(s, d)] = np.inf
+        else:
+            targets_by_source.setdefault(s, []).append(d)
+    sources = list(targets_by_source)
+    chunks = [sources[start:start + SOURCES_PER_CHUNK] for start in range(0, len(sources), SOURCES_PER_CHUNK)]
+    chunk_args = [(np.array([node_idx[s] for s in chunk]), [[node_idx[d] for d in targets_by_source[s]] for s in chunk]) for chunk in chunks]
+    print(f"OSM distances: {len(node_pairs)} pairs, {len(sources)} sources to compute, {len(cache)} pairs cached")
+
+    _osm_worker_state.update(graph=graph)
+    try:
+        N_WORKERS = min(N_WORKERS or os.cpu_count() or 1, len(chunks))
+        if N_WORKERS <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+            results = [_get_osm_distances(*args) for args in chunk_args]
+        else:
+            with ProcessPoolExecutor(max_workers=N_WORKERS, mp_context=multiprocessing.get_context("fork")) as executor:
+                results = list(executor.map(_get_osm_distances, *zip(*chunk_args)))
+    finally:
+        _osm_worker_state.clear()
+    for chunk, chunk_distances in zip(chunks, results):
+        for s, distances in zip(chunk, chunk_distances):
+            cache.update(zip([(s, d) for d in targets_by_source[s]], np.round(distances, 1).tolist()))
+
+    if cache_path and sources:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path, 'wb') as pickle_file:
+            pickle.dump(cache, pickle_file)
+    OSM_dist_dict, failed_pairs = {}, set()
+    for pair in dict.fromkeys(node_pairs):
+        if np.isinf(cache[pair]):
+            failed_pairs.add(pair)
+            OSM_dist_dict[pair] = FALLBACK_DIST
+        else:
+            OSM_dist_dict[pair] = cache[pair]
+    return OSM_dist_dict, failed_pairs
+
+
+def build_save_network_snapshot(routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, FOLDER: str,
+                                stoptimes_dict_modified=None, metro_cost_dict=None):
+    """
+    This function compiles the preprocessed dicts into typed arrays and saves them as a single network snapshot file that
+    can be memory-mapped by gtfs_loader.load_network_snapshot.
+
+    Args:
+        routes_by_stop_dict (dict): preprocessed dict. Format {stop_id: [id of routes passing through stop]}.
+        stops_dict (dict): preprocessed dict. Format {route_id: [ids of stops in the route]}.
+        stoptimes_dict (dict): preprocessed dict. Format {route_id: [[trip_1], [trip_2]]}.
+        footpath_dict (dict): preprocessed dict. Format {from_stop_id: [(to_stop_id, footpath_time)]}.
+        idx_by_route_stop_dict (dict): preprocessed dict. Format {(route id, stop id): stop index in route}.
+        FOLDER (str): path to network folder.
+        stoptimes_dict_modified (dict): optional. Format {route_id: [(stop id, cumulative travel time in seconds)]}.
+        metro_cost_dict (dict): optional. Format {(origin stop id, destination stop id): fare}. Saved as a dense fare matrix.
+
+    Returns:
+        network (CompiledNetwork): compiled network.
+    """
+    print("building network snapshot")
+    network = compile_network(routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified,
+                              metro_cost_dict)
+    save_snapshot(network, f'./dict_builder/{FOLDER}/network_snapshot.bin')
+    print("network snapshot done")
+    return network
+
+
+# Incremental build. Every artifact is described by the source files it is read from, the artifacts it is built from,
+# the parameters it depends on and the version of its builder. The signature of an artifact combines the content hashes
+# of its sources, the signatures of its dependencies, its parameters and its builder version; the artifact is rebuilt
+# only when its signature differs from the one recorded in ./dict_builder/{FOLDER}/manifest.json. Bump the builder
+# version whenever a change to the builder changes its output.
+ARTIFACTS = {
+    # name: (file name, source files, artifact dependencies, parameters, builder version)
+    'stops_dict': ('stops_dict_pkl.pkl', ('{GTFS}/stop_times.txt', '{GTFS}/trips.txt'), (), (), 1),
+    'stoptimes_dict': ('stoptimes_dict_pkl.pkl', ('{GTFS}/stop_times.txt', '{GTFS}/trips.txt'), (), (), 1),
+    'routes_by_stop': ('routes_by_stop.pkl', ('{GTFS}/stop_times.txt', '{GTFS}/trips.txt'), (), (), 1),
+    'idx_by_route_stop': ('idx_by_route_stop.pkl', ('{GTFS}/stop_times.txt', '{GTFS}/trips.txt'), (), (), 1),
+    'footpath': ('transfers_dict_full.pkl', ('{GTFS}/transfers.txt',), (), (), 1),
+    'nearest_metro_station': ('nearest_metro_station_dict.pkl', ('{GTFS}/stops.txt', 'ward_lat_lon.csv'), (), (), 2),  # 2: haversine on radians
+    'metro_cost': ('metro_cost_dict.pkl', ('{GTFS}/estimated fare attributes.txt', '{GTFS}/estimated fare rules.txt'), (), (), 1),
+    'travel_time': ('travel_time_dict.pkl', ('OSM_dist_dict.pkl', 'stop_OSMnode_mapping.pkl'), ('stops_dict',), ('speed',), 1),
+    'network_snapshot': ('network_snapshot.bin', (), ('routes_by_stop', 'stops_dict', 'stoptimes_dict', 'footpath', 'idx_by_route_stop', 'travel_time',
+                                                     'metro_cost'), (), 1),
+}
+
+
+def hash_file(path: str, file_cache: dict) -> str:
+    """
+    Returns the sha256 of a file. Hashes are cached by (size, modification time) in file_cache, so unchanged files are
+    not read again. The cache is machine-local and kept in ./dict_builder/{FOLDER}/file_hashes.json (not tracked).
+
+    Args:
+        path (str): path to the file.
+        file_cache (dict): Format {path: {"size": size, "mtime_ns": modification time, "sha256": hash}}. Updated in place.
+
+    Returns:
+        digest (str): hex digest of the file content.
+    """
+    import hashlib
+    import os
+    stat = os.stat(path)
+    cached = file_cache.get(path)
+    if cached is not None and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+        return cached["sha256"]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    file_cache[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+    return file_cache[path]["sha256"]
+
+
+def build_dicts(FOLDER: str, targets=('stops_dict', 'stoptimes_dict', 'footpath', 'routes_by_stop', 'idx_by_route_stop', 'nearest_metro_station', 'metro_cost'),
+                speed: float = 16, gtfs_files: tuple = None, force: bool = False) -> dict:
+    """
+    This function returns the requested artifacts, rebuilding (and saving) only those whose source files, dependencies
+    or parameters changed since they were last built. Up-to-date artifacts are loaded from disk.
+
+    Args:
+        FOLDER (str): path to network folder.
+        targets (tuple): names of the artifacts to return. See ARTIFACTS.
+        speed (float): vehicle speed in meter/second used by the travel_time artifact.
+        gtfs_files (tuple): optional. Output of gtfs_loader.load_all_db if already loaded. Read lazily otherwise.
+        force (bool): if True, rebuild all required artifacts.
+
+    Returns:
+        artifacts (dict): keys: artifact name, values: artifact.
+
+    Examples:
+        >>> artifacts = build_dicts('./bangalore', targets=('network_snapshot', 'metro_cost'))
+    """
+    import hashlib
+    import json
+    import os
+    import gtfs_loader
+    manifest_path, file_cache_path = f'./dict_builder/{FOLDER}/manifest.json', f'./dict_builder/{FOLDER}/file_hashes.json'
+    try:
+        with open(manifest_path) as file:
+            manifest = {"artifacts": json.load(file).get("artifacts", {})}
+    except FileNotFoundError:
+        manifest = {"artifacts": {}}
+    try:
+        with open(file_cache_path) as file:
+            file_cache = json.load(file)
+    except FileNotFoundError:
+        file_cache = {}
+    file_cache_state = json.dumps(file_cache, sort_keys=True)
+    parameters = {'speed': speed}
+    loaded = {'gtfs': gtfs_files}
+
+    def gtfs():
+        if loaded['gtfs'] is None:
+            loaded['gtfs'] = gtfs_loader.load_all_db(FOLDER)
+        return loaded['gtfs']
+
+    builders = {
+        'stops_dict': lambda: build_save_stops_dict(gtfs()[2], gtfs()[1], FOLDER),
+        'stoptimes_dict': lambda: build_save_stopstimes_dict(gtfs()[2], gtfs()[1], FOLDER),
+        'routes_by_stop': lambda: build_save_route_by_stop(gtfs()[2], FOLDER),
+        'idx_by_route_stop': lambda: stop_idx_in_route(gtfs()[2], FOLDER),
+        'footpath': lambda: build_save_footpath_dict(gtfs()[3], FOLDER),
+        'nearest_metro_station': lambda: build_nearest_metro_station_dict(gtfs()[0], pd.read_csv("ward_lat_lon.csv"), FOLDER),
+        'metro_cost': lambda: build_metro_cost_dict(gtfs()[4], gtfs()[5], FOLDER),
+        'travel_time': lambda: build_save_travel_time_dict(get('stops_dict'), pd.read_pickle('OSM_dist_dict.pkl'), pd.read_pickle('stop_OSMnode_mapping.pkl'),
+                                                           speed, FOLDER),
+        'network_snapshot': lambda: build_save_network_snapshot(get('routes_by_stop'), get('stops_dict'), get('stoptimes_dict'), get('footpath'),
+                                                                get('idx_by_route_stop'), FOLDER, get('travel_time'), get('metro_cost')),
+    }
+    signatures = {}
+
+    def signature(name):
+        if name not in signatures:
+            _, sources, dependencies, params, version = ARTIFACTS[name]
+            state = {'sources': {source: hash_file(source.format(GTFS=f'./GTFS/{FOLDER}'), file_cache) for source in sources},
+                     'dependencies': {dependency: signature(dependency) for dependency in dependencies},
+                     'parameters': {param: parameters[param] for param in params}, 'version': version}
+            signatures[name] = hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+        return signatures[name]
+
+    def get(name):
+        if name not in loaded:
+            path = f'./dict_builder/{FOLDER}/{ARTIFACTS[name][0]}'
+            if force or not os.path.exists(path) or manifest["artifacts"].get(name) != signature(name):
+                for dependency in ARTIFACTS[name][2]:
+                    get(dependency)  # make sure dependencies are fresh before building
+                loaded[name] = builders[name]()
+                manifest["artifacts"][name] = signature(name)
+                with open(manifest_path, 'w') as file:
+                    json.dump(manifest, file, indent=1, sort_keys=True)
+            elif name == 'network_snapshot':
+                loaded[name] = gtfs_loader.load_network_snapshot(FOLDER)
+            else:
+                with open(path, 'rb') as file:
+                    loaded[name] = pickle.load(file)
+        return loaded[name]
+
+    artifacts = {name: get(name) for name in targets}
+    if json.dumps(file_cache, sort_keys=True) != file_cache_state:  # persist refreshed file hashes
+        with open(file_cache_path, 'w') as file:
+            json.dump(file_cache, file, indent=1, sort_keys=True)
+    return artifacts
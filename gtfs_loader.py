@@ -33,6 +33,38 @@ def load_all_dict(FOLDER: str):
     return stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict, nearest_metro_station_dict, metro_cost_dict
 
 
+def load_network_snapshot(FOLDER: str, mmap: bool = True):
+    """
+    Args:
+        FOLDER (str): network folder.
+        mmap (bool): if True, the arrays of the network are read-only memory maps of the snapshot file.
+
+    Returns:
+        network (CompiledNetwork): compiled network saved by dict_builder.build_save_network_snapshot.
+    """
+    from RAPTOR.compiled_network import load_snapshot
+    return load_snapshot(f'./dict_builder/{FOLDER}/network_snapshot.bin', mmap)
+
+
+def load_query_dicts(FOLDER: str):
+    """
+    Loads only the small preprocessed dicts needed next to the network snapshot to build skims.
+
+    Args:
+        FOLDER (str): network folder.
+
+    Returns:
+        nearest_metro_station_dict (dict): preprocessed dict. Format {ward_no: (stop_id, distance in meters)}.
+        metro_cost_dict (dict): preprocessed dict. Format {(origin stop id, destination stop id): fare}.
+    """
+    import pickle
+    with open(f'./dict_builder/{FOLDER}/nearest_metro_station_dict.pkl', 'rb') as file:
+        nearest_metro_station_dict = pickle.load(file)
+    with open(f'./dict_builder/{FOLDER}/metro_cost_dict.pkl', 'rb') as file:
+        metro_cost_dict = pickle.load(file)
+    return nearest_metro_station_dict, metro_cost_dict
+
+
 def load_all_db(FOLDER: str):
     """
     Args:
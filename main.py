@@ -1,6 +1,15 @@
-from RAPTOR.RAPTOR_tweaked import raptor as raptor_tweaked
+import os
+
 from miscellaneous_func import *
+from skim_engine import get_ward_stations, build_station_pair_skim_parallel, iter_ward_skim, build_station_profile_skim, build_ward_profile_skim, \
+    iter_ward_skim_multi_source, SKIM_COLUMNS
+from skim_writer import get_skim_writer
 from RAPTOR.raptor_function_tweaked import *
+from RAPTOR.compiled_network import compile_network
+from RAPTOR.raptor_stats import RaptorStats
+from telemetry import PipelineTelemetry
+import gtfs_loader
+from dict_builder.dict_builder_functions import get_k_nearest_stations
 
 
 
@@ -9,29 +18,44 @@ if __name__ == "__main__":
     FOLDER = './bangalore'
     # print(FOLDER)
 
-    stops_file, trips_file, stop_times_file, transfers_file, stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict, nearest_metro_station_dict, metro_cost_dict, estimated_fare_attributes_file, estimated_fare_rule_file = read_testcase(FOLDER)
-    # _ = generate_mapping(stoptimes_dict,stops_file)
-    print_network_details(transfers_file, trips_file, stops_file)
-    with open('OSM_dist_dict.pkl', 'rb') as file:
-        OSM_dist_dict = pickle.load(file)
-    with open('stop_OSMnode_mapping.pkl', 'rb') as pickle_file:
-        stop_OSMnode_mapping = pickle.load(pickle_file)
+    FAST_STARTUP = 1  # 1: load the precompiled network snapshot, 0: parse GTFS and rebuild the network
     speed = 16 #meter/ssecond
+    REPORT_INTERVAL_SEC = 10  # seconds between two progress reports of the query loop
+    TELEMETRY_FILE = "skim_telemetry.json"  # phase times and query loop throughput/latency of the run
+    telemetry = PipelineTelemetry()
+    if FAST_STARTUP == 1:
+        with telemetry.phase("dict load/build"):
+            network, nearest_metro_station_dict, metro_cost = read_query_artifacts(FOLDER, speed)
+        print(network)
+    else:
+        with telemetry.phase("GTFS load"):
+            gtfs_files = gtfs_loader.load_all_db(FOLDER)
+        with telemetry.phase("dict load/build"):
+            stops_file, trips_file, stop_times_file, transfers_file, stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict, nearest_metro_station_dict, metro_cost_dict, estimated_fare_attributes_file, estimated_fare_rule_file = read_testcase(FOLDER, gtfs_files)
+        # _ = generate_mapping(stoptimes_dict,stops_file)
+        print_network_details(transfers_file, trips_file, stops_file)
+        with telemetry.phase("OSM conversion"):
+            with open('OSM_dist_dict.pkl', 'rb') as file:
+                OSM_dist_dict = pickle.load(file)
+            with open('stop_OSMnode_mapping.pkl', 'rb') as pickle_file:
+                stop_OSMnode_mapping = pickle.load(pickle_file)
 
-    OSM_dist_dict = {key: pd.to_timedelta(round(value/speed,1), unit="seconds") for key, value in OSM_dist_dict.items()}
-    OSM_dist_dict = {key: value.total_seconds() for key, value in OSM_dist_dict.items()}
-
-    stoptimes_dict_modified = {}
-    import numpy as np
-    for route, stop_list in stops_dict.items():
-        travel_time_list = [OSM_dist_dict[(stop_OSMnode_mapping[stop_list[stop_idx]], stop_OSMnode_mapping[stop_list[stop_idx + 1]])] for stop_idx in range(len(stop_list) - 1)]
-        # travel_time_list.insert(0, pd.to_timedelta(0))
-        travel_time_list.insert(0, 0)
-        travel_time_list = np.cumsum(travel_time_list)
-        stoptimes_dict_modified[route] = list(zip(stop_list, travel_time_list))
+            OSM_dist_dict = {key: pd.to_timedelta(round(value/speed,1), unit="seconds") for key, value in OSM_dist_dict.items()}
+            OSM_dist_dict = {key: value.total_seconds() for key, value in OSM_dist_dict.items()}
 
-    footpath_dict_m = {stop_p: [(p_dash, time_valie.total_seconds()) for p_dash, time_valie in value] for stop_p, value in footpath_dict.items()}
+            stoptimes_dict_modified = {}
+            import numpy as np
+            for route, stop_list in stops_dict.items():
+                travel_time_list = [OSM_dist_dict[(stop_OSMnode_mapping[stop_list[stop_idx]], stop_OSMnode_mapping[stop_list[stop_idx + 1]])] for stop_idx in range(len(stop_list) - 1)]
+                # travel_time_list.insert(0, pd.to_timedelta(0))
+                travel_time_list.insert(0, 0)
+                travel_time_list = np.cumsum(travel_time_list)
+                stoptimes_dict_modified[route] = list(zip(stop_list, travel_time_list))
 
+        with telemetry.phase("network compile"):
+            footpath_dict_m = {stop_p: [(p_dash, time_valie.total_seconds()) for p_dash, time_valie in value] for stop_p, value in footpath_dict.items()}
+            network = compile_network(routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict_m, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict)
+        metro_cost = network.fares
 
     D_TIME = pd.to_datetime("2023-01-13 16:00:00")
     print("departure time",D_TIME)
@@ -41,52 +65,52 @@ if __name__ == "__main__":
     CHANGE_TIME_SEC = 0
     PRINT_ITINERARY = 1
     OPTIMIZED = 1
-    d_time_groups = stop_times_file.groupby("stop_id")
-    time_list = []
-    tweak_time, original_time = [], []
-
+    N_WORKERS = os.cpu_count()
     ward_df = pd.read_csv("ward_lat_lon.csv")
     ward_num_list = list(ward_df["ward_no"])
-    source_ward_list = []
-    destination_ward_list = []
-    source_metro_station = []
-    destination_metro_station = []
-    ivtt = []
-    ovtt = []
-    waiting_time = []
-    transfer_time = []
-    metro_fare = []
-    access_time = []
-    egress_time = []
-    num_transfer = []
-    for source_ward in range(len(ward_num_list)):
-        for destination_ward in range(len(ward_num_list)):
-            if ward_num_list[source_ward] != ward_num_list[destination_ward]:
-                SOURCE_WARD = ward_num_list[source_ward]
-                DESTINATION_WARD = ward_num_list[destination_ward]
-                SOURCE_METRO_STOP = nearest_metro_station_dict[SOURCE_WARD][0]
-                DESTINATION_METRO_STOP = nearest_metro_station_dict[DESTINATION_WARD][0]
-                if SOURCE_METRO_STOP != DESTINATION_METRO_STOP:
-                    source_ward_list.append(SOURCE_WARD)
-                    source_metro_station.append(SOURCE_METRO_STOP)
-                    access_time_cal = nearest_metro_station_dict[SOURCE_WARD][1]/(1.34*60)
-                    access_time.append(access_time_cal)
-                    destination_ward_list.append(DESTINATION_WARD)
-                    destination_metro_station.append(DESTINATION_METRO_STOP)
-                    egress_time_cal = nearest_metro_station_dict[DESTINATION_WARD][1]/(1.34*60)
-                    egress_time.append(egress_time_cal)
-                    output = raptor_tweaked(SOURCE_METRO_STOP, DESTINATION_METRO_STOP, D_TIME_m, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC,
-                                            PRINT_ITINERARY,
-                                            routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict_m, idx_by_route_stop_dict,
-                                            stoptimes_dict_modified, metro_cost_dict)
-                    # print("Total time taken",(output[0]["old"][0]-D_TIME_m)/60,"minutes")
-                    for transfers, tt_data in output[0]["tt"]:
-                        transfer_time.append(tt_data["walk_time"]/60)
-                        waiting_time.append(tt_data["wait_time"]/60)
-                        ovtt.append((tt_data["ovtt"]/60) + access_time_cal + egress_time_cal)
-                        ivtt.append(tt_data["ivtt"]/60)
-                        metro_fare.append(tt_data["cost"])
-                        num_transfer.append(transfers)
+    ACCESS_STATIONS = 1  # candidate metro stations per ward. More than 1 runs one multi-source search per ward
+    RAPTOR_STATS = 0  # 1: record and print per-round RAPTOR counters of the skim run (see RAPTOR.raptor_stats)
+    stats = RaptorStats() if RAPTOR_STATS == 1 else None
+    station_list, ward_station_idx, access_time = get_ward_stations(ward_num_list, nearest_metro_station_dict)
+    if ACCESS_STATIONS == 1:
+        with telemetry.phase("query loop"):
+            progress = telemetry.progress("station pair skim", len(station_list), REPORT_INTERVAL_SEC)
+            pair_skim = build_station_pair_skim_parallel(station_list, D_TIME_m, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY,
+                                                         network, metro_cost, N_WORKERS, stats, progress)
+        skim_batches = telemetry.timed_iter(iter_ward_skim(ward_num_list, station_list, ward_station_idx, access_time, pair_skim), "ward skim")
+    else:
+        stops_file = pd.read_csv(f"./GTFS/{FOLDER}/stops.txt", sep=',').sort_values(by=['stop_id']).reset_index(drop=True)
+        _, access_station_ids, access_distance = get_k_nearest_stations(stops_file, ward_df, ACCESS_STATIONS)
+        progress = telemetry.progress("multi-source ward skim", len(ward_num_list), REPORT_INTERVAL_SEC)
+        skim_batches = telemetry.timed_iter(iter_ward_skim_multi_source(ward_num_list, access_station_ids, access_distance, D_TIME_m, MAX_TRANSFER,
+                                                                        WALKING_FROM_SOURCE, CHANGE_TIME_SEC, network, metro_cost, stats=stats,
+                                                                        progress=progress), "query loop")
+    # .csv, .parquet (needs pyarrow), .bin (see skim_writer.read_binary_skim) or .skim (dense matrices, see skim_store.SkimStore)
+    SKIM_FILES = ["skim_matrix.csv"]
+    writers = [get_skim_writer(skim_file, SKIM_COLUMNS, zone_ids=ward_num_list) for skim_file in SKIM_FILES]
+    try:
+        for skim_df in skim_batches:
+            with telemetry.phase("write", report=False):
+                for writer in writers:
+                    writer.write(skim_df)
+    finally:
+        with telemetry.phase("write", report=False):
+            for writer in writers:
+                writer.close()
+    if stats is not None:
+        print(stats)
+
+    # Departure-window (profile) skims on the GTFS timetable
+    PROFILE = 0
+    if PROFILE == 1:
+        START_TIME, END_TIME = pd.to_datetime("2023-01-09 07:00:00"), pd.to_datetime("2023-01-09 10:00:00")
+        BAND_MINUTES = 60
+        with telemetry.phase("profile skim"):
+            progress = telemetry.progress("station profile skim", len(station_list), REPORT_INTERVAL_SEC)
+            profile_df = build_station_profile_skim(station_list, START_TIME, END_TIME, BAND_MINUTES, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC,
+                                                    network, progress=progress)
+            profile_skim_df = build_ward_profile_skim(ward_num_list, station_list, ward_station_idx, access_time, profile_df)
+            profile_skim_df.to_csv("skim_matrix_profile.csv", index=False)
 
-    skim_df = pd.DataFrame(list(zip(source_ward_list, destination_ward_list, source_metro_station, destination_metro_station, ivtt, ovtt, waiting_time, transfer_time, metro_fare, access_time, egress_time, num_transfer)), columns=['source_ward', 'destination_ward', 'source_metro_station', 'destination_metro_station', 'ivtt', 'ovtt', 'waiting_time', 'transfer_time', 'metro_fare', 'access_time', 'egress_time', 'num_transfer'])
-    skim_df.to_csv("skim_matrix.csv", index=False)
+    telemetry.print_summary()
+    telemetry.write_summary(TELEMETRY_FILE)
@@ -6,17 +6,17 @@ Module contains miscellaneous functions used for reading data, printing logo etc
 import pickle
 from random import sample
 
-import networkx as nx
 import pandas
 import pandas as pd
 
 
-def read_testcase(FOLDER: str) -> tuple:
+def read_testcase(FOLDER: str, gtfs_files: tuple = None) -> tuple:
     """
-    Reads the GTFS network and preprocessed dict. If the dicts are not present, dict_builder_functions are called to construct them.
+    Reads the GTFS network and preprocessed dict. Dicts that are missing or whose GTFS sources changed are rebuilt by dict_builder_functions.build_dicts.
 
     Args:
         FOLDER (str): GTFS path
+        gtfs_files (tuple): optional. Output of gtfs_loader.load_all_db if already loaded.
 
     Returns:
         stops_file (pandas.dataframe):  stops.txt file in GTFS.
@@ -35,21 +35,40 @@ def read_testcase(FOLDER: str) -> tuple:
     """
     import gtfs_loader
     from dict_builder import dict_builder_functions
-    stops_file, trips_file, stop_times_file, transfers_file, estimated_fare_attributes_file, estimated_fare_rule_file = gtfs_loader.load_all_db(FOLDER)
-    try:
-        stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict, nearest_metro_station_dict, metro_cost_dict = gtfs_loader.load_all_dict(FOLDER)
-    except FileNotFoundError:
-        stops_dict = dict_builder_functions.build_save_stops_dict(stop_times_file, trips_file, FOLDER)
-        stoptimes_dict = dict_builder_functions.build_save_stopstimes_dict(stop_times_file, trips_file, FOLDER)
-        routes_by_stop_dict = dict_builder_functions.build_save_route_by_stop(stop_times_file, FOLDER)
-        footpath_dict = dict_builder_functions.build_save_footpath_dict(transfers_file, FOLDER)
-        idx_by_route_stop_dict = dict_builder_functions.stop_idx_in_route(stop_times_file, FOLDER)
-        ward_df = pd.read_csv("ward_lat_lon.csv")
-        nearest_metro_station_dict = dict_builder_functions.build_nearest_metro_station_dict(stops_file, ward_df, FOLDER)
-        metro_cost_dict = dict_builder_functions.build_metro_cost_dict(estimated_fare_attributes_file, estimated_fare_rule_file, FOLDER)
+    gtfs_files = gtfs_loader.load_all_db(FOLDER) if gtfs_files is None else gtfs_files
+    stops_file, trips_file, stop_times_file, transfers_file, estimated_fare_attributes_file, estimated_fare_rule_file = gtfs_files
+    artifacts = dict_builder_functions.build_dicts(FOLDER, gtfs_files=(stops_file, trips_file, stop_times_file, transfers_file, estimated_fare_attributes_file,
+                                                                       estimated_fare_rule_file))
+    stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict = artifacts['stops_dict'], artifacts['stoptimes_dict'], artifacts['footpath'], artifacts['routes_by_stop']
+    idx_by_route_stop_dict, nearest_metro_station_dict, metro_cost_dict = artifacts['idx_by_route_stop'], artifacts['nearest_metro_station'], artifacts['metro_cost']
     return stops_file, trips_file, stop_times_file, transfers_file, stops_dict, stoptimes_dict, footpath_dict, routes_by_stop_dict, idx_by_route_stop_dict, nearest_metro_station_dict, metro_cost_dict, estimated_fare_attributes_file, estimated_fare_rule_file
 
 
+def read_query_artifacts(FOLDER: str, speed: float = 16) -> tuple:
+    """
+    Fast startup path. Reads only the precompiled query artifacts: the network snapshot (with road travel times and
+    footpaths already in seconds) and the dicts needed to build skims. Raw GTFS files are parsed only if an artifact is
+    missing or its sources changed, in which case it is rebuilt by dict_builder_functions.build_dicts.
+
+    Args:
+        FOLDER (str): GTFS path
+        speed (float): vehicle speed in meter/second used to build the road travel times when the snapshot is missing.
+
+    Returns:
+        network (CompiledNetwork): compiled network. See RAPTOR.compiled_network.
+        nearest_metro_station_dict (dict): preprocessed dict. Format {ward_no: (stop_id, distance in meters)}.
+        metro_cost (FareMatrix): fares stored in the network snapshot. Can be used in place of metro_cost_dict.
+
+    Examples:
+        >>> FOLDER = './bangalore'
+        >>> network, nearest_metro_station_dict, metro_cost = read_query_artifacts(FOLDER)
+    """
+    from dict_builder import dict_builder_functions
+    artifacts = dict_builder_functions.build_dicts(FOLDER, targets=('network_snapshot', 'nearest_metro_station'), speed=speed)
+    network, nearest_metro_station_dict = artifacts['network_snapshot'], artifacts['nearest_metro_station']
+    return network, nearest_metro_station_dict, network.fares
+
+
 def print_logo() -> None:
     """
     Prints the logo
@@ -316,39 +335,19 @@ def get_full_trans(FOLDER: str, time_limit) -> None:
     Returns:
         None
     '''
+    from dict_builder import dict_builder_functions
     #    print('editing transfers')
     transfers_file = pd.read_csv(f'./GTFS/{FOLDER[2:]}/transfers.txt', sep=',')
     ini_len = len(transfers_file)
     # print(f"initial graph transfer {len(transfers_file)}")
-    if time_limit != "full":
-        transfers_file = transfers_file[transfers_file.min_transfer_time < time_limit].reset_index(drop=True)
-    G = nx.Graph()
-    edges = list(zip(transfers_file.from_stop_id, transfers_file.to_stop_id, transfers_file.min_transfer_time))
-    G.add_weighted_edges_from(edges)
-    connected = [c for c in nx.connected_components(G)]
-    for tree in connected:
-        for SOURCE in tree:
-            for desti in tree:
-                if SOURCE != desti and (SOURCE, desti) not in G.edges():
-                    G.add_edge(SOURCE, desti, weight=nx.dijkstra_path_length(G, SOURCE, desti))
-    footpath = list(G.edges(data=True))
-    reve_edges = [(x[1], x[0], x[-1]) for x in G.edges(data=True)]
-    footpath.extend(reve_edges)
-    footpath_db = pd.DataFrame(footpath)
-    footpath_db[2] = footpath_db[2].apply(lambda x: list(x.values())[0])
-    footpath_db.rename(columns={0: "from_stop_id", 1: "to_stop_id", 2: "min_transfer_time"}, inplace=True)
+    footpath_db = dict_builder_functions.build_footpath_closure(transfers_file, time_limit)
     footpath_db.to_csv(f'./GTFS/{FOLDER}/transfers_full.csv', index=False)
     if len(footpath_db) != ini_len:
         print(f"initial graph transfer {len(transfers_file)}")
         print(f"full graph transfer {len(footpath_db)}")
         print(f"check")
-    transfers_dict = {}
-    g = footpath_db.groupby("from_stop_id")
-    for from_stop, details in g:
-        transfers_dict[from_stop] = []
-        for _, row in details.iterrows():
-            transfers_dict[from_stop].append(
-                (row.to_stop_id, pd.to_timedelta(float(row.min_transfer_time), unit='seconds')))
+    transfers_dict = dict_builder_functions.build_footpath_dict(footpath_db.from_stop_id.to_numpy(), footpath_db.to_stop_id.to_numpy(),
+                                                                footpath_db.min_transfer_time.to_numpy())
     with open(f'./dict_builder/{FOLDER}/transfers_dict_full.pkl', 'wb') as pickle_file:
         pickle.dump(transfers_dict, pickle_file)
     return None
@@ -364,6 +363,7 @@ def check_footpath(footpath_dict: dict) -> None:
     Returns:
         None
     '''
+    import networkx as nx
     edges = []
     for from_s, to_s in footpath_dict.items():
         to_s, _ = zip(*to_s)
@@ -0,0 +1,304 @@
+"""
+Module contains a long-running query server. The network is loaded once and RAPTOR queries between stops or coordinates
+are answered over HTTP (TCP or Unix socket), with a bounded LRU cache of results.
+
+Endpoints (GET, JSON responses):
+    /query?mode=raptor_tweaked&source=G_5&destination=P_1&time=2023-01-13T16:00:00&max_transfer=2
+    /query?mode=std_raptor&src_lat=12.97&src_lon=77.59&dst_lat=12.91&dst_lon=77.63&time=2023-01-09T08:00:00
+    /stats
+
+raptor_tweaked uses route travel times and answers for any departure time. std_raptor runs on the GTFS timetable: its
+journeys only hold arrival times, and come back empty for departure times outside the service date of the feed
+(2023-01-09 for bangalore).
+"""
+import json
+import socketserver
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from RAPTOR.RAPTOR_tweaked import raptor_compiled as raptor_tweaked_compiled
+from RAPTOR.std_raptor import raptor_compiled as std_raptor_compiled
+from RAPTOR.compiled_network import to_seconds
+from dict_builder.dict_builder_functions import EARTH_RADIUS
+from skim_engine import WALKING_SPEED
+
+QUERY_MODES = ('raptor_tweaked', 'std_raptor')
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry once maxsize entries are stored.
+
+    Parameters
+    ----------
+    maxsize : int
+        maximum number of entries.
+
+    Attributes
+    ----------
+    hits : int
+        number of successful lookups.
+    misses : int
+        number of failed lookups.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits, self.misses = 0, 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        """
+        Returns the value of key (marking it as most recently used) or None if key is not cached.
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value) -> None:
+        """
+        Stores value under key, evicting the least recently used entry if the cache is full.
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class QueryEngine:
+    """
+    Answers RAPTOR queries on a loaded network and caches the results. Departure times are rounded up to the end of
+    their BUCKET_SEC bucket, so all queries of a bucket share one cached result (computed for the bucket end). Rounding
+    up keeps every returned journey feasible: it never departs before the requested time.
+
+    Parameters
+    ----------
+    network : CompiledNetwork
+        compiled network with trip and route travel times. See RAPTOR.compiled_network.compile_network.
+    metro_cost_dict : dict/FareMatrix
+        fares. Format {(origin stop id, destination stop id): fare}, or network.fares.
+    stops_file : pandas.dataframe
+        optional. stops.txt file in GTFS, needed for queries by coordinates.
+    CACHE_SIZE : int
+        maximum number of cached results.
+    BUCKET_SEC : int
+        size of a departure time bucket in seconds.
+    WALKING_FROM_SOURCE : int
+        1 or 0. 1 indicates walking from SOURCE is allowed.
+    CHANGE_TIME_SEC : int
+        change-time in seconds.
+
+    Examples:
+        >>> engine = QueryEngine(network, network.fares, stops_file)
+        >>> engine.query('raptor_tweaked', 'G_5', 'P_1', pd.to_datetime('2023-01-13 16:00:00'), 2)
+        >>> engine.query('std_raptor', 'G_5', 'P_1', pd.to_datetime('2023-01-09 08:00:00'), 2)  # a departure on the timetable date
+    """
+
+    def __init__(self, network, metro_cost_dict, stops_file=None, CACHE_SIZE: int = 10000, BUCKET_SEC: int = 60, WALKING_FROM_SOURCE: int = 1,
+                 CHANGE_TIME_SEC: int = 0):
+        self.network, self.metro_cost_dict, self.stops_file = network, metro_cost_dict, stops_file
+        self.cache = LRUCache(CACHE_SIZE)
+        self.BUCKET_SEC, self.WALKING_FROM_SOURCE, self.CHANGE_TIME_SEC = BUCKET_SEC, WALKING_FROM_SOURCE, CHANGE_TIME_SEC
+        self._station_tree = None
+
+    def get_stop_id(self, value: str):
+        """
+        Converts a stop id given as text to the stop id of the network.
+        """
+        if value in self.network.stop_idx:
+            return value
+        try:
+            stop_id = int(value)
+        except ValueError:
+            raise KeyError(f"Unknown stop {value}")
+        if stop_id not in self.network.stop_idx:
+            raise KeyError(f"Unknown stop {value}")
+        return stop_id
+
+    def nearest_station(self, lat: float, lon: float) -> tuple:
+        """
+        Returns the nearest stop of (lat, lon) and its great-circle distance in meters.
+        """
+        if self.stops_file is None:
+            raise ValueError("Queries by coordinates need the stops file")
+        if self._station_tree is None:
+            from sklearn.neighbors import BallTree
+            self._station_tree = BallTree(np.radians(self.stops_file[["stop_lat", "stop_lon"]].to_numpy(dtype=np.float64)), metric="haversine")
+        distance, index = self._station_tree.query(np.radians([[lat, lon]]), k=1)
+        return self.stops_file["stop_id"].iloc[index[0, 0]], distance[0, 0] * EARTH_RADIUS
+
+    def query(self, mode: str, SOURCE, DESTINATION, D_TIME, MAX_TRANSFER: int) -> dict:
+        """
+        Runs (or looks up) a query between two stops.
+
+        Args:
+            mode (str): 'raptor_tweaked' or 'std_raptor'.
+            SOURCE (int): stop id of source stop.
+            DESTINATION (int): stop id of destination stop.
+            D_TIME (pandas.datetime/float): departure time.
+            MAX_TRANSFER (int): maximum transfer limit.
+
+        Returns:
+            result (dict): {'source', 'destination', 'departure_time', 'journeys'}. For raptor_tweaked every journey has
+            num_transfer, arrival_time and the travel times of get_t_times (seconds); for std_raptor it has the pareto-optimal
+            arrival_time only. journeys is empty if DESTINATION cannot be reached (for std_raptor also when D_TIME is not on
+            the service date of the timetable).
+        """
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Unknown mode {mode}. Supported modes: {', '.join(QUERY_MODES)}")
+        if SOURCE == DESTINATION:
+            raise ValueError("SOURCE and DESTINATION are the same stop")
+        bucket = -(-to_seconds(D_TIME) // self.BUCKET_SEC) * self.BUCKET_SEC
+        key = (mode, SOURCE, DESTINATION, bucket, MAX_TRANSFER)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._run_query(mode, SOURCE, DESTINATION, bucket, MAX_TRANSFER)
+            self.cache.put(key, result)
+        return result
+
+    def query_coordinates(self, mode: str, src_lat: float, src_lon: float, dst_lat: float, dst_lon: float, D_TIME, MAX_TRANSFER: int) -> dict:
+        """
+        Same as query, between the nearest stops of two points. The traveller walks to the source stop first, so the
+        departure from the stop is D_TIME plus the access time. The access and egress distances (meters) and times
+        (seconds) are added to the result.
+        """
+        SOURCE, access_distance = self.nearest_station(src_lat, src_lon)
+        DESTINATION, egress_distance = self.nearest_station(dst_lat, dst_lon)
+        access_time, egress_time = access_distance / WALKING_SPEED, egress_distance / WALKING_SPEED
+        result = dict(self.query(mode, SOURCE, DESTINATION, to_seconds(D_TIME) + access_time, MAX_TRANSFER))
+        result.update(access_distance=access_distance, access_time=access_time, egress_distance=egress_distance, egress_time=egress_time)
+        return result
+
+    def _run_query(self, mode: str, SOURCE, DESTINATION, D_TIME: float, MAX_TRANSFER: int) -> dict:
+        journeys = []
+        if mode == 'raptor_tweaked':
+            rap_out = raptor_tweaked_compiled(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, self.WALKING_FROM_SOURCE, self.CHANGE_TIME_SEC, 0,
+                                              self.network, self.metro_cost_dict, ITINERARY=0)[0]
+            if rap_out is not None:
+                for arrival_time, (num_transfer, tt_data) in zip(rap_out['old'], rap_out['tt']):
+                    journeys.append({'num_transfer': num_transfer, 'arrival_time': _to_isoformat(arrival_time),
+                                     **{name: float(value) for name, value in tt_data.items()}})
+        else:
+            rap_out = std_raptor_compiled(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, self.WALKING_FROM_SOURCE, self.CHANGE_TIME_SEC, 0, self.network)[0]
+            if rap_out is not None:
+                journeys = [{'arrival_time': _to_isoformat(arrival_time)} for arrival_time in rap_out]
+        return {'source': _json_value(SOURCE), 'destination': _json_value(DESTINATION), 'departure_time': _to_isoformat(D_TIME), 'journeys': journeys}
+
+
+def _to_isoformat(time) -> str:
+    """
+    Formats a time (pandas.datetime or seconds) as ISO 8601.
+    """
+    return pd.to_datetime(to_seconds(time), unit='s').isoformat()
+
+
+def _json_value(value):
+    """
+    Converts numpy scalars to python scalars for JSON responses.
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _get_param(params: dict, name: str) -> str:
+    """
+    Returns the value of a required query parameter.
+    """
+    if name not in params:
+        raise KeyError(f"missing parameter {name}")
+    return params[name]
+
+
+def make_handler(engine: QueryEngine):
+    """
+    Returns the HTTP request handler class answering queries with engine.
+    """
+
+    class QueryHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                if url.path == '/stats':
+                    self._send(200, {'cached': len(engine.cache), 'hits': engine.cache.hits, 'misses': engine.cache.misses})
+                elif url.path == '/query':
+                    self._send(200, self._query(params))
+                else:
+                    self._send(404, {'error': f"Unknown path {url.path}"})
+            except (KeyError, ValueError) as error:
+                self._send(400, {'error': str(error).strip("'")})
+
+        def _query(self, params: dict) -> dict:
+            mode = params.get('mode', 'raptor_tweaked')
+            D_TIME = pd.to_datetime(_get_param(params, 'time'))
+            MAX_TRANSFER = int(params.get('max_transfer', 2))
+            if 'source' in params:
+                return engine.query(mode, engine.get_stop_id(params['source']), engine.get_stop_id(_get_param(params, 'destination')), D_TIME,
+                                    MAX_TRANSFER)
+            return engine.query_coordinates(mode, *(float(_get_param(params, name)) for name in ('src_lat', 'src_lon', 'dst_lat', 'dst_lon')),
+                                            D_TIME, MAX_TRANSFER)
+
+        def _send(self, status: int, body: dict) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            print(f"query server: {format % args}")
+
+    return QueryHandler
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    """
+    HTTP server listening on a Unix socket.
+    """
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+
+def serve(engine: QueryEngine, HOST: str = '127.0.0.1', PORT: int = 8642, SOCKET_PATH: str = None) -> None:
+    """
+    Serves queries until interrupted. Requests are handled one at a time, so the RAPTOR workspace of the network is
+    never shared between queries.
+
+    Args:
+        engine (QueryEngine): query engine.
+        HOST (str): address to listen on.
+        PORT (int): TCP port.
+        SOCKET_PATH (str): if given, listen on this Unix socket instead of HOST:PORT.
+    """
+    server = UnixHTTPServer(SOCKET_PATH, make_handler(engine)) if SOCKET_PATH else HTTPServer((HOST, PORT), make_handler(engine))
+    print(f"query server: listening on {SOCKET_PATH or f'http://{HOST}:{PORT}'}")
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    from miscellaneous_func import read_query_artifacts
+
+    FOLDER = './bangalore'
+    speed = 16  # meter/second
+    network, _, metro_cost = read_query_artifacts(FOLDER, speed)
+    stops_file = pd.read_csv(f"./GTFS/{FOLDER}/stops.txt", sep=',').sort_values(by=['stop_id']).reset_index(drop=True)
+    serve(QueryEngine(network, metro_cost, stops_file))
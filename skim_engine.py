@@ -0,0 +1,403 @@
+"""
+Module contains the skim engine used to build the ward-to-ward metro skim matrix.
+Every ward is served by exactly one metro station, so each (source station, destination station) result is computed
+once (one One-To-All RAPTOR search per source station) and the ward matrix is broadcast from the station results with
+array indexing. With several candidate stations per ward, iter_ward_skim_multi_source runs one multi-source search per
+source ward instead. Ward skims are produced in batches of source wards so that they can be streamed to disk.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from RAPTOR.RAPTOR_tweaked import raptor_compiled as raptor_tweaked_compiled, raptor_multi_source_compiled
+from RAPTOR.raptor_function_tweaked import post_processing_multi_source
+from RAPTOR.compiled_network import to_seconds
+from RAPTOR.journey_metrics import get_pareto_legs, get_batch_metrics
+from RAPTOR.raptor_stats import RaptorStats
+from RAPTOR.rraptor import rraptor_compiled, get_profile_at, PROFILE_METRICS
+
+SKIM_COLUMNS = ['source_ward', 'destination_ward', 'source_metro_station', 'destination_metro_station', 'ivtt', 'ovtt', 'waiting_time',
+                'transfer_time', 'metro_fare', 'access_time', 'egress_time', 'num_transfer']
+PROFILE_SKIM_COLUMNS = ['source_ward', 'destination_ward', 'source_metro_station', 'destination_metro_station', 'time_band', 'statistic', 'ivtt',
+                        'ovtt', 'waiting_time', 'access_time', 'egress_time', 'reachable_share']
+WALKING_SPEED = 1.34  # meter/second
+
+
+def get_ward_stations(ward_num_list: list, nearest_metro_station_dict: dict, WALKING_SPEED: float = WALKING_SPEED) -> tuple:
+    """
+    Maps every ward to its nearest metro station and computes the access (egress) time vector.
+
+    Args:
+        ward_num_list (list): ward numbers in the order of ward_lat_lon.csv.
+        nearest_metro_station_dict (dict): preprocessed dict. Format {ward_no: (stop_id, distance in meters)}.
+        WALKING_SPEED (float): walking speed in meter/second.
+
+    Returns:
+        station_list (list): metro stations serving at least one ward, in order of first appearance.
+        ward_station_idx (numpy.ndarray): index into station_list for every ward.
+        access_time (numpy.ndarray): walking time in minutes between every ward and its metro station.
+    """
+    station_list, station_idx = [], {}
+    ward_station_idx = np.empty(len(ward_num_list), dtype=np.int64)
+    access_time = np.empty(len(ward_num_list), dtype=np.float64)
+    for w_idx, ward in enumerate(ward_num_list):
+        stop_id, distance = nearest_metro_station_dict[ward]
+        if stop_id not in station_idx:
+            station_idx[stop_id] = len(station_list)
+            station_list.append(stop_id)
+        ward_station_idx[w_idx] = station_idx[stop_id]
+        access_time[w_idx] = distance / (WALKING_SPEED * 60)
+    return station_list, ward_station_idx, access_time
+
+
+def build_station_pair_skim(station_list: list, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
+                            network, metro_cost_dict: dict, stats=None, progress=None) -> dict:
+    """
+    Computes the tweaked RAPTOR result for every ordered pair of distinct stations with one One-To-All search per source station.
+
+    Args:
+        station_list (list): stop ids of the metro stations to be skimmed.
+        D_TIME (float): departure time in seconds (unix timestamp).
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        network (CompiledNetwork): compiled network with route travel times. See RAPTOR.compiled_network.compile_network.
+        metro_cost_dict (dict/FareMatrix): fares. Format {(origin stop id, destination stop id): fare}, or network.fares.
+        stats (RaptorStats): optional. Per-round counters all searches of the skim are added to. See RAPTOR.raptor_stats.
+        progress (ProgressTracker): optional. Every source station search is recorded in it. See telemetry.
+
+    Returns:
+        pair_skim (dict): Format {(source station, destination station): [(num_transfers, travel_time_dict)]}. See get_t_times
+        for the description of travel_time_dict. Unreachable pairs map to an empty list.
+    """
+    pair_skim = {}
+    for SOURCE in station_list:
+        start = time.perf_counter()
+        station_skim = _get_station_skim(SOURCE, station_list, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY, network,
+                                         metro_cost_dict, stats)
+        if progress is not None:
+            progress.record(time.perf_counter() - start)
+        for DESTINATION, tt_data in station_skim:
+            pair_skim[(SOURCE, DESTINATION)] = tt_data
+    return pair_skim
+
+
+def _get_station_skim(SOURCE, station_list: list, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
+                      network, metro_cost_dict, stats=None) -> list:
+    """
+    Runs the One-To-All search from SOURCE and returns the skim of every other station. The metrics of all pareto
+    journeys are computed in one batch from the array labels (see RAPTOR.journey_metrics); if PRINT_ITINERARY is 1 the
+    itineraries are built and printed by the post processing instead.
+
+    Returns:
+        station_skim (list): [(destination station, [(num_transfers, travel_time_dict)])] in the order of station_list.
+    """
+    destinations = [DESTINATION for DESTINATION in station_list if DESTINATION != SOURCE]
+    if PRINT_ITINERARY == 1:
+        _, _, rap_out_dict = raptor_tweaked_compiled(SOURCE, None, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY,
+                                                     network, metro_cost_dict, ITINERARY=0, stats=stats)
+        return [(DESTINATION, rap_out_dict[DESTINATION]["tt"] if DESTINATION in rap_out_dict else []) for DESTINATION in destinations]
+    label, pi_label = raptor_tweaked_compiled(SOURCE, None, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY,
+                                              network, metro_cost_dict, POST_PROCESSING=0, stats=stats)
+    legs = get_pareto_legs(label, pi_label, [network.stop_idx[DESTINATION] for DESTINATION in destinations])
+    metrics = get_batch_metrics(legs, metro_cost_dict, network)
+    metric_lists = {name: values.tolist() for name, values in metrics.items()}
+    station_skim = {DESTINATION: [] for DESTINATION in destinations}
+    for j_idx, (destination, num_transfer) in enumerate(zip(legs.destination.tolist(), legs.num_transfer.tolist())):
+        station_skim[network.stop_ids[destination]].append((num_transfer, {name: values[j_idx] for name, values in metric_lists.items()}))
+    return list(station_skim.items())
+
+
+_worker_state = {}  # network and query parameters inherited by the forked skim workers
+
+
+def _skim_source_station(SOURCE) -> list:
+    """
+    Worker function of build_station_pair_skim_parallel. Runs the One-To-All search from SOURCE on the network inherited
+    from the parent process.
+
+    Args:
+        SOURCE (int): stop id of source station.
+
+    Returns:
+        station_skim (list): [(destination station, [(num_transfers, travel_time_dict)])] in the order of station_list.
+        stats (RaptorStats): counters of the search, None if the parent process does not record them.
+        seconds (float): run time of the search.
+    """
+    state = _worker_state
+    start = time.perf_counter()
+    stats = RaptorStats() if state["stats"] is not None else None
+    station_skim = _get_station_skim(SOURCE, state["station_list"], state["D_TIME"], state["MAX_TRANSFER"], state["WALKING_FROM_SOURCE"],
+                                     state["CHANGE_TIME_SEC"], state["PRINT_ITINERARY"], state["network"], state["metro_cost_dict"], stats)
+    return station_skim, stats, time.perf_counter() - start
+
+
+def build_station_pair_skim_parallel(station_list: list, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int, CHANGE_TIME_SEC: int, PRINT_ITINERARY: int,
+                                     network, metro_cost_dict: dict, N_WORKERS: int = None, stats=None, progress=None) -> dict:
+    """
+    Same as build_station_pair_skim, but source stations are sharded across a process pool. Workers are forked after the
+    network is set up, so they inherit it copy-on-write instead of receiving a pickled copy. Results are merged in the
+    order of station_list, independent of the order in which workers finish. Falls back to build_station_pair_skim when
+    fork is unavailable or a single worker is requested.
+
+    Args:
+        station_list (list): stop ids of the metro stations to be skimmed.
+        D_TIME (float): departure time in seconds (unix timestamp).
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        PRINT_ITINERARY (int): 1 or 0. 1 means print complete path.
+        network (CompiledNetwork): compiled network with route travel times. See RAPTOR.compiled_network.compile_network.
+        metro_cost_dict (dict/FareMatrix): fares. Format {(origin stop id, destination stop id): fare}, or network.fares.
+        N_WORKERS (int): number of worker processes. Defaults to the number of CPUs.
+        stats (RaptorStats): optional. Per-round counters all searches of the skim are added to (merged from the workers).
+        progress (ProgressTracker): optional. Every source station search is recorded in it as its result arrives. See telemetry.
+
+    Returns:
+        pair_skim (dict): see build_station_pair_skim.
+    """
+    N_WORKERS = min(N_WORKERS or os.cpu_count() or 1, len(station_list))
+    if N_WORKERS <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return build_station_pair_skim(station_list, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, PRINT_ITINERARY, network, metro_cost_dict,
+                                       stats, progress)
+    _worker_state.update(station_list=station_list, D_TIME=D_TIME, MAX_TRANSFER=MAX_TRANSFER, WALKING_FROM_SOURCE=WALKING_FROM_SOURCE,
+                         CHANGE_TIME_SEC=CHANGE_TIME_SEC, PRINT_ITINERARY=PRINT_ITINERARY, network=network, metro_cost_dict=metro_cost_dict,
+                         stats=stats)
+    pair_skim = {}
+    try:
+        chunksize = max(1, len(station_list) // (4 * N_WORKERS))
+        with ProcessPoolExecutor(max_workers=N_WORKERS, mp_context=multiprocessing.get_context("fork")) as executor:
+            for SOURCE, (station_skim, worker_stats, seconds) in zip(station_list, executor.map(_skim_source_station, station_list, chunksize=chunksize)):
+                if stats is not None:
+                    stats.merge(worker_stats)
+                if progress is not None:
+                    progress.record(seconds)
+                for DESTINATION, tt_data in station_skim:
+                    pair_skim[(SOURCE, DESTINATION)] = tt_data
+    finally:
+        _worker_state.clear()
+    return pair_skim
+
+
+def iter_ward_skim(ward_num_list: list, station_list: list, ward_station_idx, access_time, pair_skim: dict, BATCH_WARDS: int = 64):
+    """
+    Broadcasts the station pair skim to all ward pairs, one batch of source wards at a time. Rows follow the order of the
+    ward loop in main.py: source ward, then destination ward, then the pareto-optimal journeys of the station pair. Ward
+    pairs sharing a station are skipped.
+
+    Args:
+        ward_num_list (list): ward numbers.
+        station_list (list): metro station ids. See get_ward_stations.
+        ward_station_idx (numpy.ndarray): index into station_list for every ward.
+        access_time (numpy.ndarray): walking time in minutes between every ward and its metro station.
+        pair_skim (dict): output of build_station_pair_skim.
+        BATCH_WARDS (int): number of source wards per batch.
+
+    Yields:
+        skim_df (pandas.dataframe): skim rows of BATCH_WARDS source wards with columns SKIM_COLUMNS. See skim_writer for
+        writing the batches to disk.
+    """
+    n_station = len(station_list)
+    # Flatten the station pair results into CSR arrays indexed by src * n_station + dst
+    pair_count = np.zeros(n_station * n_station, dtype=np.int64)
+    transfers, walk_time, wait_time, ovtt, ivtt, cost = [], [], [], [], [], []
+    for s_idx, SOURCE in enumerate(station_list):
+        for d_idx, DESTINATION in enumerate(station_list):
+            for num_transfer, tt_data in pair_skim.get((SOURCE, DESTINATION), []):
+                pair_count[s_idx * n_station + d_idx] += 1
+                transfers.append(num_transfer)
+                walk_time.append(tt_data["walk_time"])
+                wait_time.append(tt_data["wait_time"])
+                ovtt.append(tt_data["ovtt"])
+                ivtt.append(tt_data["ivtt"])
+                cost.append(tt_data["cost"])
+    pair_start = np.concatenate(([0], np.cumsum(pair_count)[:-1]))
+
+    ivtt, ovtt = np.asarray(ivtt, dtype=np.float64) / 60, np.asarray(ovtt, dtype=np.float64) / 60
+    wait_time, walk_time = np.asarray(wait_time, dtype=np.float64) / 60, np.asarray(walk_time, dtype=np.float64) / 60
+    cost, transfers = np.asarray(cost, dtype=np.float64), np.asarray(transfers, dtype=np.int64)
+
+    ward_arr = np.asarray(ward_num_list)
+    station_arr = np.asarray(station_list, dtype=object)
+    for batch_start in range(0, len(ward_arr), BATCH_WARDS):
+        yield _get_ward_skim_batch(np.arange(batch_start, min(batch_start + BATCH_WARDS, len(ward_arr))), ward_arr, station_arr, ward_station_idx,
+                                   access_time, pair_count, pair_start, (ivtt, ovtt, wait_time, walk_time, cost, transfers))
+
+
+def _get_ward_skim_batch(source_wards, ward_arr, station_arr, ward_station_idx, access_time, pair_count, pair_start, pair_metrics) -> pd.DataFrame:
+    """
+    Skim rows of the given source wards. Parent Function: iter_ward_skim
+    """
+    n_station = len(station_arr)
+    ivtt, ovtt, wait_time, walk_time, cost, transfers = pair_metrics
+    src_ward, dst_ward = np.meshgrid(source_wards, np.arange(len(ward_arr)), indexing="ij")
+    src_ward, dst_ward = src_ward.ravel(), dst_ward.ravel()
+    src_station, dst_station = ward_station_idx[src_ward], ward_station_idx[dst_ward]
+    keep = (ward_arr[src_ward] != ward_arr[dst_ward]) & (src_station != dst_station)
+    src_ward, dst_ward, src_station, dst_station = src_ward[keep], dst_ward[keep], src_station[keep], dst_station[keep]
+
+    pair_id = src_station * n_station + dst_station
+    rows_per_pair = pair_count[pair_id]
+    row_offset = np.arange(rows_per_pair.sum()) - np.repeat(np.cumsum(rows_per_pair) - rows_per_pair, rows_per_pair)
+    entry = np.repeat(pair_start[pair_id], rows_per_pair) + row_offset
+    src_ward, dst_ward = np.repeat(src_ward, rows_per_pair), np.repeat(dst_ward, rows_per_pair)
+    src_station, dst_station = np.repeat(src_station, rows_per_pair), np.repeat(dst_station, rows_per_pair)
+
+    access, egress = access_time[src_ward], access_time[dst_ward]
+    skim_df = pd.DataFrame({
+        'source_ward': ward_arr[src_ward],
+        'destination_ward': ward_arr[dst_ward],
+        'source_metro_station': station_arr[src_station],
+        'destination_metro_station': station_arr[dst_station],
+        'ivtt': ivtt[entry],
+        'ovtt': ovtt[entry] + access + egress,
+        'waiting_time': wait_time[entry],
+        'transfer_time': walk_time[entry],
+        'metro_fare': cost[entry],
+        'access_time': access,
+        'egress_time': egress,
+        'num_transfer': transfers[entry],
+    }, columns=SKIM_COLUMNS)
+    return skim_df
+
+
+def build_ward_skim(ward_num_list: list, station_list: list, ward_station_idx, access_time, pair_skim: dict) -> pd.DataFrame:
+    """
+    Same as iter_ward_skim, but returns the whole skim as one dataframe.
+
+    Returns:
+        skim_df (pandas.dataframe): ward-to-ward skim with columns SKIM_COLUMNS.
+    """
+    return pd.concat(iter_ward_skim(ward_num_list, station_list, ward_station_idx, access_time, pair_skim), ignore_index=True)
+
+
+def iter_ward_skim_multi_source(ward_num_list: list, station_ids, distance, D_TIME, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int,
+                                CHANGE_TIME_SEC: int, network, metro_cost_dict, WALKING_SPEED: float = WALKING_SPEED, stats=None,
+                                progress=None):
+    """
+    Ward-to-ward skim with several candidate stations per ward. One multi-source search is run per source ward, seeded
+    with all its candidate stations at their access times, and post processed for every destination ward with its
+    candidate stations and egress times. The stations of each journey are the ones chosen by the search.
+
+    Args:
+        ward_num_list (list): ward numbers.
+        station_ids (numpy.ndarray): shape (wards, k). Candidate stations of every ward. See get_k_nearest_stations.
+        distance (numpy.ndarray): shape (wards, k). Walking distance in meters to every candidate station.
+        D_TIME (float): departure time from the source ward in seconds (unix timestamp).
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from the access stations is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        network (CompiledNetwork): compiled network with route travel times. See RAPTOR.compiled_network.compile_network.
+        metro_cost_dict (dict/FareMatrix): fares. Format {(origin stop id, destination stop id): fare}, or network.fares.
+        WALKING_SPEED (float): walking speed in meter/second.
+        stats (RaptorStats): optional. Per-round counters all searches of the skim are added to. See RAPTOR.raptor_stats.
+        progress (ProgressTracker): optional. The search and post processing of every source ward is recorded in it. See telemetry.
+
+    Yields:
+        skim_df (pandas.dataframe): skim rows of one source ward with columns SKIM_COLUMNS.
+    """
+    access_list = [[(stop, dist / WALKING_SPEED) for stop, dist in zip(stops, dists)] for stops, dists in zip(station_ids, distance)]
+    for s_idx, source_ward in enumerate(ward_num_list):
+        start = time.perf_counter()
+        rows = []
+        label, pi_label = raptor_multi_source_compiled(access_list[s_idx], None, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, 0,
+                                                       network, metro_cost_dict, stats=stats)
+        for d_idx, destination_ward in enumerate(ward_num_list):
+            if source_ward == destination_ward:
+                continue
+            rap_out = post_processing_multi_source(access_list[s_idx], access_list[d_idx], pi_label, 0, label, metro_cost_dict, ITINERARY=0)
+            if rap_out is None:
+                continue
+            for num_transfer, tt_data in rap_out["tt"]:
+                access, egress = tt_data["access_time"] / 60, tt_data["egress_time"] / 60
+                rows.append((source_ward, destination_ward, tt_data["source_stop"], tt_data["destination_stop"], tt_data["ivtt"] / 60,
+                             tt_data["ovtt"] / 60 + access + egress, tt_data["wait_time"] / 60, tt_data["walk_time"] / 60, tt_data["cost"],
+                             access, egress, num_transfer))
+        skim_df = pd.DataFrame(rows, columns=SKIM_COLUMNS)
+        if progress is not None:
+            progress.record(time.perf_counter() - start)
+        yield skim_df
+
+
+def build_station_profile_skim(station_list: list, START_TIME, END_TIME, BAND_MINUTES: int, MAX_TRANSFER: int, WALKING_FROM_SOURCE: int,
+                               CHANGE_TIME_SEC: int, network, PERCENTILES: tuple = (50, 85), progress=None) -> pd.DataFrame:
+    """
+    Computes departure-window (profile) skims between every ordered pair of distinct stations with one rRAPTOR search per
+    source station. The window is sampled every minute; a traveller leaving at a sampled minute takes the earliest arrival
+    journey and waits at the source station until its departure. Samples are aggregated per time band.
+
+    Args:
+        station_list (list): stop ids of the metro stations to be skimmed.
+        START_TIME (pandas.datetime): start of the departure window.
+        END_TIME (pandas.datetime): end of the departure window.
+        BAND_MINUTES (int): length of a time band in minutes.
+        MAX_TRANSFER (int): maximum transfer limit.
+        WALKING_FROM_SOURCE (int): 1 or 0. 1 indicates walking from SOURCE is allowed.
+        CHANGE_TIME_SEC (int): change-time in seconds.
+        network (CompiledNetwork): compiled network with trip times. See RAPTOR.compiled_network.compile_network.
+        PERCENTILES (tuple): percentiles reported in addition to the mean.
+        progress (ProgressTracker): optional. The search and aggregation of every source station is recorded in it. See telemetry.
+
+    Returns:
+        profile_df (pandas.dataframe): columns source_metro_station, destination_metro_station, time_band, statistic, ivtt,
+        ovtt, waiting_time (minutes) and reachable_share (share of sampled minutes from which the destination is reachable).
+        ovtt is the waiting time plus the walking time inside the metro network.
+    """
+    start, end = to_seconds(START_TIME), to_seconds(END_TIME)
+    query_times = np.arange(start, end, 60.0)
+    band_idx = ((query_times - start) // (BAND_MINUTES * 60)).astype(np.int64)
+    band_labels = [(pd.Timestamp(round(start + band * BAND_MINUTES * 60), unit="s")).strftime("%H:%M") for band in range(band_idx[-1] + 1)]
+    ivtt_col, wait_col, walk_col = PROFILE_METRICS.index('ivtt'), PROFILE_METRICS.index('waiting_time'), PROFILE_METRICS.index('walk_time')
+    statistics = ['mean'] + [f'p{percentile}' for percentile in PERCENTILES]
+    rows = []
+    for SOURCE in station_list:
+        start_time = time.perf_counter()
+        departure_times, profile = rraptor_compiled(SOURCE, start, end, MAX_TRANSFER, WALKING_FROM_SOURCE, CHANGE_TIME_SEC, network,
+                                                    [DESTINATION for DESTINATION in station_list if DESTINATION != SOURCE])
+        for DESTINATION, destination_profile in profile.items():
+            metrics = get_profile_at(departure_times, destination_profile, query_times)
+            skim = np.stack([metrics[:, ivtt_col], metrics[:, wait_col] + metrics[:, walk_col], metrics[:, wait_col]], axis=1) / 60
+            for band, band_label in enumerate(band_labels):
+                band_skim = skim[band_idx == band]
+                reachable = band_skim[~np.isnan(band_skim[:, 0])]
+                reachable_share = len(reachable) / len(band_skim)
+                if len(reachable) == 0:
+                    values = np.full((len(statistics), 3), np.nan)
+                else:
+                    values = np.vstack([reachable.mean(axis=0), *np.percentile(reachable, PERCENTILES, axis=0).reshape(len(PERCENTILES), 3)])
+                for statistic, (ivtt, ovtt, waiting_time) in zip(statistics, values):
+                    rows.append((SOURCE, DESTINATION, band_label, statistic, ivtt, ovtt, waiting_time, reachable_share))
+        if progress is not None:
+            progress.record(time.perf_counter() - start_time)
+    return pd.DataFrame(rows, columns=['source_metro_station', 'destination_metro_station', 'time_band', 'statistic', 'ivtt', 'ovtt',
+                                       'waiting_time', 'reachable_share'])
+
+
+def build_ward_profile_skim(ward_num_list: list, station_list: list, ward_station_idx, access_time, profile_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Broadcasts the station profile skim to all ward pairs. Ward pairs sharing a station are skipped.
+
+    Args:
+        ward_num_list (list): ward numbers.
+        station_list (list): metro station ids. See get_ward_stations.
+        ward_station_idx (numpy.ndarray): index into station_list for every ward.
+        access_time (numpy.ndarray): walking time in minutes between every ward and its metro station.
+        profile_df (pandas.dataframe): output of build_station_profile_skim.
+
+    Returns:
+        skim_df (pandas.dataframe): ward-to-ward profile skim with columns PROFILE_SKIM_COLUMNS. Access and egress times are
+        added to ovtt.
+    """
+    ward_df = pd.DataFrame({'ward': ward_num_list, 'metro_station': np.asarray(station_list, dtype=object)[ward_station_idx],
+                            'walk_time': access_time})
+    source_df = ward_df.rename(columns={'ward': 'source_ward', 'metro_station': 'source_metro_station', 'walk_time': 'access_time'})
+    destination_df = ward_df.rename(columns={'ward': 'destination_ward', 'metro_station': 'destination_metro_station', 'walk_time': 'egress_time'})
+    skim_df = source_df.merge(profile_df, on='source_metro_station').merge(destination_df, on='destination_metro_station')
+    skim_df = skim_df[skim_df['source_ward'] != skim_df['destination_ward']]
+    skim_df['ovtt'] = skim_df['ovtt'] + skim_df['access_time'] + skim_df['egress_time']
+    return skim_df[PROFILE_SKIM_COLUMNS].sort_values(['source_ward', 'destination_ward', 'time_band'], kind='stable').reset_index(drop=True)
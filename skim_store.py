@@ -0,0 +1,164 @@
+"""
+Module contains the binary skim store: one dense zone x zone matrix per skim metric in a single memory-mappable file,
+with a zone index table in the header. Lookups by zone id are O(1) array reads, so consumers do not parse or filter the
+CSV skim.
+"""
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+from skim_writer import SkimWriter
+
+SKIM_STORE_MAGIC = b'RAPTORSM'
+SKIM_STORE_VERSION = 1
+SKIM_STORE_ALIGN = 64
+STORE_METRICS = ('ivtt', 'ovtt', 'waiting_time', 'transfer_time', 'metro_fare', 'access_time', 'egress_time', 'num_transfer')
+
+
+def _get_data_start(header_len: int) -> int:
+    """
+    Offset of the matrices in the store file.
+    """
+    return -(-(len(SKIM_STORE_MAGIC) + 12 + header_len) // SKIM_STORE_ALIGN) * SKIM_STORE_ALIGN
+
+
+class SkimStoreWriter(SkimWriter):
+    """
+    Writes skim batches into a skim store. The matrices are allocated on disk (filled with NaN) when the writer is
+    created and the cells of every batch are written through a memory map, so memory stays bounded by the batch size.
+    A zone pair can have several pareto-optimal journeys; the store keeps the one with the lowest ivtt + ovtt (the first
+    one on ties). Pairs without a journey stay NaN.
+    Note:
+    Layout: SKIM_STORE_MAGIC, format version (uint32), header length (uint64), JSON header (zone ids, metrics, dtype) and
+    then a float64 array of shape (metrics, zones, zones) starting at a multiple of SKIM_STORE_ALIGN bytes.
+
+    Parameters
+    ----------
+    path : str
+        output file.
+    columns : list
+        column names of the skim batches. Must contain source_ward, destination_ward and the metrics.
+    zone_ids : list
+        ids of the zones (wards). Defines the row and column order of the matrices.
+    metrics : tuple
+        skim columns stored as matrices.
+    """
+
+    def __init__(self, path: str, columns: list, zone_ids: list, metrics: tuple = STORE_METRICS):
+        super().__init__(path, columns)
+        self.metrics = list(metrics)
+        if 'ivtt' not in self.metrics or 'ovtt' not in self.metrics:
+            raise ValueError("metrics must contain ivtt and ovtt, they select the journey stored for a zone pair")
+        self.zone_index = pd.Index(zone_ids)
+        header = json.dumps({'zone_ids': np.asarray(zone_ids).tolist(), 'metrics': self.metrics, 'dtype': '<f8'}).encode()
+        shape = (len(self.metrics), len(zone_ids), len(zone_ids))
+        data_start = _get_data_start(len(header))
+        with open(path, 'wb') as file:
+            file.write(SKIM_STORE_MAGIC + struct.pack('<IQ', SKIM_STORE_VERSION, len(header)) + header)
+            file.truncate(data_start + int(np.prod(shape)) * 8)
+        self.data = np.memmap(path, dtype='<f8', mode='r+', offset=data_start, shape=shape)
+        self.data[:] = np.nan
+
+    def _write(self, batch: pd.DataFrame) -> None:
+        src = self.zone_index.get_indexer(batch['source_ward'])
+        dst = self.zone_index.get_indexer(batch['destination_ward'])
+        if (src == -1).any() or (dst == -1).any():
+            raise KeyError("Skim batch contains wards that are not in the zone index of the store")
+        total_time = (batch['ivtt'] + batch['ovtt']).to_numpy()
+        # Best journey of every pair in the batch, then only where it beats the journey already stored
+        order = np.lexsort((total_time, src * len(self.zone_index) + dst))
+        pair_id = (src * len(self.zone_index) + dst)[order]
+        first = order[np.concatenate(([True], pair_id[1:] != pair_id[:-1]))]
+        stored_time = self.data[self.metrics.index('ivtt'), src[first], dst[first]] + self.data[self.metrics.index('ovtt'), src[first], dst[first]]
+        first = first[~(total_time[first] >= stored_time)]  # NaN: nothing stored yet
+        for m_idx, metric in enumerate(self.metrics):
+            self.data[m_idx, src[first], dst[first]] = batch[metric].to_numpy(dtype=np.float64)[first]
+
+    def close(self) -> None:
+        self.data.flush()
+        del self.data
+
+
+class SkimStore:
+    """
+    Reader of a skim store written by SkimStoreWriter.
+
+    Parameters
+    ----------
+    path : str
+        skim store file.
+    mmap : bool
+        if True, the matrices are a read-only memory map of the file, else they are read into memory.
+
+    Attributes
+    ----------
+    zone_ids : list
+        zone ids in matrix order.
+    metrics : list
+        names of the stored metrics.
+    data : numpy.ndarray
+        shape (metrics, zones, zones).
+
+    Examples:
+        >>> skims = SkimStore('skim_matrix.skim')
+        >>> skims.get(1, 3, 'ivtt')
+        >>> skims.row(1, 'ovtt')  # ovtt from ward 1 to every ward, in the order of skims.zone_ids
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        with open(path, 'rb') as file:
+            magic = file.read(len(SKIM_STORE_MAGIC))
+            if magic != SKIM_STORE_MAGIC:
+                raise ValueError(f"{path} is not a skim store")
+            version, header_len = struct.unpack('<IQ', file.read(12))
+            if version != SKIM_STORE_VERSION:
+                raise ValueError(f"{path} has skim store version {version}, expected {SKIM_STORE_VERSION}")
+            header = json.loads(file.read(header_len))
+        self.zone_ids, self.metrics = header['zone_ids'], header['metrics']
+        self._zone_idx = {zone: idx for idx, zone in enumerate(self.zone_ids)}
+        self._zone_index = pd.Index(self.zone_ids)
+        self._metric_idx = {metric: idx for idx, metric in enumerate(self.metrics)}
+        shape = (len(self.metrics), len(self.zone_ids), len(self.zone_ids))
+        data_start = _get_data_start(header_len)
+        if mmap and int(np.prod(shape)) > 0:
+            self.data = np.memmap(path, dtype=header['dtype'], mode='r', offset=data_start, shape=shape)
+        else:
+            self.data = np.fromfile(path, dtype=header['dtype'], count=int(np.prod(shape)), offset=data_start).reshape(shape)
+
+    def _get_zone_indices(self, zones) -> np.ndarray:
+        idx = self._zone_index.get_indexer(np.atleast_1d(zones))
+        if (idx == -1).any():
+            raise KeyError(f"Unknown zones: {np.atleast_1d(zones)[idx == -1].tolist()}")
+        return idx
+
+    def get(self, src, dst, metric: str) -> float:
+        """
+        Returns the metric of one zone pair (NaN if the pair has no journey).
+        """
+        return float(self.data[self._metric_idx[metric], self._zone_idx[src], self._zone_idx[dst]])
+
+    def get_many(self, src, dst, metric: str) -> np.ndarray:
+        """
+        Returns the metric of many zone pairs. src and dst are equal-length sequences of zone ids.
+        """
+        return self.data[self._metric_idx[metric], self._get_zone_indices(src), self._get_zone_indices(dst)]
+
+    def row(self, src, metric: str) -> np.ndarray:
+        """
+        Returns the metric from src to every zone, in the order of zone_ids.
+        """
+        return self.data[self._metric_idx[metric], self._zone_idx[src]]
+
+    def column(self, dst, metric: str) -> np.ndarray:
+        """
+        Returns the metric from every zone to dst, in the order of zone_ids.
+        """
+        return self.data[self._metric_idx[metric], :, self._zone_idx[dst]]
+
+    def matrix(self, metric: str) -> np.ndarray:
+        """
+        Returns the zones x zones matrix of a metric.
+        """
+        return self.data[self._metric_idx[metric]]
@@ -0,0 +1,205 @@
+"""
+Module contains streaming skim writers. Skim rows are written in batches as they are produced, so memory is bounded by
+the batch size instead of the number of OD pairs, and the rows written before a crash are kept on disk.
+"""
+import abc
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+BINARY_SKIM_MAGIC = b'RAPTORSK'
+BINARY_SKIM_VERSION = 1
+
+
+class SkimWriter(abc.ABC):
+    """
+    Base class of the skim writers. Batches are pandas dataframes with the columns given at construction, in that order.
+    Writers are context managers; the file is closed (and complete) when the with block exits.
+
+    Parameters
+    ----------
+    path : str
+        output file.
+    columns : list
+        column names of the skim.
+
+    Attributes
+    ----------
+    rows_written : int
+        number of rows written so far.
+    """
+
+    def __init__(self, path: str, columns: list):
+        self.path = path
+        self.columns = list(columns)
+        self.rows_written = 0
+
+    def write(self, batch: pd.DataFrame) -> None:
+        """
+        Appends a batch of rows to the skim file.
+
+        Args:
+            batch (pandas.dataframe): skim rows with (at least) the columns of the writer.
+        """
+        if len(batch) == 0:
+            return
+        self._write(batch[self.columns])
+        self.rows_written += len(batch)
+
+    @abc.abstractmethod
+    def _write(self, batch: pd.DataFrame) -> None:
+        """
+        Writes a batch whose columns are already in the order of the writer.
+        """
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        """
+        Completes and closes the skim file.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvSkimWriter(SkimWriter):
+    """
+    Writes the skim as CSV. The file has the same content as DataFrame.to_csv(path, index=False) on the concatenated batches.
+    """
+
+    def __init__(self, path: str, columns: list):
+        super().__init__(path, columns)
+        self._file = open(path, 'w', newline='')
+        pd.DataFrame(columns=self.columns).to_csv(self._file, index=False)
+
+    def _write(self, batch: pd.DataFrame) -> None:
+        batch.to_csv(self._file, header=False, index=False)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetSkimWriter(SkimWriter):
+    """
+    Writes the skim as a Parquet file with one row group per batch. Requires pyarrow.
+    """
+
+    def __init__(self, path: str, columns: list):
+        super().__init__(path, columns)
+        self._writer = None
+
+    def _write(self, batch: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class BinarySkimWriter(SkimWriter):
+    """
+    Writes the skim as fixed-width binary records. The file starts with BINARY_SKIM_MAGIC, the format version and the
+    length of a JSON header holding the record dtype; the records follow. The dtype is fixed by the first batch: string
+    columns are stored as unicode fields as wide as the longest value of that batch (or STRING_WIDTH, if larger). See
+    read_binary_skim.
+    """
+    STRING_WIDTH = 16
+
+    def __init__(self, path: str, columns: list):
+        super().__init__(path, columns)
+        self._file = open(path, 'wb')
+        self.dtype = None
+
+    def _get_dtype(self, batch: pd.DataFrame) -> np.dtype:
+        fields = []
+        for column in self.columns:
+            values = batch[column].to_numpy()
+            if values.dtype == object:
+                width = max(self.STRING_WIDTH, max(len(str(value)) for value in values))
+                fields.append((column, f'<U{width}'))
+            else:
+                fields.append((column, values.dtype.newbyteorder('<').str))
+        return np.dtype(fields)
+
+    def _write(self, batch: pd.DataFrame) -> None:
+        if self.dtype is None:
+            self.dtype = self._get_dtype(batch)
+            header = json.dumps({'columns': self.columns, 'dtype': self.dtype.descr}).encode()
+            self._file.write(BINARY_SKIM_MAGIC + struct.pack('<II', BINARY_SKIM_VERSION, len(header)) + header)
+        records = np.empty(len(batch), dtype=self.dtype)
+        for column in self.columns:
+            values = batch[column].to_numpy()
+            if self.dtype[column].kind == 'U' and max(len(str(value)) for value in values) > self.dtype[column].itemsize // 4:
+                raise ValueError(f"Value of column {column} is longer than the {self.dtype[column].itemsize // 4} characters fixed by the first batch")
+            records[column] = values
+        self._file.write(records.tobytes())
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+SKIM_WRITERS = {'csv': CsvSkimWriter, 'parquet': ParquetSkimWriter, 'bin': BinarySkimWriter}
+
+
+def get_skim_writer(path: str, columns: list, FORMAT: str = None, zone_ids: list = None) -> SkimWriter:
+    """
+    Returns the skim writer for the given format.
+
+    Args:
+        path (str): output file.
+        columns (list): column names of the skim.
+        FORMAT (str): 'csv', 'parquet', 'bin' or 'skim' (dense skim store, see skim_store). Defaults to the extension of path.
+        zone_ids (list): ward numbers. Only needed by the skim store.
+
+    Returns:
+        writer (SkimWriter): open skim writer.
+
+    Examples:
+        >>> with get_skim_writer("skim_matrix.csv", SKIM_COLUMNS) as writer:
+        ...     writer.write(skim_df)
+    """
+    FORMAT = FORMAT or path.rsplit('.', 1)[-1]
+    if FORMAT == 'skim':
+        from skim_store import SkimStoreWriter
+        return SkimStoreWriter(path, columns, zone_ids)
+    if FORMAT not in SKIM_WRITERS:
+        raise ValueError(f"Unknown skim format {FORMAT}. Supported formats: {', '.join(SKIM_WRITERS)}, skim")
+    return SKIM_WRITERS[FORMAT](path, columns)
+
+
+def read_binary_skim(path: str, mmap: bool = True) -> np.ndarray:
+    """
+    Reads a skim written by BinarySkimWriter.
+
+    Args:
+        path (str): skim file.
+        mmap (bool): if True, the records are memory-mapped instead of read into memory.
+
+    Returns:
+        records (numpy.ndarray): structured array with one field per skim column. Use pd.DataFrame(records) for a dataframe.
+    """
+    with open(path, 'rb') as file:
+        magic = file.read(len(BINARY_SKIM_MAGIC))
+        if magic != BINARY_SKIM_MAGIC:
+            raise ValueError(f"{path} is not a binary skim file")
+        version, header_len = struct.unpack('<II', file.read(8))
+        if version != BINARY_SKIM_VERSION:
+            raise ValueError(f"Unsupported binary skim version {version} (expected {BINARY_SKIM_VERSION})")
+        header = json.loads(file.read(header_len))
+    dtype = np.dtype([tuple(field) for field in header['dtype']])
+    offset = len(BINARY_SKIM_MAGIC) + 8 + header_len
+    if mmap:
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset)
+    return np.fromfile(path, dtype=dtype, offset=offset)
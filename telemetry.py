@@ -0,0 +1,187 @@
+"""
+Module contains the telemetry of a skim run: wall time of every pipeline phase, progress reports (queries/sec,
+latency percentiles and ETA) during the query loop, and a JSON summary written at the end of the run.
+"""
+import contextlib
+import json
+import os
+import platform
+import time
+from array import array
+
+import numpy as np
+import pandas as pd
+
+
+def get_latency_stats(samples) -> dict:
+    """
+    Summarizes run times given in seconds.
+
+    Args:
+        samples (list/array): run time of every call in seconds.
+
+    Returns:
+        stats (dict): number of calls, mean, max and 50/90/99th percentile latency in milliseconds.
+    """
+    if len(samples) == 0:
+        return {'n': 0}
+    samples_ms = np.asarray(samples) * 1000
+    p50, p90, p99 = np.percentile(samples_ms, [50, 90, 99]).tolist()
+    return {'n': len(samples_ms), 'mean_ms': float(samples_ms.mean()), 'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': float(samples_ms.max())}
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressTracker:
+    """
+    Progress of a query loop. Every finished query is recorded with its latency; every INTERVAL_SEC seconds (and when
+    the last query is recorded) a line with the progress, throughput, latency percentiles and ETA is printed.
+    Throughput and ETA use wall time since the tracker was created, so they are correct when queries run in parallel.
+
+    Parameters
+    ----------
+    name : str
+        name of the loop.
+    total : int
+        number of queries of the loop.
+    INTERVAL_SEC : float
+        seconds between two progress reports.
+
+    Examples:
+        >>> progress = telemetry.progress("station pair skim", len(station_list))
+        >>> progress.record(0.002)
+    """
+
+    def __init__(self, name: str, total: int, INTERVAL_SEC: float = 10):
+        self.name, self.total, self.INTERVAL_SEC = name, total, INTERVAL_SEC
+        self.latencies = array('d')
+        self.start = self._last_report = time.perf_counter()
+        self.end = None
+
+    def record(self, seconds: float) -> None:
+        """
+        Records a finished query that took `seconds`.
+        """
+        self.latencies.append(seconds)
+        now = time.perf_counter()
+        if len(self.latencies) == self.total:
+            self.end = now
+        if now - self._last_report >= self.INTERVAL_SEC or len(self.latencies) == self.total:
+            self._last_report = now
+            print(f"telemetry: {self.report()}")
+
+    def report(self) -> str:
+        """
+        Returns the progress line of the loop.
+        """
+        done, elapsed = len(self.latencies), (self.end or time.perf_counter()) - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        line = f"{self.name} {done}/{self.total} ({done / max(self.total, 1):.0%}) {rate:.1f} queries/s"
+        if done:
+            stats = get_latency_stats(self.latencies)
+            line += f" p50 {stats['p50_ms']:.2f} ms p99 {stats['p99_ms']:.2f} ms"
+        if done < self.total:
+            line += f" ETA {_format_duration((self.total - done) / rate) if rate > 0 else '?'}"
+        return line
+
+    def summary(self) -> dict:
+        elapsed = (self.end or time.perf_counter()) - self.start
+        return {'queries': len(self.latencies), 'total': self.total, 'seconds': elapsed,
+                'queries_per_sec': len(self.latencies) / elapsed if elapsed > 0 else 0.0, **get_latency_stats(self.latencies)}
+
+
+class PipelineTelemetry:
+    """
+    Wall time of the phases of a run. A phase can be entered several times (e.g. once per written batch); its time and
+    number of calls add up.
+
+    Attributes
+    ----------
+    phases : dict
+        keys: phase name (in order of first use), values: {'seconds', 'calls'}.
+    loops : dict
+        keys: loop name, values: ProgressTracker.
+
+    Examples:
+        >>> telemetry = PipelineTelemetry()
+        >>> with telemetry.phase("dict load/build"):
+        ...     network, nearest_metro_station_dict, metro_cost = read_query_artifacts(FOLDER)
+        >>> for skim_df in telemetry.timed_iter(skim_batches, "ward skim"):
+        ...     with telemetry.phase("write", report=False):
+        ...         writer.write(skim_df)
+        >>> telemetry.print_summary()
+        >>> telemetry.write_summary("skim_telemetry.json")
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.created = pd.Timestamp.now().isoformat(timespec='seconds')
+        self.phases = {}
+        self.loops = {}
+
+    def _add(self, name: str, seconds: float) -> None:
+        phase = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        phase['seconds'] += seconds
+        phase['calls'] += 1
+
+    @contextlib.contextmanager
+    def phase(self, name: str, report: bool = True):
+        """
+        Times the with block as (part of) phase `name`. If report, its duration is printed when it ends.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._add(name, seconds)
+            if report:
+                print(f"telemetry: {name} took {seconds:.2f} s")
+
+    def timed_iter(self, iterable, name: str):
+        """
+        Yields the items of iterable, adding the time spent producing them to phase `name`. Used for generators that
+        interleave computation with the writes done by the caller.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._add(name, time.perf_counter() - start)
+                return
+            self._add(name, time.perf_counter() - start)
+            yield item
+
+    def progress(self, name: str, total: int, INTERVAL_SEC: float = 10) -> ProgressTracker:
+        """
+        Returns the progress tracker of a query loop with `total` queries. See ProgressTracker.
+        """
+        self.loops[name] = ProgressTracker(name, total, INTERVAL_SEC)
+        return self.loops[name]
+
+    def summary(self) -> dict:
+        """
+        Returns the machine-readable summary of the run: phases, query loops and the machine it ran on.
+        """
+        return {'created': self.created, 'total_seconds': time.perf_counter() - self.start, 'phases': self.phases,
+                'loops': {name: tracker.summary() for name, tracker in self.loops.items()},
+                'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count()}}
+
+    def print_summary(self) -> None:
+        summary = self.summary()
+        print(f"telemetry: total {summary['total_seconds']:.2f} s")
+        for name, phase in summary['phases'].items():
+            print(f"telemetry:   {name:<25} {phase['seconds']:10.2f} s {phase['seconds'] / summary['total_seconds']:6.1%}  ({phase['calls']} calls)")
+        for name, loop in summary['loops'].items():
+            if loop['queries']:
+                print(f"telemetry:   {name:<25} {loop['queries']} queries, {loop['queries_per_sec']:.1f} queries/s, p50 {loop['p50_ms']:.2f} ms, "
+                      f"p99 {loop['p99_ms']:.2f} ms")
+
+    def write_summary(self, path: str) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.summary(), file, indent=2)
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+T0 = pd.Timestamp('2023-01-09 08:00:00')
+
+
+def get_synthetic_dicts():
+    """
+    Preprocessed dicts of a small network: four routes with several trips, a footpath between S3 and S4 and a stop (S7)
+    only reachable by walking from S1. Trip times are pandas timestamps and footpath times timedeltas, as built by
+    dict_builder; stoptimes_dict_modified holds the cumulative travel times used by tweaked RAPTOR.
+    """
+    routes = {  # route: (stops, travel time between consecutive stops in seconds, start times of the trips in seconds after T0)
+        'R1': (['S1', 'S2', 'S3'], 300, [0, 600, 1200]),
+        'R2': (['S2', 'S4', 'S5'], 240, [400, 1000]),
+        'R3': (['S5', 'S6'], 180, [1000, 1500, 2100]),
+        'R4': (['S3', 'S6'], 1500, [700, 1900]),
+    }
+    stops_dict, stoptimes_dict, stoptimes_dict_modified, idx_by_route_stop_dict = {}, {}, {}, {}
+    routes_by_stop_dict = {stop: [] for stop in ['S1', 'S2', 'S3', 'S4', 'S5', 'S6', 'S7']}
+    for route, (stops, travel_time, starts) in routes.items():
+        stops_dict[route] = stops
+        stoptimes_dict[route] = [[(stop, T0 + pd.Timedelta(seconds=start + idx * travel_time)) for idx, stop in enumerate(stops)] for start in starts]
+        stoptimes_dict_modified[route] = [(stop, float(idx * travel_time)) for idx, stop in enumerate(stops)]
+        for idx, stop in enumerate(stops):
+            routes_by_stop_dict[stop].append(route)
+            idx_by_route_stop_dict[(route, stop)] = idx
+    footpath_dict = {'S3': [('S4', pd.Timedelta(seconds=120))], 'S4': [('S3', pd.Timedelta(seconds=120))], 'S1': [('S7', pd.Timedelta(seconds=90))],
+                     'S7': [('S1', pd.Timedelta(seconds=90))]}
+    metro_cost_dict = {(origin, destination): 10.0 + 5 * abs(int(origin[1]) - int(destination[1])) for origin in routes_by_stop_dict
+                       for destination in routes_by_stop_dict if origin != destination}
+    return routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict
+
+
+@pytest.fixture
+def synthetic_dicts():
+    return get_synthetic_dicts()
@@ -0,0 +1,63 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from RAPTOR.RAPTOR_tweaked import raptor as raptor_tweaked, raptor_compiled as raptor_tweaked_compiled
+from RAPTOR.std_raptor import raptor as std_raptor, raptor_compiled as std_raptor_compiled
+from RAPTOR.compiled_network import compile_network, RaptorWorkspace
+from conftest import T0
+
+STOPS = ['S1', 'S2', 'S3', 'S4', 'S5', 'S6', 'S7']
+D_TIME = T0 - pd.Timedelta(seconds=60)
+
+
+def _compile(dicts):
+    routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict = dicts
+    return compile_network(routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified,
+                           metro_cost_dict)
+
+
+def _tweaked_result(rap_out):
+    return None if rap_out is None else (rap_out['old'], rap_out['tt'])
+
+
+@pytest.mark.parametrize('MAX_TRANSFER, WALKING_FROM_SOURCE', list(itertools.product([1, 2, 3], [0, 1])))
+def test_std_raptor_compiled_matches_dict_version(synthetic_dicts, MAX_TRANSFER, WALKING_FROM_SOURCE):
+    routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, _, _ = synthetic_dicts
+    network = _compile(synthetic_dicts)
+    for SOURCE, DESTINATION in itertools.permutations(STOPS, 2):
+        expected = std_raptor(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, 0, 0, routes_by_stop_dict, stops_dict, stoptimes_dict,
+                              footpath_dict, idx_by_route_stop_dict)
+        assert std_raptor_compiled(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, WALKING_FROM_SOURCE, 0, 0, network) == expected, (SOURCE, DESTINATION)
+
+
+@pytest.mark.parametrize('MAX_TRANSFER, WALKING_FROM_SOURCE', list(itertools.product([1, 2, 3], [0, 1])))
+def test_tweaked_raptor_compiled_matches_dict_version(synthetic_dicts, MAX_TRANSFER, WALKING_FROM_SOURCE):
+    routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict = synthetic_dicts
+    footpath_dict_sec = {stop: [(p_dash, duration.total_seconds()) for p_dash, duration in footpaths] for stop, footpaths in footpath_dict.items()}
+    network = _compile(synthetic_dicts)
+    D_TIME_SEC = D_TIME.timestamp()
+    for SOURCE, DESTINATION in itertools.permutations(STOPS, 2):
+        expected = raptor_tweaked(SOURCE, DESTINATION, D_TIME_SEC, MAX_TRANSFER, WALKING_FROM_SOURCE, 0, 0, routes_by_stop_dict, stops_dict,
+                                  stoptimes_dict, footpath_dict_sec, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict)[0]
+        rap_out = raptor_tweaked_compiled(SOURCE, DESTINATION, D_TIME_SEC, MAX_TRANSFER, WALKING_FROM_SOURCE, 0, 0, network, metro_cost_dict)[0]
+        assert _tweaked_result(rap_out) == _tweaked_result(expected), (SOURCE, DESTINATION)
+
+
+def test_shared_workspace_gives_same_answers_across_queries(synthetic_dicts):
+    # The workspace is only reset for the stops touched by the previous query (sparse reset); queries with different
+    # sources and MAX_TRANSFER values on one workspace must answer as on a fresh one.
+    metro_cost_dict = synthetic_dicts[-1]
+    network = _compile(synthetic_dicts)
+    workspace = RaptorWorkspace(network.n_stops, 3)
+    D_TIME_SEC = D_TIME.timestamp()
+    queries = [(SOURCE, DESTINATION, MAX_TRANSFER) for MAX_TRANSFER in (3, 1, 2) for SOURCE, DESTINATION in itertools.permutations(STOPS, 2)]
+    for SOURCE, DESTINATION, MAX_TRANSFER in queries:
+        shared = std_raptor_compiled(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, 1, 0, 0, network, workspace)
+        fresh = std_raptor_compiled(SOURCE, DESTINATION, D_TIME, MAX_TRANSFER, 1, 0, 0, network, RaptorWorkspace(network.n_stops, MAX_TRANSFER))
+        assert shared == fresh, (SOURCE, DESTINATION, MAX_TRANSFER)
+        shared = raptor_tweaked_compiled(SOURCE, DESTINATION, D_TIME_SEC, MAX_TRANSFER, 1, 0, 0, network, metro_cost_dict, workspace)[0]
+        fresh = raptor_tweaked_compiled(SOURCE, DESTINATION, D_TIME_SEC, MAX_TRANSFER, 1, 0, 0, network, metro_cost_dict,
+                                        RaptorWorkspace(network.n_stops, MAX_TRANSFER))[0]
+        assert _tweaked_result(shared) == _tweaked_result(fresh), (SOURCE, DESTINATION, MAX_TRANSFER)
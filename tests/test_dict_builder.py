@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from dict_builder.dict_builder_functions import build_save_stops_dict, build_save_stopstimes_dict, stop_idx_in_route, build_footpath_closure, \
+    build_footpath_dict
+
+FOLDER = 'synthetic'
+
+
+def _t(clock):
+    return pd.Timestamp(f'2023-01-09 {clock}:00')
+
+
+@pytest.fixture
+def feed(tmp_path, monkeypatch):
+    """
+    stop_times (merged with trips, as loaded by gtfs_loader) of three routes, with the rows of trips and routes
+    interleaved and trips not listed by start time:
+    - R2: T1 and T2 start (stop_sequence 1) at the same time, T2's start row comes first in the file. T3 starts later
+      but is listed first.
+    - R10: a single trip, sorts between R1 and R2.
+    - R1: T9 has decreasing timestamps and starts at a stop (Z) no other trip of R1 serves.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'dict_builder' / FOLDER).mkdir(parents=True)
+    rows = [('T3', '08:05', 'B', 0, 'R2'), ('T3', '08:10', 'C', 1, 'R2'), ('T3', '08:15', 'D', 2, 'R2'),
+            ('T5', '08:20', 'D', 0, 'R10'),
+            ('T2', '07:55', 'B', 0, 'R2'),
+            ('T9', '07:30', 'Z', 0, 'R1'), ('T9', '07:20', 'B', 1, 'R1'), ('T9', '07:40', 'C', 2, 'R1'),
+            ('T2', '08:00', 'C', 1, 'R2'),
+            ('T1', '07:50', 'B', 0, 'R2'), ('T1', '08:00', 'C', 1, 'R2'),
+            ('T5', '08:30', 'E', 1, 'R10'),
+            ('T2', '08:05', 'D', 2, 'R2'),
+            ('T1', '08:06', 'D', 2, 'R2'),
+            ('T4', '09:00', 'A', 0, 'R1'), ('T4', '09:05', 'B', 1, 'R1'), ('T4', '09:10', 'C', 2, 'R1')]
+    stop_times_file = pd.DataFrame(rows, columns=['trip_id', 'arrival_time', 'stop_id', 'stop_sequence', 'route_id'])
+    stop_times_file['arrival_time'] = '2023-01-09 ' + stop_times_file['arrival_time'] + ':00'
+    trips_file = stop_times_file[['trip_id', 'route_id']].drop_duplicates()
+    return stop_times_file, trips_file
+
+
+def test_stops_dict_sorted_by_route_without_unsorted_trips(feed):
+    stop_times_file, trips_file = feed
+    stops_dict = build_save_stops_dict(stop_times_file, trips_file, FOLDER)
+    assert list(stops_dict.items()) == [('R1', ['A', 'B', 'C']), ('R10', ['D', 'E']), ('R2', ['B', 'C', 'D'])]
+    assert pd.read_pickle(f'./dict_builder/{FOLDER}/stops_dict_pkl.pkl') == stops_dict
+
+
+def test_stoptimes_dict_orders_trips_by_start_and_keeps_file_order_of_ties(feed):
+    stop_times_file, trips_file = feed
+    stoptimes_dict = build_save_stopstimes_dict(stop_times_file, trips_file, FOLDER)
+    assert list(stoptimes_dict) == ['R1', 'R10', 'R2']
+    assert stoptimes_dict['R1'] == [[('Z', _t('07:30')), ('B', _t('07:20')), ('C', _t('07:40'))],
+                                    [('A', _t('09:00')), ('B', _t('09:05')), ('C', _t('09:10'))]]
+    assert stoptimes_dict['R10'] == [[('D', _t('08:20')), ('E', _t('08:30'))]]
+    assert stoptimes_dict['R2'] == [[('B', _t('07:55')), ('C', _t('08:00')), ('D', _t('08:05'))],  # T2
+                                    [('B', _t('07:50')), ('C', _t('08:00')), ('D', _t('08:06'))],  # T1
+                                    [('B', _t('08:05')), ('C', _t('08:10')), ('D', _t('08:15'))]]  # T3
+
+
+def test_stop_idx_in_route_sorted_by_route_and_stop(feed):
+    stop_times_file, _ = feed
+    idx_by_route_stop = stop_idx_in_route(stop_times_file, FOLDER)
+    assert list(idx_by_route_stop.items()) == [(('R1', 'A'), 0), (('R1', 'B'), 1), (('R1', 'C'), 2), (('R1', 'Z'), 0), (('R10', 'D'), 0),
+                                               (('R10', 'E'), 1), (('R2', 'B'), 0), (('R2', 'C'), 1), (('R2', 'D'), 2)]
+
+
+def test_footpath_closure():
+    # P - Q - R needs closing (P-Q is given twice, the last duration wins); X - Y - W is closed, the direct X-W
+    # footpath is kept although walking through Y is shorter.
+    transfers_file = pd.DataFrame([('P', 'Q', 60), ('Q', 'R', 90), ('Q', 'P', 70), ('X', 'Y', 30), ('Y', 'X', 30), ('X', 'W', 200), ('W', 'Y', 50)],
+                                  columns=['from_stop_id', 'to_stop_id', 'min_transfer_time'])
+    footpath_db = build_footpath_closure(transfers_file)
+    assert list(footpath_db.itertuples(index=False, name=None)) == [
+        ('P', 'Q', 70.0), ('P', 'R', 160.0), ('Q', 'P', 70.0), ('Q', 'R', 90.0), ('R', 'P', 160.0), ('R', 'Q', 90.0),
+        ('W', 'X', 200.0), ('W', 'Y', 50.0), ('X', 'W', 200.0), ('X', 'Y', 30.0), ('Y', 'W', 50.0), ('Y', 'X', 30.0)]
+
+    # without the long X-W footpath, X and W are linked through Y
+    footpath_db = build_footpath_closure(transfers_file, time_limit=100)
+    assert footpath_db[footpath_db.from_stop_id.isin(['W', 'X']) & footpath_db.to_stop_id.isin(['W', 'X'])].min_transfer_time.tolist() == [80.0, 80.0]
+
+    footpath_dict = build_footpath_dict(footpath_db.from_stop_id.to_numpy(), footpath_db.to_stop_id.to_numpy(), footpath_db.min_transfer_time.to_numpy())
+    assert list(footpath_dict) == ['P', 'Q', 'R', 'W', 'X', 'Y']
+    assert footpath_dict['P'] == [('Q', pd.Timedelta(seconds=70)), ('R', pd.Timedelta(seconds=160))]
@@ -0,0 +1,55 @@
+import math
+
+import numpy as np
+
+from RAPTOR.RAPTOR_tweaked import raptor_compiled as raptor_tweaked_compiled
+from RAPTOR.compiled_network import compile_network, LabelView
+from RAPTOR.journey_metrics import get_pareto_legs, get_batch_metrics, LEG_WALK
+from RAPTOR.raptor_function_tweaked import post_processing_dhanus
+from conftest import T0
+
+METRICS = ('walk_time', 'wait_time', 'ovtt', 'ivtt', 'cost')
+
+
+def _same(value, expected):
+    return (math.isnan(value) and math.isnan(expected)) or value == expected
+
+
+def test_batch_metrics_equal_get_t_times(synthetic_dicts):
+    routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified, metro_cost_dict = synthetic_dicts
+    stoptimes_dict_modified = {**stoptimes_dict_modified, 'R3': [('S5', 0.0), ('S6', 100.125)]}  # ivtt 100.125 is a rounding tie
+    metro_cost_dict = {pair: fare for pair, fare in metro_cost_dict.items() if pair != ('S2', 'S4')}  # no fare: NaN in the FareMatrix
+    network = compile_network(routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict, stoptimes_dict_modified,
+                              metro_cost_dict)
+    nan_cost_dict = {(origin, destination): network.fares.get_fare(network.stop_idx[origin], network.stop_idx[destination])
+                     for origin in network.stop_ids for destination in network.stop_ids}
+    D_TIME = T0.timestamp() - 60
+    n_journeys, n_walk_transit, n_nan_cost, n_tie = 0, 0, 0, 0
+    for SOURCE in network.stop_ids:
+        label, pi_label = raptor_tweaked_compiled(SOURCE, None, D_TIME, 3, 1, 0, 0, network, network.fares, POST_PROCESSING=0)
+        destinations = [stop for stop in network.stop_ids if stop != SOURCE]
+        legs = get_pareto_legs(label, pi_label, [network.stop_idx[stop] for stop in destinations])
+        metrics = get_batch_metrics(legs, network.fares)
+        view = LabelView(network, label, pi_label)
+        expected = []
+        for DESTINATION in destinations:
+            _, _, rap_out = post_processing_dhanus(DESTINATION, view.pi_label, 0, view.label, nan_cost_dict)
+            _, _, rap_out_backtrack = post_processing_dhanus(DESTINATION, view.pi_label, 0, view.label, nan_cost_dict, ITINERARY=0)
+            if rap_out is not None:
+                # metrics-only backtracking gives the same numbers as the itinerary path
+                assert [trans for trans, _ in rap_out_backtrack['tt']] == [trans for trans, _ in rap_out['tt']]
+                assert all(_same(a[name], b[name]) for (_, a), (_, b) in zip(rap_out_backtrack['tt'], rap_out['tt']) for name in METRICS)
+                expected.extend((network.stop_idx[DESTINATION], trans, tt_data) for trans, tt_data in rap_out['tt'])
+        assert len(legs) == len(expected)
+        for j_idx, (destination, trans, tt_data) in enumerate(expected):
+            assert (legs.destination[j_idx], legs.num_transfer[j_idx]) == (destination, trans)
+            for name in METRICS:
+                assert _same(metrics[name][j_idx].item(), tt_data[name]), (SOURCE, network.stop_ids[destination], name)
+            journey_modes = legs.leg_mode[legs.journey_ptr[j_idx]:legs.journey_ptr[j_idx + 1]]
+            n_walk_transit += bool(len(journey_modes) > 1 and (journey_modes == LEG_WALK).any() and (journey_modes != LEG_WALK).any())
+            n_nan_cost += math.isnan(tt_data['cost'])
+            n_tie += tt_data['ivtt'] in (100.12, 100.13)
+        n_journeys += len(expected)
+    # the network must exercise multi-leg walk + transit journeys, legs without fare and rounding ties
+    assert n_journeys > 0 and n_walk_transit > 0 and n_nan_cost > 0 and n_tie > 0
+    assert np.isnan(network.fares.get_fare(network.stop_idx['S2'], network.stop_idx['S4']))
@@ -0,0 +1,34 @@
+import numpy as np
+
+from RAPTOR.compiled_network import compile_network
+from skim_engine import iter_ward_skim_multi_source
+
+D_TIME = 1_600_000_000.0
+
+
+def _get_network():
+    # route R: A -> B -> C, footpaths A <-> D
+    stops_dict = {'R': ['A', 'B', 'C']}
+    routes_by_stop_dict = {'A': ['R'], 'B': ['R'], 'C': ['R']}
+    stoptimes_dict = {'R': [[('A', D_TIME + 200), ('B', D_TIME + 500), ('C', D_TIME + 800)]]}
+    stoptimes_dict_modified = {'R': [('A', 0), ('B', 300), ('C', 600)]}
+    idx_by_route_stop_dict = {('R', 'A'): 0, ('R', 'B'): 1, ('R', 'C'): 2}
+    footpath_dict = {'A': [('D', 90)], 'D': [('A', 90)]}
+    metro_cost_dict = {(s, d): 10 for s in 'ABC' for d in 'ABC' if s != d}
+    network = compile_network(routes_by_stop_dict, stops_dict, stoptimes_dict, footpath_dict, idx_by_route_stop_dict,
+                              stoptimes_dict_modified, metro_cost_dict)
+    return network, metro_cost_dict
+
+
+def test_overlapping_candidate_stations_give_transit_journeys_only():
+    network, metro_cost_dict = _get_network()
+    # ward 1 and ward 2 share station B; ward 2's station D is a walk away from ward 1's station A
+    station_ids = np.array([['A', 'B', 'A'], ['B', 'D', 'C'], ['C', 'C', 'C']])
+    distance = np.array([[60.0, 120.0, 60.0], [60.0, 30.0, 30.0], [30.0, 30.0, 30.0]])
+    skim_df = next(iter_ward_skim_multi_source([1, 2, 3], station_ids, distance, D_TIME, 3, 1, 0, network, metro_cost_dict, WALKING_SPEED=1))
+
+    assert len(skim_df) > 0
+    assert (skim_df['num_transfer'] >= 0).all()
+    assert (skim_df['ivtt'] > 0).all()
+    ward_2 = skim_df[skim_df['destination_ward'] == 2]
+    assert ward_2[['source_metro_station', 'destination_metro_station', 'num_transfer']].values.tolist() == [['B', 'C', 0]]